@@ -0,0 +1,264 @@
+"""Microbenchmarks for the bot's hot paths against a synthetic guild.
+
+Runs bot.py's own code on an in-memory Firestore (benchmarks/fake_firestore.py) and a
+stub Discord member cache (benchmarks/guild.py), so nothing talks to Discord or Google.
+For every guild size each operation is timed over a few runs, with the document reads,
+writes and round-trips it made and the Discord API calls it would have sent.
+
+    python -m benchmarks                                 # 1k and 10k members, a year of entries
+    python -m benchmarks --sizes 1000,10000,100000       # 100k members needs several GB of RAM
+    python -m benchmarks --compare bench_results/old.json
+    python -m benchmarks --mirror                        # reads served by the snapshot-listener mirror
+
+Results are written as JSON (see --output) so runs from different versions can be compared.
+"""
+import argparse
+import asyncio
+import datetime
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_bot():
+    """Import bot.py with placeholder config; STORAGE_BACKEND is swapped for the fake afterwards."""
+    scratch = tempfile.mkdtemp(prefix="bench-")
+    for name, value in {
+        "DISCORD_TOKEN": "bench",
+        "GUILD_ID": "900000000000000000",
+        "CHECKIN_CHANNEL_ID": "1",
+        "REPORT_CHANNEL_ID": "2",
+        "ADMIN_ROLE_NAME": "Admin",
+    }.items():
+        os.environ.setdefault(name, value)
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(scratch, "levels.db")
+    os.environ["STATE_DB_PATH"] = os.path.join(scratch, "bot_state.db")
+    sys.path.insert(0, ROOT)
+    import bot
+    # The placeholder backend is replaced per run; closing it stops its thread before the chart pool forks
+    asyncio.run(bot.repo.close())
+    return bot
+
+
+class Operation(NamedTuple):
+    name: str
+    run: Callable[[int], Awaitable]  # Called with the repeat number
+    setup: Optional[Callable[[int], object]] = None  # Untimed; may be async
+    teardown: Optional[Callable[[], object]] = None
+    repeats: Optional[int] = None  # Defaults to --repeats
+    report: Optional[Callable[[], dict]] = None  # Extra figures recorded with the result
+
+
+async def _call(fn, *args):
+    result = fn(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def measure(app, client, guild, op: Operation, repeats: int) -> dict:
+    samples = []
+    counts = {}
+    for i in range(op.repeats or repeats):
+        if op.setup:
+            await _call(op.setup, i)
+        app.repo.new_scope()
+        before = client.counters()
+        calls_before = sum(guild.calls.values())
+        started = time.perf_counter()
+        await op.run(i)
+        samples.append(time.perf_counter() - started)
+        after = client.counters()
+        counts = {key: after[key] - before[key] for key in after}
+        counts["discord_calls"] = sum(guild.calls.values()) - calls_before
+        if op.teardown:
+            await _call(op.teardown)
+    return {
+        "operation": op.name,
+        "runs": len(samples),
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": min(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+        **counts,  # From the last run; every run starts with an empty read cache
+        **(op.report() if op.report else {}),
+    }
+
+
+async def run_size(app, members: int, days: int, repeats: int, seed: int, mirror: bool = False) -> list[dict]:
+    from dispatcher import DMDispatcher
+    from level_matrix import LevelMatrix
+    from mirror import FirestoreMirror
+    from storage import AsyncStore, FirestoreRepository
+
+    from benchmarks.fake_firestore import FakeFirestore
+    from benchmarks.guild import FakeChannel, FakeInteraction, synthetic_guild
+
+    started = time.perf_counter()
+    today = datetime.datetime.now(app.EST).date()
+    guild, collections = synthetic_guild(
+        members, days, app.role_bands.band_for, list(app.role_bands.bands), today, guild_id=app.GUILD_ID, seed=seed,
+    )
+    client = FakeFirestore()
+    for name, docs in collections.items():
+        client.seed(name, docs)
+    entries = sum(len(d["entries"]) for d in collections["level_progress"].values())
+    print(f"🏗️ {members} members, {entries} level entries generated in {time.perf_counter() - started:.1f}s")
+
+    # Fresh module state per size; everything the bot reads goes through these globals
+    app.repo = FirestoreRepository(AsyncStore(client), mirror=FirestoreMirror(client, app.MIRRORED_COLLECTIONS) if mirror else None)
+    app.subscribe_to_outside_changes()
+    await app.repo.start()
+    app.rank_index = app.RankIndex()
+    app.role_sync = app.RoleSyncEngine(app.role_sync.saved)
+    app.checkin_scheduler = app.CheckinScheduler()
+    app.dm_dispatcher = DMDispatcher()
+    app.level_matrix = LevelMatrix(max_bytes=app.level_matrix.max_bytes)
+    users = {member.id: member for member in guild.members}
+    channel = FakeChannel(guild)
+    app.bot.get_guild = lambda guild_id: guild if guild_id == guild.id else None
+    app.bot.get_user = users.get
+    app.bot.get_channel = lambda channel_id: channel
+    app.bot.get_all_members = lambda: iter(guild.members)
+    app.bot.wait_until_ready = lambda: asyncio.sleep(0)
+    app.role_bands.refresh(guild)
+
+    humans = [member for member in guild.members if not member.bot]
+
+    def interaction(i: int) -> FakeInteraction:
+        # A different member each run, so per-user caches do not flatter the numbers
+        return FakeInteraction(guild, humans[(i * 7919) % len(humans)])
+
+    async def fresh_scheduler(i: int):
+        for state in (app.last_checkin_sent, app.pending_level_check):
+            for key in state:
+                state.pop(key)
+        app.checkin_scheduler = app.CheckinScheduler()
+        await app.checkin_scheduler.load()
+        # Make every planned check-in due at once: the day's worst case
+        tomorrow = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=2)
+        due = app.checkin_scheduler.pop_due(tomorrow)
+        app.checkin_scheduler.wait_for_due = lambda: asyncio.sleep(0, due)
+
+    async def stop_dispatcher():
+        # Only queueing is measured; DM delivery is paced to Discord's rate limits
+        await app.dm_dispatcher.stop()
+        app.dm_dispatcher = DMDispatcher()
+
+    def clear_charts(i: int):
+        app.chart_service._cache.clear()
+
+    def restore_roles(i: int):
+        guild.restore_roles()
+
+    ops = [
+        Operation("rebuild_leaderboard_stats", lambda i: app.rebuild_leaderboard_stats(), repeats=1),
+        Operation("rank_index.load", lambda i: app.rank_index.load()),
+        Operation("level_matrix.load", lambda i: app.level_matrix.load(app.repo.all_progress), report=app.level_matrix.footprint),
+        Operation("checkin_scheduler.load", lambda i: app.CheckinScheduler().load()),
+        Operation("daily_checkin_task", lambda i: app.daily_checkin_task.coro(), setup=fresh_scheduler, teardown=stop_dispatcher),
+        Operation("get_all_time_scores(limit=10)", lambda i: app.get_all_time_scores(limit=10)),
+        Operation("get_all_time_scores()", lambda i: app.get_all_time_scores()),
+        Operation("/leaderboard alltime", lambda i: app.leaderboard.callback(interaction(i), "alltime")),
+        Operation("/leaderboard week", lambda i: app.leaderboard.callback(interaction(i), "week")),
+        Operation("/leaderboard month", lambda i: app.leaderboard.callback(interaction(i), "month")),
+        Operation("/myrank", lambda i: app.myrank.callback(interaction(i))),
+        Operation("/mystats", lambda i: app.mystats.callback(interaction(i))),
+        Operation("/syncroles dry_run", lambda i: app.syncroles.callback(interaction(i), dry_run=True), setup=restore_roles),
+        Operation("/syncroles", lambda i: app.syncroles.callback(interaction(i)), setup=restore_roles),
+        Operation("weekly_report_task", lambda i: app.weekly_report_task.coro(), setup=clear_charts),
+        Operation("/myprogress", lambda i: app.myprogress.callback(interaction(i)), setup=clear_charts),
+    ]
+    results = []
+    try:
+        for op in ops:
+            result = await measure(app, client, guild, op, repeats)
+            result = {"members": members, **result}
+            results.append(result)
+            if op.report:
+                print(f"📐 {op.name}: {op.report()}")
+            print(
+                f"⏱️ {members:>7} {op.name:<32} {result['median_ms']:10.1f} ms  "
+                f"{result['reads']:>8} reads {result['writes']:>7} writes {result['discord_calls']:>7} discord calls"
+            )
+    finally:
+        await app.dm_dispatcher.stop()
+        await app.repo.close()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r["members"], r["operation"]): r for r in json.load(f)["results"]}
+    matched = [(baseline[(r["members"], r["operation"])], r) for r in results if (r["members"], r["operation"]) in baseline]
+    if not matched:
+        print(f"📊 {baseline_path} has no results for the same sizes and operations")
+        return
+    print(f"📊 Compared with {baseline_path}:")
+    for old, r in matched:
+        change = (r["median_ms"] / old["median_ms"] - 1) * 100 if old["median_ms"] else 0.0
+        print(
+            f"   {r['members']:>7} {r['operation']:<32} {old['median_ms']:10.1f} → {r['median_ms']:10.1f} ms ({change:+.0f}%)  "
+            f"reads {old['reads']} → {r['reads']}, writes {old['writes']} → {r['writes']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated member counts")
+    parser.add_argument("--days", type=int, default=365, help="days of history per member")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default bench_results/<revision>-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--mirror", action="store_true", help="serve reads from the snapshot-listener mirror")
+    args = parser.parse_args()
+
+    app = import_bot()
+    # Fork the chart workers before the storage pool starts any threads
+    app.chart_service.start()
+
+    results = []
+    for members in (int(size) for size in args.sizes.split(",")):
+        results += asyncio.run(run_size(app, members, args.days, args.repeats, args.seed, args.mirror))
+    app.chart_service.close()
+
+    revision = git_revision()
+    output = args.output or os.path.join(
+        ROOT, "bench_results", f"{revision or 'unknown'}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "revision": revision,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "days": args.days,
+            "repeats": args.repeats,
+            "seed": args.seed,
+            "mirror": args.mirror,
+            "results": results,
+        }, f, indent=2)
+    print(f"💾 Results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import datetime
+import random
+import string
+import threading
+from typing import Any, Iterator, Optional
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+
+def _copy(value: Any) -> Any:
+    # Snapshots hand out fresh containers, as the real client does when it deserialises a document
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _resolve(old: Any, value: Any) -> Any:
+    if isinstance(value, firestore.Increment):
+        return (old if isinstance(old, (int, float)) else 0) + value.value
+    return _copy(value)
+
+
+def _merge(base: dict, update: dict) -> dict:
+    """Merge-set semantics: nested maps merge, sentinels are applied, everything else replaces."""
+    merged = dict(base)
+    for key, value in update.items():
+        if value is firestore.DELETE_FIELD:
+            merged.pop(key, None)
+        elif isinstance(value, dict):
+            merged[key] = _merge(merged[key] if isinstance(merged.get(key), dict) else {}, value)
+        else:
+            merged[key] = _resolve(merged.get(key), value)
+    return merged
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocument", data: Optional[dict]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[dict]:
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        value = self._data
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+
+
+class FakeQuery:
+    """Equality filters, ordering, `start_after` and `limit`, evaluated over the stored documents."""
+
+    def __init__(self, client: "FakeFirestore", path: str, filters: tuple = (), orders: tuple = (),
+                 limit: Optional[int] = None, cursor: Optional[FakeSnapshot] = None):
+        self._client = client
+        self._path = path
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+
+    def _with(self, **changes) -> "FakeQuery":
+        state = {"filters": self._filters, "orders": self._orders, "limit": self._limit, "cursor": self._cursor}
+        state.update(changes)
+        return FakeQuery(self._client, self._path, **state)
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        if op != "==":
+            raise NotImplementedError(f"where {op!r} is not simulated")
+        return self._with(filters=self._filters + ((field, value),))
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._with(orders=self._orders + ((field, direction == firestore.Query.DESCENDING),))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._with(limit=count)
+
+    def start_after(self, snapshot: FakeSnapshot) -> "FakeQuery":
+        return self._with(cursor=snapshot)
+
+    def _sort_key(self, doc_id: str, data: dict) -> tuple:
+        return tuple(data.get(field) for field, _ in self._orders) + (doc_id,)
+
+    def _evaluate(self) -> list[tuple[str, dict]]:
+        docs = [
+            (doc_id, data) for doc_id, data in self._client._collection(self._path).items()
+            if all(data.get(field) == value for field, value in self._filters)
+            # Like Firestore, ordering on a field leaves out documents that do not have it
+            and all(field in data for field, _ in self._orders)
+        ]
+        # Stable sorts from the last key back; the document ID breaks ties in the first key's direction
+        descending = self._orders[0][1] if self._orders else False
+        docs.sort(key=lambda item: item[0], reverse=descending)
+        for field, desc in reversed(self._orders):
+            docs.sort(key=lambda item: item[1][field], reverse=desc)
+        if self._cursor is not None:
+            keys = [self._sort_key(doc_id, data) for doc_id, data in docs]
+            cursor_key = self._sort_key(self._cursor.id, self._cursor._data or {})
+            docs = docs[keys.index(cursor_key) + 1:] if cursor_key in keys else []
+        return docs[:self._limit] if self._limit is not None else docs
+
+    def stream(self) -> Iterator[FakeSnapshot]:
+        client = self._client
+        with client._lock:
+            docs = self._evaluate()
+            client.round_trips += 1
+            client.reads += max(len(docs), 1)  # Queries are billed at least one read
+            snapshots = [FakeSnapshot(FakeDocument(client, f"{self._path}/{doc_id}"), _copy(data)) for doc_id, data in docs]
+        return iter(snapshots)
+
+    def get(self) -> list[FakeSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client: "FakeFirestore", path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id: Optional[str] = None) -> "FakeDocument":
+        if doc_id is None:
+            doc_id = "".join(random.choices(string.ascii_letters + string.digits, k=20))
+        return FakeDocument(self._client, f"{self._path}/{doc_id}")
+
+    def on_snapshot(self, callback) -> "FakeWatch":
+        return FakeWatch(self._client, self._path, callback)
+
+    def list_documents(self) -> list["FakeDocument"]:
+        client = self._client
+        with client._lock:
+            ids = list(client._collection(self._path))
+            client.round_trips += 1
+            client.reads += max(len(ids), 1)
+        return [FakeDocument(client, f"{self._path}/{doc_id}") for doc_id in ids]
+
+
+class FakeDocument:
+    def __init__(self, client: "FakeFirestore", path: str):
+        self._client = client
+        self.path = path
+        self._parent, self.id = path.rsplit("/", 1)
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self._client, f"{self.path}/{name}")
+
+    def get(self, transaction=None) -> FakeSnapshot:
+        client = self._client
+        with client._lock:
+            client.round_trips += 1
+            client.reads += 1
+            data = client._collection(self._parent).get(self.id)
+            return FakeSnapshot(self, _copy(data) if data is not None else None)
+
+    def set(self, data: dict, merge: bool = False):
+        with self._client._lock:
+            self._client.round_trips += 1
+            self._client._set(self, data, merge)
+
+    def update(self, data: dict):
+        with self._client._lock:
+            self._client.round_trips += 1
+            self._client._update(self, data)
+
+    def delete(self):
+        with self._client._lock:
+            self._client.round_trips += 1
+            self._client._delete(self)
+
+
+class FakeBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._writes: list[tuple] = []
+
+    def __len__(self) -> int:
+        return len({args[0].path for _, *args in self._writes})
+
+    def set(self, ref: FakeDocument, data: dict, merge: bool = False):
+        self._writes.append((self._client._set, ref, data, merge))
+
+    def update(self, ref: FakeDocument, data: dict):
+        self._writes.append((self._client._update, ref, data))
+
+    def delete(self, ref: FakeDocument):
+        self._writes.append((self._client._delete, ref))
+
+    def commit(self) -> list:
+        with self._client._lock:
+            self._client.round_trips += 1
+            for op, *args in self._writes:
+                op(*args)
+        return []
+
+
+class FakeTransaction(FakeBatch):
+    """Holds the client lock from begin to commit, so transactions never conflict and never retry."""
+
+    _max_attempts = 1
+    _read_only = False
+
+    def __init__(self, client: "FakeFirestore"):
+        super().__init__(client)
+        self._id: Optional[bytes] = None
+
+    def _clean_up(self):
+        self._writes = []
+
+    def _begin(self, retry_id: Optional[bytes] = None):
+        self._client._lock.acquire()
+        self._id = b"fake-transaction"
+
+    def _end(self):
+        if self._id is not None:
+            self._id = None
+            self._client._lock.release()
+
+    def _commit(self) -> list:
+        try:
+            return self.commit()
+        finally:
+            self._end()
+
+    def _rollback(self):
+        self._clean_up()
+        self._end()
+
+
+class FakeWatch:
+    """A collection listener: the whole collection at once, then a callback per changed document.
+
+    Callbacks run on the thread that made the write, standing in for the client's listener thread.
+    """
+
+    def __init__(self, client: "FakeFirestore", path: str, callback):
+        self._client = client
+        self._path = path
+        self._callback = callback
+        self.is_active = True
+        with client._lock:
+            docs = client._collection(path)
+            snapshots = [FakeSnapshot(FakeDocument(client, f"{path}/{doc_id}"), _copy(data)) for doc_id, data in docs.items()]
+            client.reads += max(len(snapshots), 1)
+            client._watches.append(self)
+        changes = [DocumentChange(ChangeType.ADDED, snap, -1, i) for i, snap in enumerate(snapshots)]
+        callback(snapshots, changes, datetime.datetime.now(datetime.timezone.utc))
+
+    def _notify(self, ref: "FakeDocument", data: Optional[dict], existed: bool):
+        snapshot = FakeSnapshot(ref, _copy(data) if data is not None else None)
+        change_type = ChangeType.REMOVED if data is None else ChangeType.MODIFIED if existed else ChangeType.ADDED
+        self._client.reads += 1
+        self._callback([], [DocumentChange(change_type, snapshot, -1, -1)], datetime.datetime.now(datetime.timezone.utc))
+
+    def unsubscribe(self):
+        self.is_active = False
+        with self._client._lock:
+            if self in self._client._watches:
+                self._client._watches.remove(self)
+
+
+class FakeFirestore:
+    """In-memory stand-in for `firestore.Client`, counting what each call would be billed.
+
+    Covers what storage.py and mirror.py use: documents, subcollections, equality/order/limit/cursor
+    queries, `get_all`, write batches, transactions, merges, the Increment/DELETE_FIELD transforms
+    and collection listeners. Every document returned counts as a read (a query that matches
+    nothing still costs one) and every document written counts as a write.
+    """
+
+    def __init__(self):
+        self._collections: dict[str, dict[str, dict]] = {}
+        self._lock = threading.RLock()  # Calls arrive from the AsyncStore's thread pool
+        self.reads = 0
+        self.writes = 0
+        self.round_trips = 0
+        self._watches: list[FakeWatch] = []
+
+    def _collection(self, path: str) -> dict[str, dict]:
+        return self._collections.setdefault(path, {})
+
+    def _changed(self, ref: FakeDocument, existed: bool):
+        data = self._collection(ref._parent).get(ref.id)
+        for watch in [watch for watch in self._watches if watch._path == ref._parent]:
+            watch._notify(ref, data, existed)
+
+    def _set(self, ref: FakeDocument, data: dict, merge: bool):
+        docs = self._collection(ref._parent)
+        existed = ref.id in docs
+        docs[ref.id] = _merge(docs.get(ref.id, {}) if merge else {}, data)
+        self.writes += 1
+        self._changed(ref, existed)
+
+    def _update(self, ref: FakeDocument, data: dict):
+        docs = self._collection(ref._parent)
+        if ref.id not in docs:
+            raise LookupError(f"No document to update: {ref.path}")
+        docs[ref.id] = _merge(docs[ref.id], data)
+        self.writes += 1
+        self._changed(ref, True)
+
+    def _delete(self, ref: FakeDocument):
+        existed = self._collection(ref._parent).pop(ref.id, None) is not None
+        self.writes += 1
+        if existed:
+            self._changed(ref, True)
+
+    # --- CLIENT API ---
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def document(self, path: str) -> FakeDocument:
+        return FakeDocument(self, path)
+
+    def get_all(self, refs: list, transaction: Optional[FakeTransaction] = None) -> Iterator[FakeSnapshot]:
+        with self._lock:
+            self.round_trips += 1
+            self.reads += len(refs)
+            snapshots = []
+            for ref in refs:
+                data = self._collection(ref._parent).get(ref.id)
+                snapshots.append(FakeSnapshot(ref, _copy(data) if data is not None else None))
+        return iter(snapshots)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    # --- BENCHMARK HELPERS ---
+    def seed(self, collection: str, docs: dict[str, dict]):
+        """Load documents directly, without counting them as writes."""
+        with self._lock:
+            self._collection(collection).update(docs)
+
+    def counters(self) -> dict[str, int]:
+        return {"reads": self.reads, "writes": self.writes, "round_trips": self.round_trips}
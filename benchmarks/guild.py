@@ -0,0 +1,222 @@
+import datetime
+import random
+from collections import Counter
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+import discord
+
+TIMEZONES = ["US/Eastern", "US/Pacific", "Europe/London", "Europe/Berlin", "Asia/Kolkata", "Asia/Tokyo", "Australia/Sydney"]
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str, default: bool = False):
+        self.id = role_id
+        self.name = name
+        self._default = default
+
+    def is_default(self) -> bool:
+        return self._default
+
+    def __repr__(self) -> str:
+        return f"<FakeRole {self.name}>"
+
+
+class FakeMember:
+    """Just enough of discord.Member for the bot's code paths; API calls are counted, not sent."""
+
+    def __init__(self, guild: "FakeGuild", member_id: int, name: str, roles: list, bot: bool = False):
+        self.guild = guild
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.roles = roles
+        self.dm_channel = None
+
+    async def send(self, *args, **kwargs):
+        self.guild.calls["member.send"] += 1
+
+    async def edit(self, roles: Optional[list] = None, reason: Optional[str] = None):
+        self.guild.calls["member.edit"] += 1
+        if roles is not None:
+            self.roles = [self.guild.default_role] + [role for role in roles if not role.is_default()]
+
+    async def add_roles(self, *roles, reason: Optional[str] = None):
+        self.guild.calls["member.add_roles"] += 1
+        self.roles = self.roles + [role for role in roles if role not in self.roles]
+
+    async def remove_roles(self, *roles, reason: Optional[str] = None):
+        self.guild.calls["member.remove_roles"] += 1
+        self.roles = [role for role in self.roles if role not in roles]
+
+
+class FakeGuild:
+    """Stub member and role cache standing in for the bot's discord.Guild."""
+
+    def __init__(self, guild_id: int, band_names: list[str]):
+        self.id = guild_id
+        self.calls: Counter = Counter()
+        self.default_role = FakeRole(guild_id, "@everyone", default=True)
+        self.roles = [self.default_role] + [FakeRole(guild_id + i, name) for i, name in enumerate(band_names, 1)]
+        self._roles = {role.id: role for role in self.roles}
+        self._members: dict[int, FakeMember] = {}
+        self._saved_roles: dict[int, list] = {}
+        self.me = SimpleNamespace(guild_permissions=SimpleNamespace(manage_roles=True))
+
+    @property
+    def members(self) -> list[FakeMember]:
+        return list(self._members.values())
+
+    def add_member(self, member: FakeMember):
+        self._members[member.id] = member
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self._members.get(member_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self._roles.get(role_id)
+
+    def role_named(self, name: str) -> Optional[FakeRole]:
+        return next((role for role in self.roles if role.name == name), None)
+
+    async def create_role(self, name: str, reason: Optional[str] = None) -> FakeRole:
+        self.calls["guild.create_role"] += 1
+        role = FakeRole(self.id + len(self.roles), name)
+        self.roles.append(role)
+        self._roles[role.id] = role
+        return role
+
+    def save_roles(self):
+        self._saved_roles = {member_id: list(member.roles) for member_id, member in self._members.items()}
+
+    def restore_roles(self):
+        """Put every member's roles back to how they were at the last `save_roles()`."""
+        for member_id, roles in self._saved_roles.items():
+            self._members[member_id].roles = list(roles)
+
+
+class FakeChannel(discord.abc.Messageable):
+    def __init__(self, guild: FakeGuild):
+        self.guild = guild
+
+    async def _get_channel(self):
+        return self
+
+    async def send(self, *args, **kwargs):
+        self.guild.calls["channel.send"] += 1
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, *args, **kwargs):
+        self._interaction.guild.calls["interaction.respond"] += 1
+        self._done = True
+
+    async def defer(self, **kwargs):
+        self._interaction.guild.calls["interaction.respond"] += 1
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._interaction.guild.calls["interaction.respond"] += 1
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, guild: FakeGuild):
+        self.guild = guild
+
+    async def send(self, *args, **kwargs):
+        self.guild.calls["interaction.followup"] += 1
+
+
+class FakeInteraction:
+    def __init__(self, guild: FakeGuild, user: FakeMember):
+        self.guild = guild
+        self.user = user
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(guild)
+
+    async def edit_original_response(self, **kwargs):
+        self.guild.calls["interaction.edit"] += 1
+
+
+def _band_roles(guild: FakeGuild, rng: random.Random, band: Optional[str]) -> list:
+    # Most members already hold the right band; the rest are stale, missing or doubled up
+    roles = [guild.default_role]
+    bands = [role for role in guild.roles if not role.is_default()]
+    roll = rng.random()
+    if roll < 0.85:
+        correct = guild.role_named(band) if band else None
+        if correct:
+            roles.append(correct)
+    elif roll < 0.95:
+        roles.append(rng.choice(bands))
+    elif roll < 0.98:
+        roles += rng.sample(bands, 2)
+    return roles
+
+
+def synthetic_guild(
+    members: int,
+    days: int,
+    band_for: Callable[[int], Optional[str]],
+    band_names: list[str],
+    today: datetime.date,
+    guild_id: int = 900_000_000_000_000_000,
+    seed: int = 1,
+) -> tuple[FakeGuild, dict[str, dict[str, dict]]]:
+    """Build a guild of `members` members with `days` days of history ending `today`.
+
+    Returns the guild and the documents to seed per collection (level_progress,
+    user_prefs, leaderboard_overrides). About 1% of members are bots, 2% extra users
+    have progress but have left, and check-in habits, time zones and roles vary per user.
+    """
+    rng = random.Random(seed)
+    guild = FakeGuild(guild_id, band_names)
+    # Shared date strings keep a 100k-member year of entries within memory
+    dates = [(today - datetime.timedelta(days=days - 1 - i)).isoformat() for i in range(days)]
+    progress, prefs, overrides = {}, {}, {}
+
+    departed = members // 50
+    for i in range(members + departed):
+        user_id = 100_000_000_000_000_000 + i
+        uid = str(user_id)
+        name = f"user{i}"
+        is_bot = i < members and rng.random() < 0.01
+        best = -1
+        if not is_bot:
+            level = rng.randint(0, 4000)
+            diligence = rng.uniform(0.2, 0.95)
+            entries = {}
+            for day in dates:
+                if rng.random() < diligence:
+                    if rng.random() < 0.05:
+                        entries[day] = -1  # Checked in without a level
+                        continue
+                    level += rng.choice((0, 0, 1, 2, 5, 10, 25))
+                    entries[day] = level
+            if entries:
+                progress[uid] = {"username": name, "entries": entries}
+                best = max(entries.values())
+            if rng.random() < 0.7:
+                tz = rng.choice(TIMEZONES)
+                prefs[uid] = {
+                    "opt_in": rng.random() > 0.05,
+                    "timezone": tz,
+                    "checkin_time": {"hour": rng.randint(0, 23), "minute": rng.choice((0, 15, 30, 45)), "timezone": tz},
+                }
+            if rng.random() < 0.005:
+                overrides[uid] = {"username": name, "override_level": rng.randint(0, 12000)}
+        if i < members:
+            band = band_for(best) if best >= 0 else None
+            guild.add_member(FakeMember(guild, user_id, name, _band_roles(guild, rng, band), bot=is_bot))
+
+    guild.save_roles()
+    return guild, {"level_progress": progress, "user_prefs": prefs, "leaderboard_overrides": overrides}
@@ -1,4 +1,5 @@
-
+# Must stay the first import: it times every import and start-up phase after it
+import startup
 import discord
 from discord.ext import tasks, commands
 from discord import app_commands
@@ -8,44 +9,23 @@ import pytz
 import io
 import os
 import json
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import Optional, Dict, Any
-from statistics import mean
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
+from typing import Optional, Dict, Any, NamedTuple
 import random
-import bot
-from flask import Flask
-from threading import Thread
-
-# Keep-alive server
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    return "Levi is alive!"
-
-def run():
-    app.run(host='0.0.0.0', port=8080)
-
-def keep_alive():
-        app = Flask(__name__)
-
-        @app.route('/')
-        def home():
-            return "Bot is alive!"
-
-        # These specific settings force public exposure
-        Thread(target=lambda: app.run(
-            host='0.0.0.0',
-            port=8080,
-            debug=False,
-            use_reloader=False
-        )).start()
+import signal
+import time
+import heapq
+import functools
+import hashlib
+import bisect
+import metrics
+from health import HealthServer
+from level_matrix import LevelMatrix
+from repository import Pager, Repository
+from dispatcher import DMDispatcher
+from state import StateMap, StateStore
+from gazetteer import Gazetteer, TimezoneIndex
+from charts import ChartService, compute_percentile_bands, render_user_progress, render_weekly_progress, render_weekly_report
+startup.profiler.mark("imports")
 
 # --- ENVIRONMENT CONFIG ---
 TOKEN = os.getenv("DISCORD_TOKEN")
@@ -75,25 +55,121 @@ if ADMIN_ROLE_NAME is None:
 EST = pytz.timezone("US/Eastern")
 DAILY_CHECK_HOUR_EST = 20  # 8 PM
 
-# --- FIREBASE ---
-firebase_cred_str = os.getenv("FIREBASE_CRED")
-if firebase_cred_str is None:
-    raise ValueError("FIREBASE_CRED environment variable not set.")
-firebase_key_dict = json.loads(firebase_cred_str)
-cred = credentials.Certificate(firebase_key_dict)
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-# Add this after your other Firebase collection references
-LEADERBOARD_OVERRIDES = db.collection("leaderboard_overrides")
+# --- CHARTS ---
+# matplotlib runs in worker processes; identical inputs are served from the cache
+chart_service = ChartService(
+    workers=int(os.getenv("CHART_WORKERS", "2")),
+    cache_size=int(os.getenv("CHART_CACHE_SIZE", "128")),
+)
+if __name__ == "__main__":
+    # Fork the workers now, before the storage client starts its gRPC threads; they warm up while the bot starts
+    chart_service.start()
+# Above this many users the weekly report switches to top movers + percentile bands
+WEEKLY_REPORT_FULL_LIMIT = int(os.getenv("WEEKLY_REPORT_FULL_LIMIT", "25"))
+WEEKLY_REPORT_TOP_N = int(os.getenv("WEEKLY_REPORT_TOP_N", "10"))
+WEEKLY_REPORT_IMAGES = int(os.getenv("WEEKLY_REPORT_IMAGES", "1"))  # Split the movers across this many images
+
+# --- STORAGE ---
+# Everything is persisted through a Repository. STORAGE_BACKEND=sqlite keeps it all in one
+# local file (SQLITE_PATH) and needs no Firebase credentials; the default is Firestore.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+# STORAGE_MIRROR=1 keeps live copies of these Firestore collections through snapshot listeners
+# and serves reads from them, so edits from the console or another instance show up without a re-read
+STORAGE_MIRROR = os.getenv("STORAGE_MIRROR", "0") == "1"
+MIRRORED_COLLECTIONS = ("level_progress", "leaderboard_stats", "leaderboard_overrides", "user_prefs")
+
+def create_repository() -> Repository:
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_repository import SQLiteRepository
+        return SQLiteRepository(os.getenv("SQLITE_PATH", "levels.db"))
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from mirror import FirestoreMirror
+    from storage import AsyncStore, FirestoreRepository
+    firebase_cred_str = os.getenv("FIREBASE_CRED")
+    if firebase_cred_str is None:
+        raise ValueError("FIREBASE_CRED environment variable not set.")
+    firebase_key_dict = json.loads(firebase_cred_str)
+    cred = credentials.Certificate(firebase_key_dict)
+    firebase_admin.initialize_app(cred)
+    # All Firestore calls go through this store so they run off the event loop
+    store = AsyncStore(
+        firestore.client(),
+        max_workers=int(os.getenv("STORAGE_WORKERS", "8")),
+        max_reads=int(os.getenv("STORAGE_MAX_READS", "16")),
+        max_writes=int(os.getenv("STORAGE_MAX_WRITES", "8")),
+        timeout=float(os.getenv("STORAGE_TIMEOUT", "10")),
+    )
+    # Level saves coalesce in a write-behind buffer and land as batched commits
+    return FirestoreRepository(
+        store,
+        write_batch=int(os.getenv("LEVEL_WRITE_BATCH", "400")),
+        write_delay=float(os.getenv("LEVEL_WRITE_DELAY", "2")),
+        mirror=FirestoreMirror(store.client, MIRRORED_COLLECTIONS) if STORAGE_MIRROR else None,
+    )
+
+repo = create_repository()
+startup.profiler.mark("storage")
 
 # --- DISCORD BOT ---
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
 
-pending_level_check: Dict[str, str] = {}  # Tracks DM reply states like "asked", "awaiting"
-last_checkin_sent: Dict[str, str] = {}   # Tracks the date string (YYYY-MM-DD) when check-in was last sent
+class InstrumentedTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Runs in the interaction's own task, so the label covers everything the command does
+        name = "/" + (interaction.data or {}).get("name", "?")
+        if interaction.type is discord.InteractionType.autocomplete:
+            name += " autocomplete"
+        else:
+            interaction.extras["started"] = time.perf_counter()
+        metrics.current_operation.set(name)
+        return True
+
+def record_command(interaction: discord.Interaction, outcome: str):
+    started = interaction.extras.get("started")
+    if started is not None:
+        metrics.command_seconds.observe(time.perf_counter() - started, command=metrics.current_operation.get(), outcome=outcome)
+
+class CheckinBot(commands.Bot):
+    async def setup_hook(self):
+        metrics.loop_monitor.start()
+        await repo.start()
+        try:
+            await health_server.start()
+        except OSError as e:
+            print(f"❌ Health server could not start: {e}")
+        # Hosts stop the process with SIGTERM; close cleanly so buffered writes are flushed
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    async def close(self):
+        await health_server.stop()
+        # Check-ins still queued are sent or given up on before the storage they update closes
+        await dm_dispatcher.close()
+        await repo.close()
+        await state_store.close()
+        await super().close()
+
+bot = CheckinBot(command_prefix="!", intents=intents, tree_cls=InstrumentedTree)
+
+# --- CONVERSATION STATE ---
+# Kept in a local SQLite file so a restart neither drops in-flight replies nor re-sends today's check-in.
+# Entries expire on their own and each map is capped, so users who never reply do not pile up.
+state_store = StateStore(os.getenv("STATE_DB_PATH", "bot_state.db"))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "50000"))
+# Tracks DM reply states like "asked", "awaiting"; an unanswered check-in lapses after a day and a half
+pending_level_check = state_store.namespace(
+    "pending_level_check",
+    ttl=float(os.getenv("PENDING_CHECKIN_TTL_HOURS", "36")) * 3600,
+    max_entries=STATE_MAX_ENTRIES,
+)
+# Tracks the local date string (YYYY-MM-DD) when check-in was last sent; only today's matters
+last_checkin_sent = state_store.namespace("last_checkin_sent", ttl=48 * 3600, max_entries=STATE_MAX_ENTRIES)
 
 # Data for new features
 DAILY_FACTS = [
@@ -136,6 +212,63 @@ LEVEL_ROLES = {
     "10K+": (10000, float('inf'))
 }
 
+class RoleBandIndex:
+    """Level bands resolved to role IDs, with bisect lookup from level to band.
+
+    Bands default to LEVEL_ROLES and can be replaced at runtime from the
+    config/level_roles document ({"bands": [{"name", "min", "max"}]}, max null = no cap).
+    Role IDs are resolved from the guild's role cache and refreshed on role events.
+    """
+
+    def __init__(self, bands: dict):
+        self._role_ids: Dict[str, int] = {}
+        self._roles: Dict[int, discord.Role] = {}
+        self.set_bands(bands)
+
+    def set_bands(self, bands: dict):
+        ordered = sorted(bands.items(), key=lambda item: item[1][0])
+        self.bands = dict(ordered)
+        self._mins = [low for _, (low, _) in ordered]
+        self._names = [name for name, _ in ordered]
+
+    async def load_config(self):
+        data = await repo.get_config("level_roles")
+        if data and data.get("bands"):
+            self.set_bands({
+                band["name"]: (band["min"], band["max"] if band.get("max") is not None else float('inf'))
+                for band in data["bands"]
+            })
+            print(f"🎚️ Loaded {len(self.bands)} level bands from storage")
+
+    def band_for(self, level: int) -> Optional[str]:
+        i = bisect.bisect_right(self._mins, level) - 1
+        if i < 0:
+            return None
+        name = self._names[i]
+        # Bands may leave gaps (e.g. 9000-10000), so check the upper bound too
+        return name if level < self.bands[name][1] else None
+
+    def refresh(self, guild: discord.Guild):
+        self._roles = {role.id: role for role in guild.roles if role.name in self.bands}
+        self._role_ids = {role.name: role.id for role in self._roles.values()}
+
+    def register(self, role: discord.Role):
+        # A role we just created is not in the guild cache until its gateway event arrives
+        self._roles[role.id] = role
+        self._role_ids[role.name] = role.id
+
+    def role(self, guild: discord.Guild, band: str) -> Optional[discord.Role]:
+        role_id = self._role_ids.get(band)
+        return (guild.get_role(role_id) or self._roles.get(role_id)) if role_id else None
+
+    def is_band_role(self, role: discord.Role) -> bool:
+        return role.id in self._roles
+
+    def member_bands(self, member: discord.Member) -> list:
+        return [role for role in member.roles if role.id in self._roles]
+
+role_bands = RoleBandIndex(LEVEL_ROLES)
+
 # --- HELPERS ---
 def get_today_date_str() -> str:
     now = datetime.datetime.now(EST)
@@ -156,38 +289,28 @@ def get_month_dates() -> list[str]:
         current += datetime.timedelta(days=1)
     return dates
 
-def get_all_time_scores():
-    docs = db.collection("level_progress").stream()
+async def get_all_time_scores(limit: Optional[int] = None):
+    # The rank index holds the same scores in memory once loaded
+    if limit and rank_index.loaded:
+        return [(name, score) for _, _, name, score in rank_index.top(limit)]
+    # Reads the maintained summary (overrides already applied) instead of scanning level_progress
+    if limit:
+        rows = await repo.top_summaries("score", limit)
+    else:
+        rows = sorted((await repo.all_summaries()).items(), key=lambda item: -item[1].get("score", -1))
     scores = []
-    for doc in docs:
-        user_id = doc.id
-        d = doc.to_dict() or {}
-        username = d.get("username", "?")
-        entries = d.get("entries", {})
-        
-        # Check for leaderboard override first
-        override = LEADERBOARD_OVERRIDES.document(user_id).get()
-        if override.exists:
-            override_data = override.to_dict()
-            scores.append((username, override_data["override_level"]))
-            continue
-            
-        # Normal calculation if no override exists
-        valid_levels = [v for v in entries.values() if isinstance(v, int) and v >= 0]
-        if valid_levels:
-            highest_level = max(valid_levels)
-            scores.append((username, highest_level))
-    
-    return sorted(scores, key=lambda x: x[1], reverse=True)
+    for _, d in rows:
+        if d.get("score", -1) >= 0:
+            scores.append((d.get("username", "?"), d["score"]))
+    return scores
 
 def is_admin(member: discord.Member) -> bool:
     return any(role.name == ADMIN_ROLE_NAME for role in member.roles)
 
 # Helper to get user timezone or default EST
 async def get_user_timezone(user_id: str) -> pytz.timezone:
-    doc = db.collection("user_prefs").document(user_id).get()
-    if doc.exists:
-        data = doc.to_dict()
+    data = await repo.get_prefs(user_id)
+    if data is not None:
         tz_name = data.get("timezone")
         if tz_name:
             try:
@@ -198,22 +321,24 @@ async def get_user_timezone(user_id: str) -> pytz.timezone:
 
 # Helper to fetch user entries as a dict[str, int]
 async def get_user_entries(user_id: str) -> dict[str, int]:
-    doc = db.collection("level_progress").document(user_id).get()
-    data = doc.to_dict() or {}
+    data = await repo.get_progress(user_id) or {}
     entries = data.get("entries", {})
     return {k: v for k, v in entries.items() if isinstance(v, int) and v >= 0}
 
 # Helper to get opt-in status (default True)
 async def get_opt_in_status(user_id: str) -> bool:
-    doc = db.collection("user_prefs").document(user_id).get()
-    data = doc.to_dict()
+    data = await repo.get_prefs(user_id)
     if data is None:
         return True
     return data.get("opt_in", True)
 
 # Helper to set opt-in status
 async def set_opt_in_status(user_id: str, value: bool):
-    db.collection("user_prefs").document(user_id).set({"opt_in": value})
+    await repo.update_prefs(user_id, {"opt_in": value})
+    checkin_scheduler.replan(user_id, {"opt_in": value})
+
+# --- WARNINGS ---
+WARNINGS_PAGE_SIZE = 10
 
 # Helper to add warning
 async def add_warning(user_id: str, username: str, reason: str, admin_id: str):
@@ -222,25 +347,39 @@ async def add_warning(user_id: str, username: str, reason: str, admin_id: str):
         "timestamp": datetime.datetime.now(EST).isoformat(),
         "admin_id": admin_id
     }
-    doc_ref = db.collection("warnings").document(user_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        warnings = doc.to_dict().get("warnings", [])
-    else:
-        warnings = []
-    warnings.append(warning_data)
-    doc_ref.set({"username": username, "warnings": warnings})
+    await repo.add_warning(user_id, username, warning_data)
+
+# Helper to get a user's warning count, without reading the warnings themselves
+async def get_warning_count(user_id: str) -> int:
+    return await repo.warning_count(user_id)
 
-# Helper to get warnings
-async def get_warnings(user_id: str):
-    doc = db.collection("warnings").document(user_id).get()
-    if doc.exists:
-        return doc.to_dict().get("warnings", [])
-    return []
+# Helper to page through warnings, newest first
+def get_warnings(user_id: str, page_size: int = WARNINGS_PAGE_SIZE) -> Pager:
+    return repo.warnings_pager(user_id, page_size)
 
 # Helper to clear warnings
 async def clear_warnings(user_id: str):
-    db.collection("warnings").document(user_id).delete()
+    await repo.clear_warnings(user_id)
+
+# --- AUDIT LOG ---
+AUDIT_LOG_PAGE_SIZE = 5
+
+# Helper to record an admin action; backends keep running totals so /log can show a count
+async def log_audit(action_type: str, action: str, admin: str, user_id: Optional[str] = None):
+    try:
+        await repo.add_audit_entry({
+            "timestamp": datetime.datetime.now(EST).isoformat(),
+            "action_type": action_type,
+            "action": action,
+            "admin": admin,
+            "user_id": user_id
+        })
+    except Exception as e:
+        print(f"[AUDIT ERROR] {e}")
+
+# Helper to get the count for a /log filter; None if it is not known
+async def get_audit_count(user_id: Optional[str] = None, action_type: Optional[str] = None) -> Optional[int]:
+    return await repo.audit_count(user_id, action_type)
 
 # Helper to get user's current total level
 async def get_user_total_level(user_id: str) -> int:
@@ -250,37 +389,33 @@ async def get_user_total_level(user_id: str) -> int:
     return max(entries.values())
 
 # Helper to determine role based on level
-def get_role_for_level(level: int) -> str:
-    for role_name, (min_level, max_level) in LEVEL_ROLES.items():
-        if min_level <= level < max_level:
-            return role_name
-    return None
+def get_role_for_level(level: int) -> Optional[str]:
+    return role_bands.band_for(level)
 
 # Helper to assign role to user
 async def assign_level_role(member: discord.Member, level: int):
     try:
         guild = member.guild
-        current_level_roles = []
-        
-        # Find all level roles the user currently has
-        for role in member.roles:
-            if role.name in LEVEL_ROLES.keys():
-                current_level_roles.append(role)
+        current_level_roles = role_bands.member_bands(member)
         
         # Determine what role they should have
         target_role_name = get_role_for_level(level)
-        target_role = None
+        target_role = role_bands.role(guild, target_role_name) if target_role_name else None
+
+        # Band unchanged: nothing to send to Discord (the common case on a daily check-in)
+        if target_role_name is None and not current_level_roles:
+            return
+        if target_role is not None and current_level_roles == [target_role]:
+            return
         
-        if target_role_name:
-            # Find or create the target role
-            target_role = discord.utils.get(guild.roles, name=target_role_name)
-            if not target_role:
-                try:
-                    target_role = await guild.create_role(name=target_role_name, reason="Level-based role")
-                    print(f"Created new role: {target_role_name}")
-                except Exception as e:
-                    print(f"Failed to create role {target_role_name}: {e}")
-                    return
+        if target_role_name and not target_role:
+            try:
+                target_role = await guild.create_role(name=target_role_name, reason="Level-based role")
+                role_bands.register(target_role)
+                print(f"Created new role: {target_role_name}")
+            except Exception as e:
+                print(f"Failed to create role {target_role_name}: {e}")
+                return
         
         # Remove old level roles
         for role in current_level_roles:
@@ -302,14 +437,429 @@ async def assign_level_role(member: discord.Member, level: int):
     except Exception as e:
         print(f"Error in role assignment for {member.name}: {e}")
 
+# --- ROLE SYNC ---
+class RoleChange(NamedTuple):
+    member: discord.Member
+    remove: list
+    add_name: Optional[str]  # Band role the member is missing, if any
+    add: Optional[discord.Role]  # Resolved role for add_name (None in a dry run if it doesn't exist yet)
+    level: int
+
+    def describe(self) -> str:
+        removed = ", ".join(r.name for r in self.remove) or "nothing"
+        level = f"Level {self.level}" if self.level >= 0 else "no level"
+        return f"{self.member.display_name}: -{removed} +{self.add_name or 'nothing'} ({level})"
+
+class RoleSyncEngine:
+    """Reconciles level roles for the whole guild.
+
+    A run first diffs every member's desired band role against the roles they hold, then
+    applies only the members that differ, a few at a time. Only band roles are added or
+    removed, so roles granted meanwhile by other bots or admins are left alone; members who
+    fall below every band lose the band role they had. discord.py queues requests per
+    rate-limit bucket, so the semaphore just keeps us from flooding that queue.
+
+    Unapplied changes are kept in the state store until they succeed, so an interrupted
+    run can be resumed even after a restart; a fresh run is also safe to repeat since
+    already-correct members drop out of the diff.
+    """
+
+    def __init__(self, saved: StateMap, concurrency: int = 4):
+        self.concurrency = concurrency
+        self.saved = saved  # Member ID -> unfinished change as JSON
+        self.pending: list[RoleChange] = []
+        self.running = False
+
+    def unfinished(self, guild: discord.Guild) -> list[RoleChange]:
+        """Changes left over from the last run, rebuilt from the state store after a restart."""
+        if self.pending:
+            return list(self.pending)
+        changes = []
+        for member_id in self.saved:
+            member = guild.get_member(int(member_id))
+            if member is None:
+                self.saved.pop(member_id)
+                continue
+            data = json.loads(self.saved[member_id])
+            remove = [role for role in map(guild.get_role, data["remove"]) if role is not None]
+            add = guild.get_role(data["add"]) if data["add"] else None
+            changes.append(RoleChange(member, remove, data["add_name"] if add else None, add, data["level"]))
+        return changes
+
+    def _save(self, change: RoleChange):
+        self.saved[str(change.member.id)] = json.dumps({
+            "remove": [role.id for role in change.remove],
+            "add": change.add.id if change.add else None,
+            "add_name": change.add_name,
+            "level": change.level,
+        })
+
+    async def plan(self, guild: discord.Guild, create_missing: bool = True) -> tuple[list[RoleChange], list[str], int]:
+        """Return (changes, report lines, members already correct)."""
+        report = []
+        # Summaries carry each user's highest level, so no level_progress scan is needed
+        summaries = await repo.all_summaries()
+        changes = []
+        correct = 0
+        for user_id, data in summaries.items():
+            username = data.get("username", "Unknown")
+            level = data.get("all_time_max", -1)
+            member = guild.get_member(int(user_id))
+            if not member:
+                report.append(f"⚠️ {username}: Not in server")
+                continue
+
+            target_role_name = get_role_for_level(level) if level >= 0 else None
+            if not target_role_name:
+                report.append(f"⚠️ {username}: " + (f"No role for level {level}" if level >= 0 else "No valid level entries"))
+                # Below every band: a band role they still hold from before has to go
+                current = role_bands.member_bands(member)
+                if current:
+                    changes.append(RoleChange(member, current, None, None, level))
+                continue
+            target_role = role_bands.role(guild, target_role_name)
+            if not target_role and create_missing:
+                try:
+                    target_role = await guild.create_role(name=target_role_name, reason="Auto-created by level sync")
+                    role_bands.register(target_role)
+                    report.append(f"➕ Created new role: {target_role_name}")
+                except Exception as e:
+                    report.append(f"❌ Failed to create role {target_role_name}: {str(e)}")
+                    continue
+
+            current = role_bands.member_bands(member)
+            if target_role is not None and current == [target_role]:
+                correct += 1
+                continue
+            remove = [role for role in current if role != target_role]
+            add_name = target_role_name if target_role not in current else None
+            changes.append(RoleChange(member, remove, add_name, target_role if add_name else None, level))
+
+        # Members with a band role but no levels at all (e.g. after /resetuser)
+        for member in guild.members:
+            if str(member.id) not in summaries:
+                current = role_bands.member_bands(member)
+                if current:
+                    changes.append(RoleChange(member, current, None, None, -1))
+        return changes, report, correct
+
+    async def apply(self, changes: list[RoleChange], on_progress=None) -> tuple[int, int, list[str]]:
+        """Apply `changes`; returns (updated, failed, report lines). Unfinished changes stay in `pending`."""
+        self.pending = list(changes)
+        for member_id in self.saved:
+            self.saved.pop(member_id)
+        for change in changes:
+            self._save(change)
+        self.running = True
+        semaphore = asyncio.Semaphore(self.concurrency)
+        report = []
+        counts = {"updated": 0, "failed": 0}
+
+        async def apply_one(change: RoleChange):
+            async with semaphore:
+                member = change.member
+                reason = f"Level sync: {change.level}"
+                try:
+                    if change.add:
+                        await member.add_roles(change.add, reason=reason)
+                    if change.remove:
+                        await member.remove_roles(*change.remove, reason=reason)
+                    report.append(f"🔁 {change.describe()}")
+                    counts["updated"] += 1
+                except discord.Forbidden:
+                    report.append(f"❌ {member.display_name}: Missing permissions")
+                    counts["failed"] += 1
+                except discord.HTTPException as e:
+                    report.append(f"❌ {member.display_name}: Error: {str(e)}")
+                    counts["failed"] += 1
+                    return  # Left in pending so a resume retries it
+                self.pending.remove(change)
+                self.saved.pop(str(member.id))
+                if on_progress:
+                    await on_progress(counts["updated"], counts["failed"])
+
+        try:
+            await asyncio.gather(*(apply_one(change) for change in changes))
+        finally:
+            self.running = False
+        return counts["updated"], counts["failed"], report
+
+role_sync = RoleSyncEngine(
+    state_store.namespace("role_sync_pending", ttl=7 * 24 * 3600, max_entries=STATE_MAX_ENTRIES),
+    concurrency=int(os.getenv("ROLE_SYNC_CONCURRENCY", "4")),
+)
+
+# --- LEADERBOARD STATS ---
+# Each leaderboard_stats/{user_id} doc keeps the aggregates the leaderboards need, so they can be
+# served by an ordered, limited query instead of re-scanning every user's entries map:
+#   all_time_max, total, checkins   - over every valid entry
+#   week_key/week_max               - highest level in the week (Monday date) of the latest entry
+#   month_key/month_max             - highest level in the month (YYYY-MM) of the latest entry
+#   score                           - override_level if an override is set, else all_time_max
+# The base_* fields hold the same aggregates excluding the latest day, so re-submitting today's
+# level (e.g. /setlevel after a DM reply) replaces it instead of double counting.
+# Period queries filter on week_key/month_key, so a new week or month rolls over without any writes.
+# Backends index week_key/week_max, month_key/month_max and score for these queries.
+#
+# The same doc carries the personal stats /mystats shows, kept up to date by the same fold:
+#   days                            - days with a check-in (with or without a level)
+#   streak, longest_streak          - consecutive check-in days ending at last_date, and the record
+#   best_date                       - first day all_time_max was reached
+#   recent                          - levels for the RECENT_DAYS days ending at last_date (index 0
+#                                     = last_date, -1 = no level), for the 7/30-day deltas and velocity
+# Entries older than the latest day still update the aggregates and `recent`, but not the streaks.
+LEADERBOARD_STATS_VERSION = 2
+RECENT_DAYS = 31
+
+def get_week_key(date_str: str) -> str:
+    day = datetime.date.fromisoformat(date_str)
+    return (day - datetime.timedelta(days=day.weekday())).isoformat()
+
+def get_month_key(date_str: str) -> str:
+    return date_str[:7]
+
+def days_between(earlier: str, later: str) -> int:
+    return (datetime.date.fromisoformat(later) - datetime.date.fromisoformat(earlier)).days
+
+def fold_level_summary(summary: Optional[dict], username: str, date_str: str, level: int) -> dict:
+    s = dict(summary or {})
+    s["username"] = username
+    last_date = s.get("last_date")
+    recent = list(s.get("recent") or [-1] * RECENT_DAYS)
+    if last_date is not None and date_str < last_date:
+        # Older than the latest day: only the all-time aggregates can take it
+        if level >= 0:
+            if level > s.get("base_max", -1) or (level == s.get("base_max") and date_str < s.get("base_best_date", date_str)):
+                s["base_best_date"] = date_str
+            s["base_max"] = max(s.get("base_max", -1), level)
+            s["base_total"] = s.get("base_total", 0) + level
+            s["base_count"] = s.get("base_count", 0) + 1
+            offset = days_between(date_str, last_date)
+            if offset < len(recent):
+                recent[offset] = level
+        s["days"] = s.get("days", 0) + 1
+    else:
+        if last_date is None:
+            s["streak"] = 1
+            s["days"] = 1
+        elif date_str != last_date:
+            # Roll the previous latest day into the base aggregates
+            prev = s.get("last_level", -1)
+            if prev >= 0:
+                if prev > s.get("base_max", -1):
+                    s["base_best_date"] = last_date
+                s["base_max"] = max(s.get("base_max", -1), prev)
+                s["base_total"] = s.get("base_total", 0) + prev
+                s["base_count"] = s.get("base_count", 0) + 1
+            same_week = get_week_key(last_date) == get_week_key(date_str)
+            same_month = get_month_key(last_date) == get_month_key(date_str)
+            s["base_week_max"] = max(s.get("base_week_max", -1), prev) if same_week else -1
+            s["base_month_max"] = max(s.get("base_month_max", -1), prev) if same_month else -1
+            gap = days_between(last_date, date_str)
+            s["streak"] = s.get("streak", 0) + 1 if gap == 1 else 1
+            s["days"] = s.get("days", 0) + 1
+            recent = ([-1] * min(gap, RECENT_DAYS) + recent)[:RECENT_DAYS]
+        s["last_date"] = date_str
+        s["last_level"] = level
+        recent[0] = level
+
+    current = s["last_level"] if s.get("last_level", -1) >= 0 else -1
+    s["all_time_max"] = max(s.get("base_max", -1), current)
+    s["total"] = s.get("base_total", 0) + max(current, 0)
+    s["checkins"] = s.get("base_count", 0) + (1 if current >= 0 else 0)
+    s["week_key"] = get_week_key(s["last_date"])
+    s["week_max"] = max(s.get("base_week_max", -1), current)
+    s["month_key"] = get_month_key(s["last_date"])
+    s["month_max"] = max(s.get("base_month_max", -1), current)
+    s["score"] = s["override_level"] if s.get("override_level") is not None else s["all_time_max"]
+    # Ties keep the earlier day: a personal best is the first time the level was reached
+    s["best_date"] = s["last_date"] if current >= 0 and current > s.get("base_max", -1) else s.get("base_best_date")
+    s["longest_streak"] = max(s.get("longest_streak", 0), s.get("streak", 0))
+    s["recent"] = recent
+    return s
+
+def level_stats(summary: dict, today: str) -> dict:
+    """Personal stats for /mystats, derived from a summary in constant time."""
+    days_since = days_between(summary["last_date"], today)
+    # Re-anchor `recent` on today: recent[i] is the level i + days_since days ago
+    levels = [(i + days_since, level) for i, level in enumerate(summary.get("recent") or []) if level >= 0]
+    latest_ago, latest = levels[0] if levels else (None, None)
+
+    def delta(days: int) -> Optional[int]:
+        # Change since the last level on or before `days` days ago, if that is still in the window
+        if latest is None or latest_ago > days:
+            return 0 if latest is not None else None
+        base = next((level for ago, level in levels if ago >= days), None)
+        return latest - base if base is not None else None
+
+    velocity = None
+    if len(levels) >= 2 and levels[-1][0] > latest_ago:
+        oldest_ago, oldest = levels[-1]
+        velocity = (latest - oldest) / (oldest_ago - latest_ago)
+    checkins = summary.get("checkins", 0)
+    return {
+        "days": summary.get("days", checkins),
+        "checkins": checkins,
+        "average": summary.get("total", 0) / checkins if checkins else None,
+        "current_streak": summary.get("streak", 0) if days_since <= 1 else 0,
+        "longest_streak": summary.get("longest_streak", 0),
+        "latest_level": latest,
+        "latest_date": (datetime.date.fromisoformat(today) - datetime.timedelta(days=latest_ago)).isoformat() if latest is not None else None,
+        "best_level": summary.get("all_time_max", -1),
+        "best_date": summary.get("best_date"),
+        "delta_7": delta(7),
+        "delta_30": delta(30),
+        "velocity": velocity,
+        "days_since": days_since,
+    }
+
+def build_level_summary(username: str, entries: dict) -> dict:
+    summary = {"username": username}
+    for date_str in sorted(entries):
+        value = entries[date_str]
+        summary = fold_level_summary(summary, username, date_str, value if isinstance(value, int) else -1)
+    return summary
+
+# The summary a user's level_progress and leaderboard override add up to; None if they have neither
+def summary_from_records(progress: Optional[dict], override: Optional[dict]) -> Optional[dict]:
+    if progress is not None:
+        summary = build_level_summary(progress.get("username", "?"), progress.get("entries", {}))
+    elif override is not None:
+        summary = {"username": override.get("username", "?"), "all_time_max": -1}
+    else:
+        return None
+    if override is not None:
+        summary["override_level"] = override["override_level"]
+        summary["score"] = override["override_level"]
+    return summary
+
+# Helper to set or clear a leaderboard override on the user's summary
+async def apply_override_to_stats(user_id: str, username: str, override_level: Optional[int]):
+    summary = await repo.set_summary_override(user_id, username, override_level)
+    rank_index.update(user_id, summary.get("username", "?"), summary.get("score", -1))
+
+# Rebuild every summary from level_progress; runs once when the stats schema is missing or outdated
+async def rebuild_leaderboard_stats():
+    meta = await repo.get_meta("leaderboard_stats") or {}
+    if meta.get("version") == LEADERBOARD_STATS_VERSION:
+        return
+
+    print("🔧 Rebuilding leaderboard stats...")
+    progress = await repo.all_progress()
+    overrides = await repo.all_overrides()
+    summaries = {
+        user_id: summary_from_records(progress.get(user_id), overrides.get(user_id))
+        for user_id in progress.keys() | overrides.keys()
+    }
+
+    await repo.replace_summaries(summaries)
+    await repo.set_meta("leaderboard_stats", {"version": LEADERBOARD_STATS_VERSION, "users": len(summaries)})
+    print(f"🔧 Rebuilt leaderboard stats for {len(summaries)} users")
+
+# --- RANK INDEX ---
+class RankIndex:
+    """In-memory ranking by leaderboard score, kept sorted so rank/top-K/around-me are bisect lookups.
+
+    Ranks use competition ranking (ties share a rank); ties are listed by user ID for a stable order.
+    Reads are O(log n). An update is a bisect plus a list insert/delete, O(n) in the memmove,
+    which is a few microseconds at 10k users and stays well below one storage round-trip.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._keys: list[tuple[int, str]] = []  # (-score, user_id), ascending = best first
+        self._scores: Dict[str, int] = {}
+        self._names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def load(self):
+        summaries = await repo.all_summaries()
+        self._keys, self._scores, self._names = [], {}, {}
+        for user_id, d in summaries.items():
+            self.update(user_id, d.get("username", "?"), d.get("score", -1))
+        self.loaded = True
+        print(f"🏅 Rank index loaded with {len(self._keys)} users")
+
+    def update(self, user_id: str, username: str, score: Optional[int]):
+        self.remove(user_id)
+        if score is None or score < 0:
+            return
+        bisect.insort(self._keys, (-score, user_id))
+        self._scores[user_id] = score
+        self._names[user_id] = username
+
+    def remove(self, user_id: str):
+        score = self._scores.pop(user_id, None)
+        self._names.pop(user_id, None)
+        if score is not None:
+            i = bisect.bisect_left(self._keys, (-score, user_id))
+            if i < len(self._keys) and self._keys[i] == (-score, user_id):
+                del self._keys[i]
+
+    def score(self, user_id: str) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def position(self, user_id: str) -> Optional[int]:
+        """Zero-based index of the user in leaderboard order."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._keys, (-score, user_id))
+
+    def rank(self, user_id: str) -> Optional[int]:
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        # Everyone sorted before the first key with this score has a strictly higher score
+        return bisect.bisect_left(self._keys, (-score,)) + 1
+
+    def slice(self, start: int, count: int) -> list[tuple[int, str, str, int]]:
+        """(rank, user_id, username, score) rows for positions [start, start + count)."""
+        rows = []
+        for neg_score, user_id in self._keys[max(start, 0):start + count]:
+            rank = bisect.bisect_left(self._keys, (neg_score,)) + 1
+            rows.append((rank, user_id, self._names.get(user_id, "?"), -neg_score))
+        return rows
+
+    def top(self, k: int) -> list[tuple[int, str, str, int]]:
+        return self.slice(0, k)
+
+    def around(self, user_id: str, radius: int = 2) -> list[tuple[int, str, str, int]]:
+        pos = self.position(user_id)
+        if pos is None:
+            return []
+        start = max(pos - radius, 0)
+        return self.slice(start, pos - start + radius + 1)
+
+rank_index = RankIndex()
+
+# --- LEVEL MATRIX ---
+# Every user's recent level history as one NumPy array, for the week/month leaderboards, the
+# weekly report and /myprogress. Measured at about 18 MB per 10k users with a year of history
+# (python -m benchmarks); LEVEL_MATRIX_MAX_MB caps it (oldest days go first) and 0 turns it off.
+LEVEL_MATRIX_MAX_MB = float(os.getenv("LEVEL_MATRIX_MAX_MB", "64"))
+level_matrix = LevelMatrix(max_bytes=int(LEVEL_MATRIX_MAX_MB * 2**20))
+
+# Helper to write a user's summary and keep the rank index in step
+async def save_level_summary(user_id: str, summary: dict):
+    await repo.save_summary(user_id, summary)
+    rank_index.update(user_id, summary.get("username", "?"), summary.get("score", -1))
+
 # --- SAVE PROGRESS ---
 async def save_level_entry(user_id: str, username: str, level: Optional[int]):
-    ref = db.collection("level_progress").document(user_id)
-    snapshot = ref.get()
-    raw = snapshot.to_dict() or {}
-    entries = raw.get("entries", {})
-    entries[get_today_date_str()] = level if level is not None else -1
-    ref.set({"username": username, "entries": entries})
+    today = get_today_date_str()
+    value = level if level is not None else -1
+
+    # Entry and summary are saved together; the backend folds the summary atomically,
+    # so concurrent /setlevel and DM replies cannot overwrite each other
+    summary = await repo.save_level(
+        user_id, username, today, value,
+        lambda current: fold_level_summary(current, username, today, value),
+    )
+    rank_index.update(user_id, summary.get("username", "?"), summary.get("score", -1))
+    level_matrix.set(user_id, username, today, value)
     
     # Trigger role assignment if level is provided
     if level is not None and level > 0:
@@ -323,11 +873,329 @@ async def save_level_entry(user_id: str, username: str, level: Optional[int]):
                 print(f"Failed to assign role after level entry: {e}")
 
 # --- SEND DM CHECK-IN ---
-async def send_checkin(user: discord.User):
+# Outbound DMs go through the dispatcher: paced, retried, and dead-lettered when DMs are closed
+dm_dispatcher = DMDispatcher(
+    workers=int(os.getenv("DM_WORKERS", "8")),
+    global_rate=float(os.getenv("DM_GLOBAL_RATE", "40")),
+    max_retries=int(os.getenv("DM_MAX_RETRIES", "4")),
+)
+
+# --- METRICS ---
+# Read from each subsystem's own counters whenever /metrics is scraped
+metrics.registry.callback(
+    "bot_dm_messages_total", "Check-in DMs sent, given up on, and retried.",
+    lambda: {("sent",): dm_dispatcher.sent, ("failed",): dm_dispatcher.failed, ("retried",): dm_dispatcher.retried},
+    type="counter", labels=("outcome",),
+)
+metrics.registry.callback("bot_dm_queue_depth", "DMs waiting for a dispatcher worker.", lambda: dm_dispatcher.queue_depth)
+metrics.registry.callback("bot_dm_dead_letters", "Users whose DMs are closed.", lambda: len(dm_dispatcher.dead_letters))
+metrics.registry.callback("bot_chart_queue_depth", "Charts rendering or waiting for a worker.", lambda: chart_service.queue_depth)
+metrics.registry.callback(
+    "bot_chart_render_seconds", "Chart render time over the last 200 renders.",
+    lambda: {("0.5",): chart_service.render_quantile(0.5), ("0.95",): chart_service.render_quantile(0.95)},
+    type="summary", labels=("quantile",),
+)
+metrics.registry.callback(
+    "bot_chart_requests_total", "Chart requests, rendered or answered from the cache.",
+    lambda: {("rendered",): chart_service.renders, ("cache_hit",): chart_service.cache_hits},
+    type="counter", labels=("result",),
+)
+metrics.registry.callback("bot_chart_cache_hit_ratio", "Share of chart requests answered from the cache.", lambda: chart_service.hit_rate)
+metrics.registry.callback("bot_level_matrix_bytes", "Memory held by the level matrix.", lambda: level_matrix.nbytes)
+
+# Empty unless STORAGE_MIRROR is on
+def mirror_metric(field: str):
+    return lambda: {(name,): float(state[field]) for name, state in (repo.mirror_status() or {}).items()}
+
+metrics.registry.callback("bot_mirror_lag_seconds", "Delay between a mirrored snapshot's read time and it being applied.", mirror_metric("lag_seconds"), labels=("collection",))
+metrics.registry.callback("bot_mirror_documents", "Documents held in each mirrored collection.", mirror_metric("documents"), labels=("collection",))
+metrics.registry.callback("bot_mirror_synced", "1 while the collection's mirror is serving reads.", mirror_metric("synced"), labels=("collection",))
+metrics.registry.callback("bot_mirror_resyncs_total", "Listeners restarted and resynced from scratch.", mirror_metric("resyncs"), type="counter", labels=("collection",))
+metrics.registry.callback("bot_gateway_latency_seconds", "Discord heartbeat latency (NaN until connected).", lambda: bot.latency)
+
+# --- HEALTH ---
+# Served from the bot's event loop on PORT: / and /healthz for liveness, /readyz for readiness, /metrics
+READY_MAX_LATENCY = float(os.getenv("READY_MAX_LATENCY", "10"))
+READY_MAX_LOOP_LAG = float(os.getenv("READY_MAX_LOOP_LAG", "2"))
+STORAGE_CHECK_INTERVAL = float(os.getenv("STORAGE_CHECK_INTERVAL", "30"))
+storage_check: tuple[float, bool, str] = (float("-inf"), False, "not checked")  # (checked at, ok, detail)
+
+async def check_gateway() -> tuple[bool, str]:
+    if bot.is_closed():
+        return False, "client closed"
+    if not bot.is_ready():
+        return False, "waiting for READY"
+    if bot.ws is None or not bot.ws.open:
+        return False, "gateway disconnected, reconnecting"
+    return True, "connected"
+
+async def check_latency() -> tuple[bool, str]:
+    latency = bot.latency
+    # NaN/infinite until the first heartbeat is acknowledged; discord.py drops the socket if acks stop
+    if latency != latency or latency == float("inf"):
+        return True, "no heartbeat acknowledged yet"
+    if latency > READY_MAX_LATENCY:
+        return False, f"heartbeat latency {latency:.1f}s"
+    return True, f"heartbeat latency {latency * 1000:.0f} ms"
+
+async def check_storage() -> tuple[bool, str]:
+    # Probes can come every few seconds; each round-trip (a billed read on Firestore) is reused for a while
+    global storage_check
+    checked_at, ok, detail = storage_check
+    if time.monotonic() - checked_at >= STORAGE_CHECK_INTERVAL:
+        metrics.current_operation.set("health_check")
+        started = time.perf_counter()
+        try:
+            await repo.ping()
+            ok, detail = True, f"{STORAGE_BACKEND} answered in {(time.perf_counter() - started) * 1000:.0f} ms"
+        except Exception as e:
+            ok, detail = False, f"{STORAGE_BACKEND} unreachable: {type(e).__name__}: {e}"
+        storage_check = (time.monotonic(), ok, detail)
+    return ok, detail
+
+async def check_tasks() -> tuple[bool, str]:
+    stopped = [
+        task.coro.__name__ for task in (daily_checkin_task, weekly_report_task, state_sweep_task)
+        if not task.is_running() or task.failed()
+    ]
+    return (False, "not running: " + ", ".join(stopped)) if stopped else (True, "all running")
+
+async def check_event_loop() -> tuple[bool, str]:
+    lag = metrics.loop_monitor.last_lag
+    return lag <= READY_MAX_LOOP_LAG, f"last lag {lag * 1000:.0f} ms"
+
+async def check_charts() -> tuple[bool, str]:
+    if chart_service.broken:
+        return False, chart_service.broken
+    return True, f"{chart_service.queue_depth} queued"
+
+async def check_mirror() -> tuple[bool, str]:
+    # Unsynced collections are read from Firestore meanwhile, so this flags staleness risk, not an outage
+    status = repo.mirror_status() or {}
+    unsynced = [name for name, state in status.items() if not state["synced"]]
+    if unsynced:
+        return False, "resyncing: " + ", ".join(unsynced)
+    return True, ", ".join(f"{name} lag {state['lag_seconds']:.2f}s" for name, state in status.items())
+
+health_server = HealthServer(
+    checks={
+        "gateway": check_gateway,
+        "latency": check_latency,
+        "storage": check_storage,
+        "tasks": check_tasks,
+        "event_loop": check_event_loop,
+        "charts": check_charts,
+        **({"mirror": check_mirror} if repo.mirror_status() is not None else {}),
+    },
+    metrics=metrics.registry.render,
+    port=int(os.getenv("PORT", "8080")),
+    unready_grace=float(os.getenv("UNREADY_GRACE_SECONDS", "300")),
+)
+
+def send_checkin(user: discord.User) -> asyncio.Future:
+    user_id = str(user.id)
+
+    def on_failed(reason: str):
+        # Nobody can answer a DM that never arrived, and after a restart it may be sent again
+        pending_level_check.pop(user_id, None)
+        last_checkin_sent.pop(user_id, None)
+
+    return dm_dispatcher.submit(user, "🧠 Did your level increase today? Reply with `yes` or `no`.", on_failed=on_failed)
+
+# --- CHECK-IN SCHEDULER ---
+# How late a check-in may still go out (e.g. after a restart) before it waits for the next day
+CHECKIN_GRACE = datetime.timedelta(minutes=10)
+
+def get_checkin_timezone(prefs: dict) -> pytz.timezone:
+    checkin_prefs = prefs.get("checkin_time", {})
+    for tz_name in (checkin_prefs.get("timezone"), prefs.get("timezone")):
+        if tz_name:
+            try:
+                return pytz.timezone(tz_name)
+            except pytz.UnknownTimeZoneError:
+                pass
+    return EST
+
+def localize_wall_time(tz, day: datetime.date, hour: int, minute: int) -> datetime.datetime:
+    naive = datetime.datetime(day.year, day.month, day.day, hour, minute)
+    try:
+        return tz.localize(naive, is_dst=None)
+    except pytz.AmbiguousTimeError:
+        # Clocks fall back: fire on the first occurrence of the wall time
+        return tz.localize(naive, is_dst=True)
+    except pytz.NonExistentTimeError:
+        # Clocks spring forward: shift past the gap (02:30 becomes 03:30)
+        return tz.normalize(tz.localize(naive, is_dst=False))
+
+# Helper to compute the next UTC time a user's check-in is due, or None if they opted out
+def next_checkin_utc(prefs: dict, after: datetime.datetime) -> Optional[datetime.datetime]:
+    if not prefs.get("opt_in", True):
+        return None
+    checkin_prefs = prefs.get("checkin_time", {})
+    hour = checkin_prefs.get("hour", DAILY_CHECK_HOUR_EST)
+    minute = checkin_prefs.get("minute", 0)
+    tz = get_checkin_timezone(prefs)
+
+    local_day = after.astimezone(tz).date()
+    for offset in range(-1, 3):
+        fire = localize_wall_time(tz, local_day + datetime.timedelta(days=offset), hour, minute)
+        if fire >= after:
+            return fire.astimezone(pytz.utc)
+    return None
+
+class CheckinScheduler:
+    """Keeps every member's next check-in time in a min-heap and sleeps until the earliest one is due.
+
+    Prefs are read once on load; afterwards only users whose prefs change are re-planned.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._heap: list[tuple[datetime.datetime, str]] = []
+        self._planned: Dict[str, datetime.datetime] = {}
+        self._prefs: Dict[str, dict] = {}
+        self._wakeup = asyncio.Event()
+
+    async def load(self):
+        self._prefs = await repo.all_prefs()
+        now = datetime.datetime.now(pytz.utc)
+        member_ids = {str(m.id) for m in bot.get_all_members() if not m.bot}
+        for user_id in member_ids:
+            self._plan(user_id, now - CHECKIN_GRACE)
+        self.loaded = True
+        print(f"⏰ Planned check-ins for {len(self._planned)} of {len(member_ids)} members")
+
+    def _plan(self, user_id: str, after: datetime.datetime):
+        fire = next_checkin_utc(self._prefs.get(user_id, {}), after)
+        if fire is None:
+            self._planned.pop(user_id, None)
+            return
+        self._planned[user_id] = fire
+        heapq.heappush(self._heap, (fire, user_id))
+
+    def replan(self, user_id: str, prefs_update: Optional[dict] = None):
+        """Re-plan one user after their prefs changed; `prefs_update` is merged like a Firestore merge-set."""
+        if prefs_update:
+            prefs = self._prefs.setdefault(user_id, {})
+            for key, value in prefs_update.items():
+                if isinstance(value, dict) and isinstance(prefs.get(key), dict):
+                    prefs[key] = {**prefs[key], **value}
+                else:
+                    prefs[key] = value
+        self._plan(user_id, datetime.datetime.now(pytz.utc))
+        self._wakeup.set()
+
+    def set_prefs(self, user_id: str, prefs: Optional[dict]):
+        """Replace one user's prefs after they changed outside this process, and re-plan them."""
+        if not self.loaded:
+            return  # Loading reads every user's current prefs anyway
+        if prefs is None:
+            self._prefs.pop(user_id, None)
+        else:
+            self._prefs[user_id] = dict(prefs)
+        if user_id in self._planned or bot.get_user(int(user_id)) is not None:
+            self.replan(user_id)
+
+    def remove(self, user_id: str):
+        # Stale heap entries are skipped when popped
+        self._planned.pop(user_id, None)
+
+    def next_fire(self, user_id: str) -> Optional[datetime.datetime]:
+        return self._planned.get(user_id)
+
+    def local_date_str(self, user_id: str, fire: datetime.datetime) -> str:
+        return fire.astimezone(get_checkin_timezone(self._prefs.get(user_id, {}))).strftime("%Y-%m-%d")
+
+    def pop_due(self, now: datetime.datetime) -> list[tuple[str, datetime.datetime]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire, user_id = heapq.heappop(self._heap)
+            if self._planned.get(user_id) != fire:
+                continue
+            due.append((user_id, fire))
+            # Plan tomorrow's check-in straight away
+            self._plan(user_id, fire + datetime.timedelta(seconds=1))
+        return due
+
+    async def wait_for_due(self) -> list[tuple[str, datetime.datetime]]:
+        while True:
+            now = datetime.datetime.now(pytz.utc)
+            due = self.pop_due(now)
+            if due:
+                return due
+            # Cap the sleep so wall-clock jumps are picked up within the hour
+            delay = 3600.0
+            if self._heap:
+                delay = min(delay, max((self._heap[0][0] - now).total_seconds(), 0))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+checkin_scheduler = CheckinScheduler()
+
+# --- OUTSIDE CHANGES ---
+# With STORAGE_MIRROR=1, edits that reach Firestore from elsewhere (the console, another instance)
+# arrive through the mirror and are applied to the in-memory indexes here. Each handler is
+# idempotent, so an echo of this bot's own write that races the mirror update is harmless.
+SUMMARY_REFOLD_DELAY = 1.0  # Lets a progress edit and an override edit to one user land together
+pending_refolds: Dict[str, asyncio.Task] = {}
+
+async def refold_summary(user_id: str):
+    """Rebuild one user's summary from their progress and override if it no longer matches them."""
+    progress, override = await repo.get_progress(user_id), await repo.get_override(user_id)
+    summary = summary_from_records(progress, override)
+    if summary == await repo.get_summary(user_id):
+        return
+    if summary is None:
+        await repo.delete_summary(user_id)
+        rank_index.remove(user_id)
+    else:
+        await save_level_summary(user_id, summary)
+    print(f"🪞 Refolded the leaderboard summary of {user_id} after an outside change")
+
+async def refold_later(user_id: str):
+    await asyncio.sleep(SUMMARY_REFOLD_DELAY)
+    del pending_refolds[user_id]  # Changes from here on schedule another pass
+    metrics.current_operation.set("mirror refold")
     try:
-        await user.send("🧠 Did your level increase today? Reply with `yes` or `no`.")
+        await refold_summary(user_id)
     except Exception as e:
-        print(f"DM error: {e}")
+        print(f"❌ Could not refold the summary of {user_id}: {e}")
+
+def schedule_refold(user_id: str):
+    if user_id not in pending_refolds:
+        pending_refolds[user_id] = asyncio.create_task(refold_later(user_id))
+
+def on_progress_changed(user_id: str, data: Optional[dict]):
+    level_matrix.remove(user_id)
+    for date_str, level in (data or {}).get("entries", {}).items():
+        try:
+            level_matrix.set(user_id, data.get("username", "?"), date_str, level if isinstance(level, int) else -1)
+        except ValueError:
+            continue  # Not a date
+    schedule_refold(user_id)
+
+def on_summary_changed(user_id: str, data: Optional[dict]):
+    if data is None:
+        rank_index.remove(user_id)
+    else:
+        rank_index.update(user_id, data.get("username", "?"), data.get("score", -1))
+
+def on_override_changed(user_id: str, data: Optional[dict]):
+    schedule_refold(user_id)
+
+def on_prefs_changed(user_id: str, data: Optional[dict]):
+    checkin_scheduler.set_prefs(user_id, data)
+
+def subscribe_to_outside_changes():
+    repo.subscribe("level_progress", on_progress_changed)
+    repo.subscribe("leaderboard_stats", on_summary_changed)
+    repo.subscribe("leaderboard_overrides", on_override_changed)
+    repo.subscribe("user_prefs", on_prefs_changed)
+
+subscribe_to_outside_changes()
 
 # --- ADMIN CHECK DECORATOR ---
 def is_admin_role():
@@ -336,32 +1204,95 @@ def is_admin_role():
         return any(role.name == ADMIN_ROLE_NAME for role in member.roles)
     return app_commands.check(predicate)
 
+# --- COMMAND SYNC ---
+# Syncing the command tree is rate limited, so each scope (global, and the guild) is only
+# synced when a hash of its serialized commands differs from the last one synced.
+# The hashes live in the "command_sync" meta record; /forcesync ignores them.
+bot_initialized = False
+
+def command_tree_payload(guild: Optional[discord.abc.Snowflake] = None) -> list[dict]:
+    payload = []
+    for command in bot.tree.get_commands(guild=guild):
+        try:
+            payload.append(command.to_dict(bot.tree))
+        except TypeError:
+            payload.append(command.to_dict())  # discord.py < 2.4
+    return sorted(payload, key=lambda c: (c.get("type", 1), c["name"]))
+
+def command_tree_fingerprint(guild: Optional[discord.abc.Snowflake] = None) -> str:
+    serialized = json.dumps(command_tree_payload(guild), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+async def sync_command_tree(force: bool = False) -> dict[str, Optional[int]]:
+    """Sync scopes whose commands changed; returns scope → commands synced (None if skipped)."""
+    synced_hashes = (await repo.get_meta("command_sync") or {}).get("hashes", {})
+    results = {}
+    for scope, guild in (("global", None), (f"guild_{GUILD_ID}", discord.Object(id=GUILD_ID))):
+        fingerprint = command_tree_fingerprint(guild)
+        if not force and synced_hashes.get(scope) == fingerprint:
+            results[scope] = None
+            continue
+        synced = await bot.tree.sync(guild=guild)
+        await repo.set_meta("command_sync", {"hashes": {scope: fingerprint}}, merge=True)
+        results[scope] = len(synced)
+
+    for scope, count in results.items():
+        if count is None:
+            print(f"🔁 Commands unchanged for {scope}, skipped sync")
+        else:
+            print(f"🔁 Synced {count} commands for {scope}")
+    return results
+
 # --- READY ---
 @bot.event
 async def on_ready():
     print(f"✅ Logged in as {bot.user}")
+    report = startup.profiler.finish("on_ready")
+    if report:
+        print(report)
+
+    # Reconnects fire on_ready again; only the role cache can have gone stale while disconnected
+    guild = bot.get_guild(GUILD_ID)
+    if guild:
+        role_bands.refresh(guild)
+    global bot_initialized
+    if bot_initialized:
+        print("🔌 Reconnected; commands, stats and tasks are already in place")
+        return
+    bot_initialized = True
+
     try:
-        # Try guild-specific sync first
-        synced = await bot.tree.sync(guild=discord.Object(id=GUILD_ID))
-        print(f"🔁 Synced {len(synced)} commands to guild {GUILD_ID}")
-        
-        # If no commands synced to guild, try global sync as fallback
-        if len(synced) == 0:
-            print("⚠️ No commands synced to guild, trying global sync...")
-            global_synced = await bot.tree.sync()
-            print(f"🌍 Synced {len(global_synced)} commands globally")
-            
+        await sync_command_tree()
     except Exception as e:
         print(f"❌ Sync failed: {e}")
-        # Try global sync as fallback
+
+    try:
+        await repo.migrate()
+    except Exception as e:
+        print(f"❌ Storage migration failed: {e}")
+
+    try:
+        await rebuild_leaderboard_stats()
+        await rank_index.load()
+    except Exception as e:
+        print(f"❌ Leaderboard stats load failed: {e}")
+
+    if LEVEL_MATRIX_MAX_MB > 0:
         try:
-            global_synced = await bot.tree.sync()
-            print(f"🌍 Fallback: Synced {len(global_synced)} commands globally")
-        except Exception as e2:
-            print(f"❌ Global sync also failed: {e2}")
-    
-    daily_checkin_task.start()
-    weekly_report_task.start()
+            await level_matrix.load(repo.all_progress)
+        except Exception as e:
+            print(f"❌ Level matrix load failed, reading levels from storage: {e}")
+
+    try:
+        await role_bands.load_config()
+    except Exception as e:
+        print(f"❌ Level band config load failed, using defaults: {e}")
+    if guild:
+        role_bands.refresh(guild)
+
+    for task in (daily_checkin_task, weekly_report_task, state_sweep_task):
+        if not task.is_running():
+            task.start()
 
 # --- MESSAGE HANDLER ---
 @bot.event
@@ -371,6 +1302,8 @@ async def on_message(message: discord.Message):
     if isinstance(message.channel, discord.DMChannel):
         uid = str(message.author.id)
         text = message.content.strip().lower()
+        # They can clearly receive DMs again
+        dm_dispatcher.revive(uid)
         if uid in pending_level_check:
             state = pending_level_check[uid]
             if state == "asked":
@@ -390,53 +1323,113 @@ async def on_message(message: discord.Message):
                     await message.channel.send("❌ Please enter a number.")
     await bot.process_commands(message)
 
+# --- MEMBER EVENTS ---
+@bot.event
+async def on_member_join(member: discord.Member):
+    if not member.bot and checkin_scheduler.loaded:
+        checkin_scheduler.replan(str(member.id))
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    checkin_scheduler.remove(str(member.id))
+
+# --- ROLE EVENTS ---
+# Keep the band → role ID index in step with the guild's roles
+@bot.event
+async def on_guild_role_create(role: discord.Role):
+    if role.guild.id == GUILD_ID:
+        role_bands.refresh(role.guild)
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    if after.guild.id == GUILD_ID and before.name != after.name:
+        role_bands.refresh(after.guild)
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    if role.guild.id == GUILD_ID:
+        role_bands.refresh(role.guild)
+
 # --- DAILY CHECK-IN LOOP ---
-@tasks.loop(minutes=10)
+@tasks.loop()
 async def daily_checkin_task():
     await bot.wait_until_ready()
-    now_utc = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
-    today_str = get_today_date_str()
-
-    for member in bot.get_all_members():
-        if member.bot:
+    repo.new_scope()
+    metrics.current_operation.set("daily_checkin_task")
+    if not checkin_scheduler.loaded:
+        await checkin_scheduler.load()
+
+    # Sleeps until the earliest planned check-in (or a re-plan) instead of polling every member
+    due = await checkin_scheduler.wait_for_due()
+    started = time.perf_counter()
+    for user_id, fire in due:
+        local_day = checkin_scheduler.local_date_str(user_id, fire)
+        if last_checkin_sent.get(user_id) == local_day:
+            continue
+        user = bot.get_user(int(user_id))
+        if user is None or dm_dispatcher.is_dead(user_id):
             continue
 
-        user_id = str(member.id)
-        prefs = db.collection("user_prefs").document(user_id).get().to_dict() or {}
-        
-        # Get check-in time settings
-        checkin_prefs = prefs.get("checkin_time", {})
-        tz = pytz.timezone(checkin_prefs.get("timezone", "US/Eastern"))
-        check_hour = checkin_prefs.get("hour", DAILY_CHECK_HOUR_EST)
-        check_minute = checkin_prefs.get("minute", 0)
-        
-        # Check if time matches
-        now_user = now_utc.astimezone(tz)
-        if (now_user.hour == check_hour and 
-            now_user.minute >= check_minute and 
-            now_user.minute < check_minute + 10):
-            
-            if last_checkin_sent.get(user_id) == today_str:
-                continue
+        last_checkin_sent[user_id] = local_day
+        pending_level_check[user_id] = "asked"
+        # Queued, not awaited: a batch of due users fans out across the dispatcher's workers
+        send_checkin(user)
+    metrics.task_seconds.observe(time.perf_counter() - started, task="daily_checkin_task")
+
+# --- STATE SWEEP LOOP ---
+@tasks.loop(minutes=15)
+@metrics.timed_task("state_sweep_task")
+async def state_sweep_task():
+    removed = state_store.sweep()
+    if removed:
+        print(f"🧹 Expired {removed} conversation state entries")
 
-            last_checkin_sent[user_id] = today_str
-            await send_checkin(member)
 # --- WEEKLY REPORT LOOP ---
-@tasks.loop(hours=168)
-async def weekly_report_task():
-    await bot.wait_until_ready()
-    channel = bot.get_channel(REPORT_CHANNEL_ID)
-    if not isinstance(channel, discord.abc.Messageable):
-        print("⚠️ Report channel not messageable.")
-        return
-    
-    docs = db.collection("level_progress").stream()
-    dates = get_week_dates()
+# Large guilds: plot the top movers individually and everyone else as percentile bands,
+# so the chart costs the same to draw whether there are 50 members or 5,000
+async def render_large_weekly_report(dates: list[str], movers: dict[str, list[Optional[int]]], bands: dict, others: int) -> list[bytes]:
+    images = min(max(WEEKLY_REPORT_IMAGES, 1), 10)  # Discord allows 10 attachments per message
+    names = list(movers)
+    per_image = max(-(-len(names) // images), 1)
+    chunks = [names[i:i + per_image] for i in range(0, len(names), per_image)] or [[]]
+    return await asyncio.gather(*(
+        chart_service.render(
+            render_weekly_report,
+            dates=dates,
+            bands=bands,
+            movers={user: movers[user] for user in chunk},
+            others=others,
+            title="📈 Weekly Level Progress" + (f" ({i}/{len(chunks)})" if len(chunks) > 1 else ""),
+        )
+        for i, chunk in enumerate(chunks, 1)
+    ))
+
+# Each returns the week's chart(s), or none if nobody has a level this week, and the five biggest gains
+async def weekly_report_from_matrix(dates: list[str]) -> tuple[list[bytes], list[tuple[str, int]]]:
+    start, end = dates[0], dates[-1]
+    movers = level_matrix.movers(start, end, max(WEEKLY_REPORT_TOP_N, 5))
+    top_improved = [(username, gain) for _, username, gain in movers[:5]]
+    # Only users with a level this week
+    active = level_matrix.activity(start, end).nonzero()[0].tolist()
+    if not active:
+        return [], top_improved
+    if len(active) <= WEEKLY_REPORT_FULL_LIMIT:
+        user_data = {level_matrix.names[i]: level_matrix.values_for(level_matrix.user_ids[i], start, end) for i in active}
+        return [await chart_service.render(render_weekly_progress, dates=dates, user_data=user_data)], top_improved
+    # Only the movers become lists; the bands are computed on the matrix window as it is
+    movers = movers[:WEEKLY_REPORT_TOP_N]
+    rest = level_matrix.levels(start, end, exclude=tuple(user_id for user_id, _, _ in movers))
+    bands = await asyncio.to_thread(compute_percentile_bands, rest)
+    lines = {username: level_matrix.values_for(user_id, start, end) for user_id, username, _ in movers}
+    return await render_large_weekly_report(dates, lines, bands, len(rest)), top_improved
+
+async def weekly_report_from_storage(dates: list[str]) -> tuple[list[bytes], list[tuple[str, int]]]:
+    # Only users with an entry this week
+    progress = await repo.progress_between(dates[0], dates[-1])
     user_data = {}
     weekly_gains = {}
     
-    for doc in docs:
-        d = doc.to_dict() or {}
+    for d in progress.values():
         username = d.get("username", "?")
         entries = d.get("entries", {})
         values = [entries.get(day, None if day not in entries else -1) for day in dates]
@@ -451,30 +1444,46 @@ async def weekly_report_task():
             weekly_gains[username] = valid_values[0]
         else:
             weekly_gains[username] = 0
+    top_improved = heapq.nlargest(5, weekly_gains.items(), key=lambda x: x[1])
     
     if not user_data:
-        return
+        return [], top_improved
     
     # Create graph
-    plt.figure(figsize=(12, 8))
-    for user, values in user_data.items():
-        plt.plot(dates, values, marker='o', label=user, linewidth=2)
-    plt.title("📈 Weekly Level Progress", fontsize=16)
-    plt.xlabel("Date", fontsize=12)
-    plt.ylabel("Level", fontsize=12)
-    plt.grid(True, alpha=0.3)
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
+    if len(user_data) <= WEEKLY_REPORT_FULL_LIMIT:
+        return [await chart_service.render(render_weekly_progress, dates=dates, user_data=user_data)], top_improved
+    movers = [user for user, _ in heapq.nlargest(WEEKLY_REPORT_TOP_N, weekly_gains.items(), key=lambda x: x[1])]
+    mover_set = set(movers)
+    rest = [values for user, values in user_data.items() if user not in mover_set]
+    # Plain NumPy, not a chart: a thread is enough, and it should not count as a render or take a cache slot
+    bands = await asyncio.to_thread(compute_percentile_bands, rest)
+    return await render_large_weekly_report(dates, {user: user_data[user] for user in movers}, bands, len(rest)), top_improved
+
+@tasks.loop(hours=168)
+@metrics.timed_task("weekly_report_task")
+async def weekly_report_task():
+    await bot.wait_until_ready()
+    repo.new_scope()
+    channel = bot.get_channel(REPORT_CHANNEL_ID)
+    if not isinstance(channel, discord.abc.Messageable):
+        print("⚠️ Report channel not messageable.")
+        return
+    
+    dates = get_week_dates()
+    if level_matrix.covers(dates[0]):
+        pngs, top_improved = await weekly_report_from_matrix(dates)
+    else:
+        pngs, top_improved = await weekly_report_from_storage(dates)
     
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=150, bbox_inches='tight')
-    buf.seek(0)
+    if not pngs:
+        return
+    files = [
+        discord.File(io.BytesIO(png), filename="weekly_progress.png" if len(pngs) == 1 else f"weekly_progress_{i}.png")
+        for i, png in enumerate(pngs, 1)
+    ]
     
     # Get current and previous week leaderboards
-    current_scores = get_all_time_scores()[:10]
-    
-    # Most improved users
-    top_improved = sorted(weekly_gains.items(), key=lambda x: x[1], reverse=True)[:5]
+    current_scores = await get_all_time_scores(limit=10)
     
     # Create report text
     report_text = "📊 **Weekly Progress Report**\n\n"
@@ -490,7 +1499,7 @@ async def weekly_report_task():
     for i, (user, total) in enumerate(current_scores[:5], 1):
         report_text += f"`{i}.` **{user}** — {total} total levels\n"
     
-    await channel.send(report_text, file=discord.File(buf, filename="weekly_progress.png"))
+    await channel.send(report_text, files=files)
 
 # --- COMMANDS ---
 @bot.tree.command(name="ping", description="Check bot latency")
@@ -540,7 +1549,7 @@ async def help_cmd(interaction: discord.Interaction):
     admin = discord.Embed(
         title=f"🛠️ BrainBot Help - Admin Commands",
         color=0xe74c3c,
-        description=f"Available to: {', '.join(ADMIN_ROLES) or 'Administrators'}"
+        description=f"Available to: {ADMIN_ROLE_NAME or 'Administrators'}"
     )
     admin.add_field(
         name="📈 Level Management",
@@ -548,7 +1557,8 @@ async def help_cmd(interaction: discord.Interaction):
             "`/setlevel` - Set user's current level\n"
             "`/leaderboardoverride` - Adjust LB display\n"
             "`/viewoverrides` - View active overrides\n"
-            "`/clearoverride` - Remove an override"
+            "`/clearoverride` - Remove an override\n"
+            "`/reloadbands` - Reload level role bands"
         ),
         inline=False
     )
@@ -636,31 +1646,29 @@ async def view_log(
     """View paginated audit log with filters"""
     await interaction.response.defer(ephemeral=True)
     
-    # Query logs with filters
-    query = db.collection("audit_log").order_by("timestamp", direction=firestore.Query.DESCENDING)
-    
-    if user_filter:
-        query = query.where("user_id", "==", str(user_filter.id))
-    if action_filter:
-        query = query.where("action_type", "==", action_filter)
-    
-    logs = [doc.to_dict() for doc in query.stream()]
+    # Pages are fetched on demand, so the first one costs the same however long the history is
+    pager = repo.audit_pager(str(user_filter.id) if user_filter else None, action_filter, AUDIT_LOG_PAGE_SIZE)
+    first_page, total = await asyncio.gather(
+        pager.page(0),
+        get_audit_count(str(user_filter.id) if user_filter else None, action_filter)
+    )
     
-    if not logs:
+    if not first_page:
         await interaction.followup.send("📭 No log entries found matching your criteria.", ephemeral=True)
         return
     
-    # Split logs into pages (5 entries per page)
-    pages = []
-    for i in range(0, len(logs), 5):
-        page_logs = logs[i:i+5]
+    def build_page(page: int, logs: list) -> discord.Embed:
+        if total is not None:
+            description = f"Showing page {page + 1} of ~{max(-(-total // AUDIT_LOG_PAGE_SIZE), page + 1)} (~{total} total entries)"
+        else:
+            description = f"Showing page {page + 1}"
         embed = discord.Embed(
             title="📜 Audit Log",
             color=0x7289da,
-            description=f"Showing {len(logs)} total entries"
+            description=description
         )
         
-        for log in page_logs:
+        for log in logs:
             timestamp = log.get("timestamp", "Unknown")
             action = log.get("action", "Unknown action")
             admin = log.get("admin", "System")
@@ -677,37 +1685,36 @@ async def view_log(
                 inline=False
             )
         
-        pages.append(embed)
+        return embed
     
     # Pagination view
     class LogView(discord.ui.View):
-        def __init__(self, pages: list):
+        def __init__(self):
             super().__init__(timeout=120)
-            self.pages = pages
             self.current_page = 0
             self.update_buttons()
         
         def update_buttons(self):
             self.prev_page.disabled = self.current_page == 0
-            self.next_page.disabled = self.current_page == len(self.pages) - 1
+            self.next_page.disabled = not pager.has_next(self.current_page)
         
-        @discord.ui.button(label="◀️", style=discord.ButtonStyle.blurple)
-        async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
-            self.current_page -= 1
+        async def show(self, interaction: discord.Interaction):
+            logs = await pager.page(self.current_page)
             self.update_buttons()
             await interaction.response.edit_message(
-                embed=self.pages[self.current_page],
+                embed=build_page(self.current_page, logs),
                 view=self
             )
         
+        @discord.ui.button(label="◀️", style=discord.ButtonStyle.blurple)
+        async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+            self.current_page -= 1
+            await self.show(interaction)
+        
         @discord.ui.button(label="▶️", style=discord.ButtonStyle.blurple)
         async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
             self.current_page += 1
-            self.update_buttons()
-            await interaction.response.edit_message(
-                embed=self.pages[self.current_page],
-                view=self
-            )
+            await self.show(interaction)
         
         @discord.ui.button(label="🗑️", style=discord.ButtonStyle.red)
         async def delete(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -715,84 +1722,78 @@ async def view_log(
             await interaction.delete_original_response()
     
     await interaction.followup.send(
-        embed=pages[0],
-        view=LogView(pages),
+        embed=build_page(0, first_page),
+        view=LogView(),
         ephemeral=True
     )
 
 @bot.tree.command(name="myprogress", description="Show your weekly level graph")
 async def myprogress(interaction: discord.Interaction):
     uid = str(interaction.user.id)
-    doc = db.collection("level_progress").document(uid).get()
-    data = doc.to_dict() or {}
-    entries = data.get("entries", {})
     dates = get_week_dates()
-    values = [entries.get(day, None if day not in entries else -1) for day in dates]
-    clean = [v if isinstance(v, int) and v >= 0 else None for v in values]
-    plt.figure(figsize=(8, 5))
-    plt.plot(dates, clean, marker='o', label=interaction.user.name)
-    plt.title(f"{interaction.user.name}'s Weekly Progress")
-    plt.xlabel("Date")
-    plt.ylabel("Level")
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    await interaction.response.send_message("📊 Sent you a DM with your progress!", ephemeral=True)
-    await interaction.user.send(file=discord.File(buf, filename="my_progress.png"))
+    if level_matrix.covers(dates[0]):
+        clean = level_matrix.values_for(uid, dates[0], dates[-1])
+    else:
+        data = await repo.get_progress(uid) or {}
+        entries = data.get("entries", {})
+        values = [entries.get(day, None if day not in entries else -1) for day in dates]
+        clean = [v if isinstance(v, int) and v >= 0 else None for v in values]
+    await interaction.response.defer(ephemeral=True)
+    png = await chart_service.render(render_user_progress, username=interaction.user.name, dates=dates, values=clean)
+    await interaction.followup.send("📊 Sent you a DM with your progress!", ephemeral=True)
+    await interaction.user.send(file=discord.File(io.BytesIO(png), filename="my_progress.png"))
 
 @bot.tree.command(name="mystats", description="Show all your level check-ins, streak, and average")
 async def mystats(interaction: discord.Interaction):
-    user_id = str(interaction.user.id)
-    entries = await get_user_entries(user_id)
-    if not entries:
+    # One summary read; the stats are kept up to date on every check-in
+    summary = await repo.get_summary(str(interaction.user.id))
+    if not summary or not summary.get("checkins"):
         await interaction.response.send_message("No level check-ins recorded yet.", ephemeral=True)
         return
 
-    # Sort dates ascending
-    sorted_dates = sorted(entries.keys())
-    levels = [entries[d] for d in sorted_dates]
-
-    # Calculate streak (consecutive days with check-in)
-    from datetime import datetime, timedelta
-    dates_dt = [datetime.strptime(d, "%Y-%m-%d") for d in sorted_dates]
-    streak = 1
-    for i in range(len(dates_dt) - 1, 0, -1):
-        if (dates_dt[i] - dates_dt[i-1]) == timedelta(days=1):
-            streak += 1
-        else:
-            break
-
-    avg_level = mean(levels)
-    text = (
-        f"📊 **Your Level Stats**\n"
-        f"Check-ins: {len(levels)}\n"
-        f"Current streak: {streak} day(s)\n"
-        f"Average level: {avg_level:.2f}\n"
-        f"Latest level: {levels[-1]} on {sorted_dates[-1]}"
-    )
-    await interaction.response.send_message(text, ephemeral=True)
+    stats = level_stats(summary, get_today_date_str())
+
+    def delta(value: Optional[int]) -> str:
+        return f"{value:+d}" if value is not None else "—"
+
+    lines = [
+        "📊 **Your Level Stats**",
+        f"Check-ins: {stats['checkins']}",
+        f"Current streak: {stats['current_streak']} day(s) (longest: {stats['longest_streak']})",
+        f"Average level: {stats['average']:.2f}",
+        f"Latest level: {stats['latest_level']} on {stats['latest_date']}" if stats["latest_level"] is not None
+        else f"Latest check-in: {summary['last_date']}",
+        f"Personal best: {stats['best_level']} on {stats['best_date']}",
+        f"Last 7 days: {delta(stats['delta_7'])} | Last 30 days: {delta(stats['delta_30'])}",
+    ]
+    if stats["velocity"] is not None:
+        lines.append(f"Pace: {stats['velocity']:+.2f} levels/day over the last {RECENT_DAYS} days")
+    if stats["days_since"] > 1:
+        lines.append(f"Last check-in: {stats['days_since']} days ago")
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
 
 @bot.tree.command(name="myrank", description="See your rank on the leaderboard")
 async def myrank(interaction: discord.Interaction):
-    docs = db.collection("level_progress").stream()
-    scores = []
-    for doc in docs:
-        d = doc.to_dict() or {}
-        username = d.get("username", "?")
-        total = sum(v for v in d.get("entries", {}).values() if isinstance(v, int) and v >= 0)
-        scores.append((doc.id, username, total))
-    scores.sort(key=lambda x: x[2], reverse=True)
-
     user_id = str(interaction.user.id)
-    rank = next((i + 1 for i, (uid, _, _) in enumerate(scores) if uid == user_id), None)
+    if not rank_index.loaded:
+        # Until on_ready has loaded the index, a missing rank would not mean "no levels"
+        await interaction.response.send_message("⏳ The leaderboard is still loading, try again in a minute.", ephemeral=True)
+        return
+    # Same ranking as /leaderboard: highest level, with overrides applied
+    rank = rank_index.rank(user_id)
     if rank is None:
         await interaction.response.send_message("You have no recorded levels yet.", ephemeral=True)
         return
-    total_score = scores[rank - 1][2]
-    await interaction.response.send_message(f"🏅 Your rank is #{rank} with a total of {total_score} levels.", ephemeral=True)
+    level = rank_index.score(user_id)
+    # The users just above and below, from the same index
+    nearby = "\n".join(
+        f"{'👉 ' if uid == user_id else ''}`#{r}` {name} — {score}"
+        for r, uid, name, score in rank_index.around(user_id)
+    )
+    await interaction.response.send_message(
+        f"🏅 Your rank is #{rank} of {len(rank_index)} with a highest level of {level}.\n{nearby}",
+        ephemeral=True
+    )
 
 @bot.tree.command(name="nextcheckin", description="Tells you when the next check-in is scheduled")
 async def nextcheckin(interaction: discord.Interaction):
@@ -801,10 +1802,18 @@ async def nextcheckin(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     tz = await get_user_timezone(user_id)
 
-    now = datetime.now(tz)
-    next_checkin = now.replace(hour=DAILY_CHECK_HOUR_EST, minute=0, second=0, microsecond=0)
-    if now >= next_checkin:
-        next_checkin += timedelta(days=1)
+    # Prefer the scheduler's plan so this matches when the DM actually goes out
+    planned = checkin_scheduler.next_fire(user_id)
+    if planned is not None:
+        next_checkin = planned.astimezone(tz)
+    elif checkin_scheduler.loaded:
+        await interaction.response.send_message("🔕 You're opted out of daily check-ins. Use `/optin` to re-enable them.", ephemeral=True)
+        return
+    else:
+        now = datetime.now(tz)
+        next_checkin = now.replace(hour=DAILY_CHECK_HOUR_EST, minute=0, second=0, microsecond=0)
+        if now >= next_checkin:
+            next_checkin += timedelta(days=1)
 
     formatted = next_checkin.strftime("%Y-%m-%d %H:%M %Z")
     await interaction.response.send_message(f"⏰ Next daily check-in is scheduled at {formatted}.", ephemeral=True)
@@ -820,9 +1829,45 @@ async def optout(interaction: discord.Interaction):
     await interaction.response.send_message("✅ You have opted out of daily DM check-ins.", ephemeral=True)
 
 
+# --- TIMEZONE LOOKUP ---
+# Cities resolve against an offline index (tz zone cities, common aliases, and optionally a
+# GeoNames dump at GAZETTEER_PATH) in microseconds. Nominatim is only asked, off the event loop,
+# when the offline index has no confident match and GEOCODER_FALLBACK is on.
+gazetteer = Gazetteer.load(os.getenv("GAZETTEER_PATH"))
+timezone_index = TimezoneIndex()
+startup.profiler.mark("gazetteer")
+GEOCODER_FALLBACK = os.getenv("GEOCODER_FALLBACK", "1") == "1"
+
+@functools.lru_cache(maxsize=1)
+def _online_geocoder():
+    # Built on first use; TimezoneFinder loads its polygon data when constructed
+    from geopy.geocoders import Nominatim
+    from timezonefinder import TimezoneFinder
+    return Nominatim(user_agent="level-bot"), TimezoneFinder()
+
+@functools.lru_cache(maxsize=256)
+def _geocode_online(city: str) -> Optional[tuple[str, str]]:
+    geolocator, tzfinder = _online_geocoder()
+    location = geolocator.geocode(city, timeout=5)
+    if not location:
+        return None
+    timezone = tzfinder.timezone_at(lat=location.latitude, lng=location.longitude)
+    return (timezone, location.address) if timezone in pytz.all_timezones_set else None
+
+async def resolve_city_timezone(city: str) -> Optional[tuple[str, str]]:
+    """(timezone, place description) for a city name or tz name, or None if it can't be found."""
+    city = city.strip()
+    if city in pytz.all_timezones_set:
+        return city, city
+    place = gazetteer.resolve(city)
+    if place:
+        return place.timezone, place.label
+    if GEOCODER_FALLBACK:
+        return await asyncio.to_thread(_geocode_online, city)
+    return None
 
-geolocator = Nominatim(user_agent="level-bot")
-tzfinder = TimezoneFinder()
+def timezone_choices(current: str, limit: int = 25) -> list[app_commands.Choice[str]]:
+    return [app_commands.Choice(name=zone, value=zone) for zone in timezone_index.suggest(current, limit)]
 
 @bot.tree.command(name="settimezone", description="Set your timezone using your city name (e.g. London, Mumbai)")
 @app_commands.describe(city="Your city name")
@@ -830,23 +1875,31 @@ async def settimezone(interaction: discord.Interaction, city: str):
     await interaction.response.defer(ephemeral=True)
 
     try:
-        location = geolocator.geocode(city)
-        if not location:
+        resolved = await resolve_city_timezone(city)
+        if not resolved:
             await interaction.followup.send("❌ Could not find that city. Try a more specific name.", ephemeral=True)
             return
+        timezone, place = resolved
 
-        timezone = tzfinder.timezone_at(lat=location.latitude, lng=location.longitude)
-        if timezone not in pytz.all_timezones:
-            await interaction.followup.send("❌ Found coordinates, but couldn't determine a valid timezone.", ephemeral=True)
-            return
-
-        db.collection("user_prefs").document(str(interaction.user.id)).set({"timezone": timezone}, merge=True)
-        await interaction.followup.send(f"✅ Timezone set to `{timezone}` based on `{location.address}`", ephemeral=True)
+        await repo.update_prefs(str(interaction.user.id), {"timezone": timezone})
+        checkin_scheduler.replan(str(interaction.user.id), {"timezone": timezone})
+        await interaction.followup.send(f"✅ Timezone set to `{timezone}` based on `{place}`", ephemeral=True)
 
     except Exception as e:
         print(f"[TZ SET ERROR] {e}")
         await interaction.followup.send("⚠️ An error occurred while detecting timezone.", ephemeral=True)
 
+@settimezone.autocomplete("city")
+async def settimezone_city_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    choices = [
+        app_commands.Choice(name=f"{place.label} ({place.timezone})"[:100], value=f"{place.name}, {place.country}"[:100])
+        for place in gazetteer.suggest(current, limit=25)
+    ]
+    # Typing a tz name directly ("Europe/", "US/Eastern") also works
+    if len(choices) < 25:
+        choices += timezone_choices(current, 25 - len(choices))
+    return choices
+
 @bot.tree.command(name="dailyfact", description="Get a random fun fact")
 async def dailyfact(interaction: discord.Interaction):
     fact = random.choice(DAILY_FACTS)
@@ -857,6 +1910,69 @@ async def motivation(interaction: discord.Interaction):
     quote = random.choice(MOTIVATIONAL_QUOTES)
     await interaction.response.send_message(quote)
 
+ALL_TIME_LEADERBOARD_TITLE = "🏆 All-Time Leaderboard (Highest Level Achieved)"
+LEADERBOARD_PAGE_SIZE = 10
+
+def build_leaderboard_embed(title: str, rows: list, highlight_id: Optional[str] = None) -> discord.Embed:
+    embed = discord.Embed(title=title, color=0x00ff00)
+    
+    # Top 3 get special medals
+    medals = ["🥇", "🥈", "🥉"]
+    for rank, user_id, name, level in rows:
+        if rank <= 3:
+            prefix = medals[rank-1]
+        else:
+            prefix = f"`{rank}.`"
+        if user_id == highlight_id:
+            name = f"➡️ {name}"
+        embed.add_field(
+            name=f"{prefix} {name}",
+            value=f"Level: {level}",
+            inline=False
+        )
+    return embed
+
+# Paged all-time leaderboard served from the rank index
+class LeaderboardView(discord.ui.View):
+    def __init__(self, owner_id: int):
+        super().__init__(timeout=120)
+        self.page = 0
+        self.highlight_id = str(owner_id)
+
+    @property
+    def page_count(self) -> int:
+        return max((len(rank_index) - 1) // LEADERBOARD_PAGE_SIZE + 1, 1)
+
+    def build_embed(self) -> discord.Embed:
+        self.page = min(self.page, self.page_count - 1)
+        rows = rank_index.slice(self.page * LEADERBOARD_PAGE_SIZE, LEADERBOARD_PAGE_SIZE)
+        embed = build_leaderboard_embed(ALL_TIME_LEADERBOARD_TITLE, rows, self.highlight_id)
+        embed.set_footer(text=f"Page {self.page + 1}/{self.page_count} • {len(rank_index)} ranked users")
+        self.prev_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+        return embed
+
+    @discord.ui.button(label="◀️", style=discord.ButtonStyle.blurple)
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(self.page - 1, 0)
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="▶️", style=discord.ButtonStyle.blurple)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="📍 Jump to me", style=discord.ButtonStyle.grey)
+    async def jump_to_me(self, interaction: discord.Interaction, button: discord.ui.Button):
+        user_id = str(interaction.user.id)
+        pos = rank_index.position(user_id)
+        if pos is None:
+            await interaction.response.send_message("You have no recorded levels yet.", ephemeral=True)
+            return
+        self.page = pos // LEADERBOARD_PAGE_SIZE
+        self.highlight_id = user_id
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
 @bot.tree.command(name="leaderboard", description="Show leaderboard with optional filters")
 @app_commands.describe(filter="Choose time period: week, month, or alltime")
 @app_commands.choices(filter=[
@@ -865,65 +1981,52 @@ async def motivation(interaction: discord.Interaction):
     app_commands.Choice(name="All Time (Highest Level)", value="alltime")
 ])
 async def leaderboard(interaction: discord.Interaction, filter: str = "alltime"):
-    docs = db.collection("level_progress").stream()
-    scores = []
-    
+    if filter == "alltime" and rank_index.loaded:
+        if not len(rank_index):
+            await interaction.response.send_message(f"📭 No data found for {filter} period.")
+            return
+        view = LeaderboardView(interaction.user.id)
+        await interaction.response.send_message(embed=view.build_embed(), view=view)
+        return
+
     if filter == "week":
+        period = ("week_key", get_week_key(get_today_date_str()))
         dates = get_week_dates()
+        field = "week_max"
         title = "🏆 Weekly Leaderboard (Highest Level This Week)"
     elif filter == "month":
+        period = ("month_key", get_month_key(get_today_date_str()))
         dates = get_month_dates()
+        field = "month_max"
         title = "🏆 Monthly Leaderboard (Highest Level This Month)"
     else:
+        period = None
         dates = None
-        title = "🏆 All-Time Leaderboard (Highest Level Achieved)"
-    
-    for doc in docs:
-        d = doc.to_dict() or {}
-        username = d.get("username", "?")
-        entries = d.get("entries", {})
-        
-        if dates:  # For weekly/monthly - get highest in period
-            period_levels = [v for k, v in entries.items() 
-                           if k in dates and isinstance(v, int) and v >= 0]
-            if period_levels:
-                highest = max(period_levels)
-                scores.append((username, highest))
-        else:  # For all-time - get absolute highest
-            all_levels = [v for v in entries.values() 
-                         if isinstance(v, int) and v >= 0]
-            if all_levels:
-                highest = max(all_levels)
-                scores.append((username, highest))
+        field = "score"
+        title = ALL_TIME_LEADERBOARD_TITLE
     
-    scores.sort(key=lambda x: x[1], reverse=True)
+    if dates and level_matrix.covers(dates[0]):
+        # One max over the period's columns, no reads at all
+        top = level_matrix.top(level_matrix.period_max(dates[0], dates[-1]), 10)
+        rows = [(i, user_id, username, level) for i, (user_id, username, level) in enumerate(top, 1)]
+    else:
+        # Only the top 10 summaries are read, however many users there are
+        top = await repo.top_summaries(field, 10, period)
+        rows = []
+        for i, (user_id, d) in enumerate(top, 1):
+            if d.get(field, -1) >= 0:
+                rows.append((i, user_id, d.get("username", "?"), d[field]))
     
-    if not scores:
+    if not rows:
         await interaction.response.send_message(f"📭 No data found for {filter} period.")
         return
     
-    embed = discord.Embed(title=title, color=0x00ff00)
-    
-    # Top 3 get special medals
-    medals = ["🥇", "🥈", "🥉"]
-    for i, (name, level) in enumerate(scores[:10], 1):
-        if i <= 3:
-            prefix = medals[i-1]
-        else:
-            prefix = f"`{i}.`"
-        embed.add_field(
-            name=f"{prefix} {name}",
-            value=f"Level: {level}",
-            inline=False
-        )
-    
-    await interaction.response.send_message(embed=embed)
+    await interaction.response.send_message(embed=build_leaderboard_embed(title, rows))
 
 @bot.tree.command(name="levelof", description="Show user's latest level")
 @app_commands.describe(user="User to check")
 async def levelof(interaction: discord.Interaction, user: discord.Member):
-    doc = db.collection("level_progress").document(str(user.id)).get()
-    data = doc.to_dict()
+    data = await repo.get_progress(str(user.id))
     if not data or "entries" not in data:
         await interaction.response.send_message("No data found.", ephemeral=True)
         return
@@ -942,7 +2045,8 @@ async def checkin(interaction: discord.Interaction):
         await interaction.response.send_message("Check-in already sent. Respond to the DM.", ephemeral=True)
     else:
         pending_level_check[uid] = "asked"
-        await send_checkin(interaction.user)
+        dm_dispatcher.revive(uid)
+        send_checkin(interaction.user)
         await interaction.response.send_message("📩 Check your DMs!", ephemeral=True)
 
 # --- ADMIN COMMANDS ---
@@ -953,13 +2057,11 @@ async def forcesync(interaction: discord.Interaction):
     await interaction.response.send_message("🔄 Syncing commands...", ephemeral=True)
     
     try:
-        synced = await bot.tree.sync(guild=discord.Object(id=GUILD_ID))
-        await interaction.edit_original_response(content=f"✅ Synced {len(synced)} commands to guild!")
-        
-        # If no commands synced, try global
-        if len(synced) == 0:
-            global_synced = await bot.tree.sync()
-            await interaction.edit_original_response(content=f"✅ Synced {len(global_synced)} commands globally!")
+        # Ignores the stored fingerprints, e.g. after commands were changed outside the bot
+        results = await sync_command_tree(force=True)
+        await interaction.edit_original_response(
+            content=f"✅ Synced {results['global']} commands globally and {results[f'guild_{GUILD_ID}']} to the guild!"
+        )
             
     except Exception as e:
         await interaction.edit_original_response(content="❌ Failed to sync commands.")
@@ -970,13 +2072,28 @@ async def forcesync(interaction: discord.Interaction):
 @app_commands.describe(user="User to update", level="New level")
 async def setlevel(interaction: discord.Interaction, user: discord.Member, level: int):
     await save_level_entry(str(user.id), user.name, level)
+    await log_audit("level", f"Set level to {level}", interaction.user.name, str(user.id))
     await interaction.response.send_message(f"✅ Set {user.name}'s level to {level}.", ephemeral=True)
 
 @bot.tree.command(name="resetuser", description="Admin: Reset all user progress")
 @is_admin_role()
 @app_commands.describe(user="User to reset")
 async def resetuser(interaction: discord.Interaction, user: discord.Member):
-    db.collection("level_progress").document(str(user.id)).delete()
+    await repo.delete_progress(str(user.id))
+    level_matrix.remove(str(user.id))
+    # Drop the summary too, keeping any leaderboard override in place
+    override = await repo.get_override(str(user.id))
+    if override is not None:
+        await save_level_summary(str(user.id), {
+            "username": user.name,
+            "all_time_max": -1,
+            "override_level": override["override_level"],
+            "score": override["override_level"]
+        })
+    else:
+        await repo.delete_summary(str(user.id))
+        rank_index.remove(str(user.id))
+    await log_audit("level", "Reset all progress", interaction.user.name, str(user.id))
     await interaction.response.send_message(f"🗑️ Cleared all data for {user.name}.", ephemeral=True)
 
 @bot.tree.command(name="announce", description="Admin: Send announcement to check-in channel")
@@ -995,30 +2112,66 @@ async def announce(interaction: discord.Interaction, message: str):
 @app_commands.describe(user="User to warn", reason="Reason for warning")
 async def warnings(interaction: discord.Interaction, user: discord.Member, reason: str):
     await add_warning(str(user.id), user.name, reason, str(interaction.user.id))
+    await log_audit("warning", f"Warned: {reason}", interaction.user.name, str(user.id))
     await interaction.response.send_message(f"⚠️ Warning logged for {user.mention}: {reason}", ephemeral=True)
 
 @bot.tree.command(name="viewwarnings", description="Admin: View warnings for a user")
 @is_admin_role()
 @app_commands.describe(user="User to check warnings for")
 async def viewwarnings(interaction: discord.Interaction, user: discord.Member):
-    warnings = await get_warnings(str(user.id))
-    if not warnings:
-        await interaction.response.send_message(f"✅ {user.mention} has no warnings.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    user_id = str(user.id)
+    count = await get_warning_count(user_id)
+    if not count:
+        await interaction.followup.send(f"✅ {user.mention} has no warnings.", ephemeral=True)
         return
-    
-    text = f"⚠️ **Warnings for {user.mention}:**\n"
-    for i, warning in enumerate(warnings, 1):
-        timestamp = warning.get("timestamp", "Unknown")
-        reason = warning.get("reason", "No reason provided")
-        text += f"`{i}.` {timestamp[:10]} - {reason}\n"
-    
-    await interaction.response.send_message(text, ephemeral=True)
+
+    pager = get_warnings(user_id)
+
+    def build_text(page: int, warnings: list) -> str:
+        text = f"⚠️ **Warnings for {user.mention}** ({count} total, newest first):\n"
+        for i, warning in enumerate(warnings):
+            timestamp = warning.get("timestamp", "Unknown")
+            reason = warning.get("reason", "No reason provided")
+            # Numbered oldest = 1, so a warning keeps its number as pages move
+            text += f"`{count - page * pager.page_size - i}.` {timestamp[:10]} - {reason}\n"
+        return text
+
+    class WarningsView(discord.ui.View):
+        def __init__(self):
+            super().__init__(timeout=120)
+            self.current_page = 0
+        
+        def update_buttons(self):
+            self.prev_page.disabled = self.current_page == 0
+            self.next_page.disabled = not pager.has_next(self.current_page)
+        
+        async def show(self, interaction: discord.Interaction):
+            warnings = await pager.page(self.current_page)
+            self.update_buttons()
+            await interaction.response.edit_message(content=build_text(self.current_page, warnings), view=self)
+        
+        @discord.ui.button(label="◀️", style=discord.ButtonStyle.blurple)
+        async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+            self.current_page -= 1
+            await self.show(interaction)
+        
+        @discord.ui.button(label="▶️", style=discord.ButtonStyle.blurple)
+        async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+            self.current_page += 1
+            await self.show(interaction)
+
+    first_page = await pager.page(0)
+    view = WarningsView()
+    view.update_buttons()
+    await interaction.followup.send(build_text(0, first_page), view=view, ephemeral=True)
 
 @bot.tree.command(name="clearwarnings", description="Admin: Clear all warnings for a user")
 @is_admin_role()
 @app_commands.describe(user="User to clear warnings for")
 async def clearwarnings(interaction: discord.Interaction, user: discord.Member):
     await clear_warnings(str(user.id))
+    await log_audit("warning", "Cleared all warnings", interaction.user.name, str(user.id))
     await interaction.response.send_message(f"✅ Cleared all warnings for {user.mention}.", ephemeral=True)
 
 @bot.tree.command(name="shoutout", description="Admin: Give a shoutout to a user")
@@ -1052,13 +2205,15 @@ async def leaderboard_override(
         return
 
     # Store the override
-    LEADERBOARD_OVERRIDES.document(str(user.id)).set({
+    await repo.set_override(str(user.id), {
         "username": user.name,
         "override_level": leaderboard_level,
         "reason": reason,
         "admin": interaction.user.name,
         "timestamp": datetime.datetime.now(EST).isoformat()
     })
+    await apply_override_to_stats(str(user.id), user.name, leaderboard_level)
+    await log_audit("override", f"Set leaderboard override to {leaderboard_level}: {reason}", interaction.user.name, str(user.id))
 
     await interaction.response.send_message(
         f"✅ Leaderboard override set for {user.mention}\n"
@@ -1071,15 +2226,14 @@ async def leaderboard_override(
 @is_admin_role()
 async def view_overrides(interaction: discord.Interaction):
     """Lists all active leaderboard overrides"""
-    overrides = LEADERBOARD_OVERRIDES.stream()
+    overrides = await repo.all_overrides()
     
     embed = discord.Embed(
         title="🏆 Active Leaderboard Overrides",
         color=discord.Color.orange()
     )
     
-    for override in overrides:
-        data = override.to_dict()
+    for data in overrides.values():
         embed.add_field(
             name=f"👤 {data['username']}",
             value=(
@@ -1098,7 +2252,9 @@ async def view_overrides(interaction: discord.Interaction):
 @app_commands.describe(user="User to clear override for")
 async def clear_override(interaction: discord.Interaction, user: discord.Member):
     """Removes a leaderboard override, reverting to actual levels"""
-    LEADERBOARD_OVERRIDES.document(str(user.id)).delete()
+    await repo.delete_override(str(user.id))
+    await apply_override_to_stats(str(user.id), user.name, None)
+    await log_audit("override", "Removed leaderboard override", interaction.user.name, str(user.id))
     await interaction.response.send_message(
         f"✅ Removed leaderboard override for {user.mention}",
         ephemeral=True
@@ -1129,13 +2285,14 @@ async def set_my_checkin_time(
         return
     
     # Save preference
-    db.collection("user_prefs").document(user_id).set({
+    await repo.update_prefs(user_id, {
         "checkin_time": {
             "hour": hour,
             "minute": minute,
             "timezone": str(user_tz)  # Store for admin reference
         }
-    }, merge=True)
+    })
+    checkin_scheduler.replan(user_id, {"checkin_time": {"hour": hour, "minute": minute, "timezone": str(user_tz)}})
     
     await interaction.response.send_message(
         f"✅ Your daily check-in time set to {hour:02d}:{minute:02d} {user_tz}",
@@ -1185,7 +2342,7 @@ async def set_checkin_time_admin(
         return
     
     # Save preference
-    db.collection("user_prefs").document(user_id).set({
+    await repo.update_prefs(user_id, {
         "checkin_time": {
             "hour": hour,
             "minute": minute,
@@ -1193,7 +2350,9 @@ async def set_checkin_time_admin(
             "admin_override": True,
             "set_by_admin": interaction.user.name
         }
-    }, merge=True)
+    })
+    checkin_scheduler.replan(user_id, {"checkin_time": {"hour": hour, "minute": minute, "timezone": str(tz)}})
+    await log_audit("checkin", f"Set check-in time to {hour:02d}:{minute:02d} {tz}", interaction.user.name, user_id)
     
     await interaction.response.send_message(
         f"✅ {user.mention}'s check-in time set to {hour:02d}:{minute:02d} {tz}\n"
@@ -1201,9 +2360,33 @@ async def set_checkin_time_admin(
         ephemeral=True
     )
 
+@set_checkin_time_admin.autocomplete("timezone")
+async def set_checkin_time_timezone_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    return timezone_choices(current)
+
+@bot.tree.command(name="reloadbands", description="Admin: Reload level role bands from storage")
+@is_admin_role()
+async def reloadbands(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    role_bands.set_bands(LEVEL_ROLES)
+    await role_bands.load_config()
+    guild = bot.get_guild(GUILD_ID)
+    if guild:
+        role_bands.refresh(guild)
+    lines = [
+        f"`{name}`: {low}–{'∞' if high == float('inf') else high}" + ("" if guild and role_bands.role(guild, name) else " (no role yet)")
+        for name, (low, high) in role_bands.bands.items()
+    ]
+    await log_audit("level", "Reloaded level role bands", interaction.user.name)
+    await interaction.followup.send("🎚️ **Level bands:**\n" + "\n".join(lines), ephemeral=True)
+
 @bot.tree.command(name="syncroles", description="Admin: Sync all user roles based on their current levels")
 @is_admin_role()
-async def syncroles(interaction: discord.Interaction):
+@app_commands.describe(
+    dry_run="Only report what would change",
+    resume="Continue the unfinished changes from the last interrupted sync"
+)
+async def syncroles(interaction: discord.Interaction, dry_run: bool = False, resume: bool = False):
     await interaction.response.defer(ephemeral=True)
 
     guild = bot.get_guild(GUILD_ID)
@@ -1216,109 +2399,75 @@ async def syncroles(interaction: discord.Interaction):
         await interaction.followup.send("❌ I need the 'Manage Roles' permission.", ephemeral=True)
         return
 
-    updated_count = 0
-    failed_count = 0
-    docs = db.collection("level_progress").stream()
-
-    report_lines = ["**Role Sync Report**"]
-
-    for doc in docs:
-        try:
-            user_id = doc.id
-            data = doc.to_dict() or {}
-            entries = data.get("entries", {})
-            username = data.get("username", "Unknown")
-
-            # Get highest level
-            valid_levels = [v for k, v in entries.items() 
-                          if isinstance(v, int) and v >= 0 and k != "username"]
-
-            if not valid_levels:
-                report_lines.append(f"⚠️ {username}: No valid level entries")
-                failed_count += 1
-                continue
-
-            highest_level = max(valid_levels)
-            member = guild.get_member(int(user_id))
-
-            if not member:
-                report_lines.append(f"⚠️ {username}: Not in server")
-                failed_count += 1
-                continue
-
-            # Get current level roles to remove
-            current_roles = [role for role in member.roles if role.name in LEVEL_ROLES]
-
-            # Get target role
-            target_role_name = get_role_for_level(highest_level)
-            if not target_role_name:
-                report_lines.append(f"⚠️ {username}: No role for level {highest_level}")
-                failed_count += 1
-                continue
-
-            target_role = discord.utils.get(guild.roles, name=target_role_name)
-            if not target_role:
-                try:
-                    target_role = await guild.create_role(
-                        name=target_role_name,
-                        reason="Auto-created by level sync"
-                    )
-                    report_lines.append(f"➕ Created new role: {target_role_name}")
-                except Exception as e:
-                    report_lines.append(f"❌ Failed to create role {target_role_name}: {str(e)}")
-                    failed_count += 1
-                    continue
-
-            # Skip if already has the correct role
-            if target_role in member.roles and not current_roles:
-                report_lines.append(f"✅ {member.display_name}: Already correct ({target_role_name})")
-                continue
+    if role_sync.running:
+        await interaction.followup.send("⏳ A role sync is already running.", ephemeral=True)
+        return
 
+    report_lines = ["Role Sync Report" + (" (dry run)" if dry_run else "")]
+    unfinished = role_sync.unfinished(guild) if resume else []
+    if unfinished:
+        changes, correct = unfinished, 0
+        report_lines.append(f"Resuming {len(changes)} unfinished changes")
+    else:
+        await interaction.edit_original_response(content="🔍 Comparing levels with current roles...")
+        changes, plan_report, correct = await role_sync.plan(guild, create_missing=not dry_run)
+        report_lines += plan_report
+
+    if dry_run:
+        for change in changes:
+            missing = " (role would be created)" if change.add_name and not change.add else ""
+            report_lines.append(f"🔁 {change.describe()}{missing}")
+        summary = (
+            f"**Dry run completed**\n"
+            f"🔁 Would update: {len(changes)}\n"
+            f"✅ Already correct: {correct}\n"
+            f"📄 Full report attached."
+        )
+    else:
+        total = len(changes)
+        last_edit = 0.0
+
+        # One message edited in place, at most every few seconds
+        async def on_progress(updated: int, failed: int):
+            nonlocal last_edit
+            now = asyncio.get_running_loop().time()
+            if now - last_edit < 3:
+                return
+            last_edit = now
             try:
-                # Remove old roles
-                if current_roles:
-                    await member.remove_roles(*current_roles, reason="Level sync")
-                    removed_names = ", ".join(r.name for r in current_roles)
-                    report_lines.append(f"➖ {member.display_name}: Removed {removed_names}")
-
-                # Add new role
-                await member.add_roles(target_role, reason=f"Level sync: {highest_level}")
-                report_lines.append(f"➕ {member.display_name}: Added {target_role_name} (Level {highest_level})")
-                updated_count += 1
-
-            except discord.Forbidden:
-                report_lines.append(f"❌ {member.display_name}: Missing permissions")
-                failed_count += 1
-            except discord.HTTPException as e:
-                report_lines.append(f"❌ {member.display_name}: Error: {str(e)}")
-                failed_count += 1
-
-        except Exception as e:
-            report_lines.append(f"❌ Error processing user {doc.id}: {str(e)}")
-            failed_count += 1
-
-    # Send the report
-    summary = (
-        f"**Sync completed**\n"
-        f"✅ Updated: {updated_count}\n"
-        f"⚠️ Failed: {failed_count}\n"
-        f"📄 Details below:"
-    )
-
-    # Split report into chunks to avoid message length limits
-    chunk_size = 15
-    report_chunks = [report_lines[i:i + chunk_size] 
-                    for i in range(0, len(report_lines), chunk_size)]
+                await interaction.edit_original_response(content=f"🔄 Syncing roles: {updated + failed}/{total} done ({failed} failed)")
+            except discord.HTTPException:
+                pass
 
-    await interaction.followup.send(summary, ephemeral=True)
+        await interaction.edit_original_response(content=f"🔄 Syncing roles: 0/{total} done")
+        updated_count, failed_count, apply_report = await role_sync.apply(changes, on_progress)
+        report_lines += apply_report
+        summary = (
+            f"**Sync completed**\n"
+            f"✅ Updated: {updated_count}\n"
+            f"✔️ Already correct: {correct}\n"
+            f"⚠️ Failed: {failed_count}\n"
+            + (f"⏸️ {len(role_sync.pending)} unfinished; run `/syncroles resume:True` to retry\n" if role_sync.pending else "")
+            + f"📄 Full report attached."
+        )
 
-    for chunk in report_chunks:
-        await interaction.followup.send("\n".join(chunk), ephemeral=True)     
+    report = discord.File(io.BytesIO("\n".join(report_lines).encode()), filename="role_sync_report.txt")
+    try:
+        await interaction.edit_original_response(content=summary, attachments=[report])
+    except discord.HTTPException:
+        # The interaction token expires after 15 minutes; very long syncs report by DM instead
+        report = discord.File(io.BytesIO("\n".join(report_lines).encode()), filename="role_sync_report.txt")
+        await interaction.user.send(summary, file=report)
 
 # --- ERROR HANDLER ---
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    record_command(interaction, "ok")
+
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error):
     print(f"[SLASH ERROR] {error}")
+    record_command(interaction, "error")
     try:
         if isinstance(error, app_commands.errors.MissingRole):
             await interaction.response.send_message("🚫 You don't have permission.", ephemeral=True)
@@ -1328,4 +2477,6 @@ async def on_app_command_error(interaction: discord.Interaction, error):
         print(f"[RESPONSE ERROR] {e}")
 
 # --- START ---
-bot.run(TOKEN)
+if __name__ == "__main__":
+    startup.profiler.mark("module loaded")
+    bot.run(TOKEN)
@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+
+# --- RENDERERS (run inside the worker processes) ---
+def _pyplot():
+    # Imported lazily so only the worker processes pay for matplotlib
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def _to_png(plt, fig, **savefig_kwargs) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", **savefig_kwargs)
+    plt.close(fig)
+    return buf.getvalue()
+
+def render_user_progress(username: str, dates: list[str], values: list[Optional[int]]) -> bytes:
+    plt = _pyplot()
+    fig = plt.figure(figsize=(8, 5))
+    plt.plot(dates, values, marker='o', label=username)
+    plt.title(f"{username}'s Weekly Progress")
+    plt.xlabel("Date")
+    plt.ylabel("Level")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    return _to_png(plt, fig)
+
+def render_weekly_progress(dates: list[str], user_data: dict[str, list[Optional[int]]]) -> bytes:
+    plt = _pyplot()
+    fig = plt.figure(figsize=(12, 8))
+    for user, values in user_data.items():
+        plt.plot(dates, values, marker='o', label=user, linewidth=2)
+    plt.title("📈 Weekly Level Progress", fontsize=16)
+    plt.xlabel("Date", fontsize=12)
+    plt.ylabel("Level", fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    return _to_png(plt, fig, dpi=150, bbox_inches='tight')
+
+def compute_percentile_bands(matrix, percentiles: tuple = (10, 25, 50, 75, 90)) -> dict:
+    """Per-day percentiles over a users × days matrix: lists with None, or a float array with NaN, for no level."""
+    import numpy as np
+    import warnings
+    values = np.asarray(matrix, dtype=float).reshape(len(matrix), -1)  # None becomes NaN
+    with warnings.catch_warnings():
+        # Days nobody reported are all-NaN columns; they come back as NaN, which is what we want
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        bands = np.nanpercentile(values, percentiles, axis=0) if values.size else np.empty((len(percentiles), 0))
+    result = {f"p{p}": [None if np.isnan(v) else float(v) for v in row] for p, row in zip(percentiles, bands)}
+    result["reporting"] = np.count_nonzero(~np.isnan(values), axis=0).tolist()
+    return result
+
+def render_weekly_report(dates: list[str], bands: dict, movers: dict[str, list[Optional[int]]], others: int, title: str) -> bytes:
+    """Large-guild weekly chart: top movers as lines over percentile bands for everyone else."""
+    plt = _pyplot()
+    import numpy as np
+
+    def band(key):
+        return np.array([np.nan if v is None else v for v in bands[key]], dtype=float)
+
+    x = np.arange(len(dates))
+    fig = plt.figure(figsize=(12, 8))
+    if others:
+        plt.fill_between(x, band("p10"), band("p90"), color="tab:gray", alpha=0.15, label=f"10th–90th percentile ({others} others)")
+        plt.fill_between(x, band("p25"), band("p75"), color="tab:gray", alpha=0.3, label="25th–75th percentile")
+        plt.plot(x, band("p50"), color="tab:gray", linestyle="--", linewidth=2, label="Median")
+    for user, values in movers.items():
+        plt.plot(x, [np.nan if v is None else v for v in values], marker='o', label=user, linewidth=2)
+    plt.xticks(x, dates)
+    plt.title(title, fontsize=16)
+    plt.xlabel("Date", fontsize=12)
+    plt.ylabel("Level", fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    return _to_png(plt, fig, dpi=150, bbox_inches='tight')
+
+def _warm_up() -> bool:
+    _pyplot()
+    return True
+
+
+# --- SERVICE ---
+class ChartServiceUnavailable(Exception):
+    """Raised by `ChartService.render` when there is no worker pool to render in."""
+
+
+class ChartService:
+    """Renders charts in a process pool and caches the PNG bytes by a hash of their inputs."""
+
+    def __init__(self, workers: int = 2, cache_size: int = 128):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.queue_depth = 0
+        self.renders = 0
+        self.cache_hits = 0
+        self.render_times: deque[float] = deque(maxlen=200)
+        self.broken: Optional[str] = None  # Why the pool is gone, once a worker has died
+
+    def start(self, warm: bool = True):
+        """Create the pool and, if `warm`, have every worker import matplotlib in the background.
+
+        Workers are forked rather than spawned: spawning (or a forkserver) would re-execute
+        bot.py in each child. Call this before anything starts threads, including the Firestore
+        client's gRPC channel, so the fork is clean. Warm-up is not waited on, so it overlaps
+        with start-up instead of delaying it.
+        The pool is never re-created later: forking a threaded process can deadlock the child.
+        """
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+        )
+        if warm:
+            for _ in range(self.workers):
+                self._executor.submit(_warm_up)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def cache_key(renderer: Callable, kwargs: dict) -> str:
+        payload = json.dumps([renderer.__name__, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def render(self, renderer: Callable[..., bytes], **kwargs) -> bytes:
+        """Render `renderer(**kwargs)` off the event loop and return PNG bytes."""
+        key = self.cache_key(renderer, kwargs)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+        # Identical requests already rendering share the same result
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.cache_hits += 1
+            return await asyncio.shield(inflight)
+
+        if self._executor is None:
+            raise ChartServiceUnavailable(self.broken or "ChartService.start() was not called before the bot started")
+        loop = asyncio.get_running_loop()
+        inflight = loop.create_future()
+        self._inflight[key] = inflight
+        self.queue_depth += 1
+        started = time.perf_counter()
+        try:
+            png = await loop.run_in_executor(self._executor, functools.partial(renderer, **kwargs))
+        except BaseException as e:
+            if isinstance(e, BrokenProcessPool):
+                # A worker died. Re-forking now could deadlock, so charts stay down until a restart
+                self.broken = f"chart worker died: {e}"
+                print(f"[CHART] ❌ {self.broken}; charts are unavailable until the bot restarts")
+                self.close()
+            if isinstance(e, Exception):
+                inflight.set_exception(e)
+                # Mark it retrieved so an unshared failure does not log "exception was never retrieved"
+                inflight.exception()
+            else:
+                inflight.cancel()
+            raise
+        finally:
+            self.queue_depth -= 1
+            self._inflight.pop(key, None)
+
+        self.renders += 1
+        self.render_times.append(time.perf_counter() - started)
+
+        self._cache[key] = png
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        inflight.set_result(png)
+        return png
+
+    def render_quantile(self, q: float) -> float:
+        """Render time at quantile `q` over the last 200 renders (NaN before the first)."""
+        times = sorted(self.render_times)
+        return times[min(int(len(times) * q), len(times) - 1)] if times else float("nan")
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.renders + self.cache_hits
+        return self.cache_hits / requests if requests else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "renders": self.renders,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "hit_rate": self.hit_rate,
+            "p50_render_seconds": self.render_quantile(0.5),
+            "p95_render_seconds": self.render_quantile(0.95),
+        }
@@ -0,0 +1,256 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Callable, NamedTuple, Optional
+
+import discord
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class DMJob(NamedTuple):
+    user: discord.abc.User
+    content: str
+    future: asyncio.Future
+    enqueued: float
+    attempt: int
+    on_failed: Optional[Callable[[str], None]]
+
+
+class DMDispatcher:
+    """Sends DMs from a worker pool, paced by a global and a per-route token bucket.
+
+    Transient failures (429s, 5xx, network errors) are retried with exponential backoff, and
+    only given up on for that one message once retries run out. Users whose DMs are closed go
+    to a dead-letter list instead, and are skipped until they are revived. On shutdown, `close`
+    lets the queue drain for a while and gives up on whatever is left, so no caller is left waiting.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        global_rate: float = 40.0,
+        route_rate: float = 1.0,
+        route_burst: float = 5.0,
+        max_retries: int = 4,
+        base_delay: float = 2.0,
+        max_dead_letters: int = 1000,
+        report_after: int = 10,
+    ):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.route_rate = route_rate
+        self.route_burst = route_burst
+        self._routes: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._retrying: dict[int, tuple[asyncio.TimerHandle, DMJob]] = {}  # Jobs waiting out a backoff
+        self._closing = False
+        self.dead_letters: OrderedDict[str, str] = OrderedDict()  # user_id -> reason
+        self.max_dead_letters = max_dead_letters
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.latencies: deque[float] = deque(maxlen=500)
+        self.queue_lags: deque[float] = deque(maxlen=500)
+        self._outstanding = 0  # Submitted DMs not yet sent or given up on, including ones waiting to retry
+        self._since_report = 0
+        self.report_after = report_after  # Smaller batches (e.g. a single reply) are not logged
+
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker(), name=f"dm-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def close(self, timeout: float = 10.0):
+        """Send what is already queued for up to `timeout` seconds, then give up on the rest."""
+        self._closing = True
+        for handle, job in list(self._retrying.values()):
+            handle.cancel()
+            self._give_up(job, str(job.user.id), "Bot shutting down")
+        self._retrying.clear()
+        if self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"[DM] {self._queue.qsize()} DM(s) still queued after {timeout:g}s at shutdown")
+        await self.stop()
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._give_up(job, str(job.user.id), "Bot shutting down")
+            self._queue.task_done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def is_dead(self, user_id: str) -> bool:
+        return user_id in self.dead_letters
+
+    def revive(self, user_id: str):
+        """Take a user off the dead-letter list (e.g. after they DM the bot)."""
+        self.dead_letters.pop(user_id, None)
+
+    def submit(self, user: discord.abc.User, content: str, on_failed: Optional[Callable[[str], None]] = None) -> asyncio.Future:
+        """Queue a DM; the returned future resolves to True once sent, False if it was given up on."""
+        future = asyncio.get_running_loop().create_future()
+        self._outstanding += 1
+        job = DMJob(user, content, future, time.monotonic(), 0, on_failed)
+        if self._closing:
+            self._give_up(job, str(user.id), "Bot shutting down")
+            return future
+        self.start()
+        self._queue.put_nowait(job)
+        return future
+
+    async def send(self, user: discord.abc.User, content: str) -> bool:
+        return await self.submit(user, content)
+
+    def _route_bucket(self, user: discord.abc.User) -> TokenBucket:
+        # Opening a DM channel and posting to it are separate Discord routes
+        key = f"dm:{user.id}" if getattr(user, "dm_channel", None) else "dm-open"
+        bucket = self._routes.get(key)
+        if bucket is None:
+            rate = self.route_rate * 5 if key == "dm-open" else self.route_rate
+            bucket = self._routes[key] = TokenBucket(rate, self.route_burst)
+            # Drop idle per-user buckets so memory stays bounded
+            while len(self._routes) > 10000:
+                old_key, old = next(iter(self._routes.items()))
+                if not old.idle:
+                    break
+                del self._routes[old_key]
+        self._routes.move_to_end(key)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._deliver(job)
+            except asyncio.CancelledError:
+                # Stopped mid-send: report the job as not sent rather than leave its caller waiting
+                self._give_up(job, str(job.user.id), "Bot shutting down")
+                raise
+            except Exception as e:
+                print(f"[DM] Dispatcher error: {e}")
+                self._give_up(job, str(job.user.id), f"Dispatcher error: {e}")
+            finally:
+                self._queue.task_done()
+                self._maybe_report()
+
+    async def _deliver(self, job: DMJob):
+        user_id = str(job.user.id)
+        if job.attempt == 0:
+            self.queue_lags.append(time.monotonic() - job.enqueued)
+        await self.global_bucket.acquire()
+        await self._route_bucket(job.user).acquire()
+
+        started = time.monotonic()
+        try:
+            await job.user.send(job.content)
+        except discord.Forbidden:
+            # DMs closed or the bot is blocked: retrying will not help
+            self._dead_letter(job, user_id, "DMs closed")
+            return
+        except (discord.HTTPException, OSError, asyncio.TimeoutError) as e:
+            status = getattr(e, "status", None)
+            if (status is None or status == 429 or status >= 500) and job.attempt < self.max_retries and not self._closing:
+                self.retried += 1
+                delay = self.base_delay * 2 ** job.attempt * random.uniform(0.8, 1.2)
+                retry = job._replace(attempt=job.attempt + 1)
+                self._retrying[id(retry)] = (asyncio.get_running_loop().call_later(delay, self._requeue, retry), retry)
+                return
+            # Discord or the network is having trouble, not the user: the next check-in tries again
+            self._give_up(job, user_id, f"HTTP {status}: {e}" if status else str(e))
+            return
+
+        self.latencies.append(time.monotonic() - started)
+        self.sent += 1
+        self._finish(job, True)
+
+    def _requeue(self, job: DMJob):
+        self._retrying.pop(id(job), None)
+        self._queue.put_nowait(job)
+
+    def _dead_letter(self, job: DMJob, user_id: str, reason: str):
+        self.dead_letters[user_id] = reason
+        self.dead_letters.move_to_end(user_id)
+        while len(self.dead_letters) > self.max_dead_letters:
+            self.dead_letters.popitem(last=False)
+        self._give_up(job, user_id, reason)
+
+    def _give_up(self, job: DMJob, user_id: str, reason: str):
+        if job.future.done():
+            return
+        self.failed += 1
+        print(f"[DM] Gave up on {user_id}: {reason}")
+        if job.on_failed:
+            job.on_failed(reason)
+        self._finish(job, False)
+
+    def _finish(self, job: DMJob, sent: bool):
+        if not job.future.done():
+            job.future.set_result(sent)
+            self._outstanding -= 1
+            self._since_report += 1
+
+    def _maybe_report(self):
+        # Once per batch: when the last DM of it is sent or given up on, retries included
+        if self._outstanding == 0 and self._since_report:
+            batch, self._since_report = self._since_report, 0
+            if batch < self.report_after:
+                return
+            stats = self.stats()
+            print(
+                f"[DM] Queue drained after {batch} DMs: {stats['sent']} sent, {stats['failed']} failed, {stats['retried']} retries, "
+                f"p50 latency {stats['latency_p50']:.2f}s, max queue lag {stats['queue_lag_max']:.1f}s"
+            )
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "queued": self.queue_depth,
+            "dead_letters": len(self.dead_letters),
+            "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "latency_p95": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] if latencies else 0.0,
+            "queue_lag_max": max(self.queue_lags, default=0.0),
+        }
@@ -0,0 +1,267 @@
+import bisect
+import difflib
+import functools
+import os
+import re
+import unicodedata
+from typing import NamedTuple, Optional
+
+import pytz
+
+
+class Place(NamedTuple):
+    name: str
+    country: str  # ISO 3166 alpha-2 code
+    lat: float
+    lng: float
+    timezone: str
+    population: int = 0
+
+    @property
+    def label(self) -> str:
+        country = pytz.country_names.get(self.country, self.country)
+        return f"{self.name}, {country}"
+
+
+# Large cities that are not the namesake of their tz zone: (name, country, lat, lng, timezone)
+CITY_ALIASES = [
+    ("Mumbai", "IN", 19.07, 72.88, "Asia/Kolkata"),
+    ("Delhi", "IN", 28.65, 77.23, "Asia/Kolkata"),
+    ("New Delhi", "IN", 28.61, 77.21, "Asia/Kolkata"),
+    ("Bangalore", "IN", 12.97, 77.59, "Asia/Kolkata"),
+    ("Bengaluru", "IN", 12.97, 77.59, "Asia/Kolkata"),
+    ("Chennai", "IN", 13.08, 80.27, "Asia/Kolkata"),
+    ("Hyderabad", "IN", 17.38, 78.49, "Asia/Kolkata"),
+    ("Beijing", "CN", 39.90, 116.41, "Asia/Shanghai"),
+    ("Shenzhen", "CN", 22.54, 114.06, "Asia/Shanghai"),
+    ("Guangzhou", "CN", 23.13, 113.26, "Asia/Shanghai"),
+    ("Osaka", "JP", 34.69, 135.50, "Asia/Tokyo"),
+    ("Busan", "KR", 35.18, 129.08, "Asia/Seoul"),
+    ("Abu Dhabi", "AE", 24.45, 54.38, "Asia/Dubai"),
+    ("Washington", "US", 38.90, -77.04, "America/New_York"),
+    ("Boston", "US", 42.36, -71.06, "America/New_York"),
+    ("Philadelphia", "US", 39.95, -75.17, "America/New_York"),
+    ("Miami", "US", 25.76, -80.19, "America/New_York"),
+    ("Atlanta", "US", 33.75, -84.39, "America/New_York"),
+    ("Toronto", "CA", 43.65, -79.38, "America/Toronto"),
+    ("Montreal", "CA", 45.50, -73.57, "America/Toronto"),
+    ("Dallas", "US", 32.78, -96.80, "America/Chicago"),
+    ("Houston", "US", 29.76, -95.37, "America/Chicago"),
+    ("Austin", "US", 30.27, -97.74, "America/Chicago"),
+    ("Minneapolis", "US", 44.98, -93.27, "America/Chicago"),
+    ("Seattle", "US", 47.61, -122.33, "America/Los_Angeles"),
+    ("San Francisco", "US", 37.77, -122.42, "America/Los_Angeles"),
+    ("San Diego", "US", 32.72, -117.16, "America/Los_Angeles"),
+    ("Portland", "US", 45.52, -122.68, "America/Los_Angeles"),
+    ("Las Vegas", "US", 36.17, -115.14, "America/Los_Angeles"),
+    ("Salt Lake City", "US", 40.76, -111.89, "America/Denver"),
+    ("Rio de Janeiro", "BR", -22.91, -43.17, "America/Sao_Paulo"),
+    ("Manchester", "GB", 53.48, -2.24, "Europe/London"),
+    ("Birmingham", "GB", 52.49, -1.89, "Europe/London"),
+    ("Edinburgh", "GB", 55.95, -3.19, "Europe/London"),
+    ("Munich", "DE", 48.14, 11.58, "Europe/Berlin"),
+    ("Hamburg", "DE", 53.55, 9.99, "Europe/Berlin"),
+    ("Frankfurt", "DE", 50.11, 8.68, "Europe/Berlin"),
+    ("Milan", "IT", 45.46, 9.19, "Europe/Rome"),
+    ("Barcelona", "ES", 41.39, 2.17, "Europe/Madrid"),
+    ("Geneva", "CH", 46.20, 6.14, "Europe/Zurich"),
+    ("St Petersburg", "RU", 59.94, 30.31, "Europe/Moscow"),
+    ("Saint Petersburg", "RU", 59.94, 30.31, "Europe/Moscow"),
+    ("Melbourne", "AU", -37.81, 144.96, "Australia/Melbourne"),
+    ("Canberra", "AU", -35.28, 149.13, "Australia/Sydney"),
+    ("Wellington", "NZ", -41.29, 174.78, "Pacific/Auckland"),
+    ("Cape Town", "ZA", -33.92, 18.42, "Africa/Johannesburg"),
+    ("Ho Chi Minh City", "VN", 10.82, 106.63, "Asia/Ho_Chi_Minh"),
+    ("Saigon", "VN", 10.82, 106.63, "Asia/Ho_Chi_Minh"),
+    ("Hanoi", "VN", 21.03, 105.85, "Asia/Ho_Chi_Minh"),
+]
+
+
+def normalize(text: str) -> str:
+    """Casefolded, accent-free, single-spaced form used for every lookup key."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w]+", " ", text.casefold().replace("_", " "))
+    return text.strip()
+
+
+def _parse_iso6709(coord: str) -> tuple[float, float]:
+    # zone.tab coordinates: ±DDMM[SS]±DDDMM[SS]
+    split = max(coord.rfind("+"), coord.rfind("-"))
+    values = []
+    for part, degree_digits in ((coord[:split], 2), (coord[split:], 3)):
+        sign = -1 if part[0] == "-" else 1
+        digits = part[1:]
+        degrees = int(digits[:degree_digits])
+        minutes = int(digits[degree_digits:degree_digits + 2])
+        seconds = int(digits[degree_digits + 2:] or 0)
+        values.append(sign * (degrees + minutes / 60 + seconds / 3600))
+    return values[0], values[1]
+
+
+# Shorter queries that are not an exact name are too ambiguous to guess from ("San", "Man")
+MIN_GUESS_LENGTH = 4
+
+
+class Gazetteer:
+    """Offline city → timezone index with exact, prefix and fuzzy lookup.
+
+    Seeded from the principal city of every tz zone (pytz's zone.tab) plus
+    CITY_ALIASES. A GeoNames "cities" dump (e.g. cities15000.txt) can be loaded
+    on top for much wider coverage.
+    """
+
+    def __init__(self):
+        self._places: list[Place] = []
+        self._by_key: dict[str, list[int]] = {}
+        self._keys: list[str] = []  # Sorted, for prefix lookups
+        self._keys_by_initial: dict[str, list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def add(self, place: Place, *aliases: str):
+        index = len(self._places)
+        self._places.append(place)
+        for name in (place.name, *aliases):
+            key = normalize(name)
+            if key:
+                self._by_key.setdefault(key, []).append(index)
+
+    def _finish(self):
+        for indexes in self._by_key.values():
+            indexes.sort(key=lambda i: -self._places[i].population)
+        self._keys = sorted(self._by_key)
+        self._keys_by_initial = {}
+        for key in self._keys:
+            self._keys_by_initial.setdefault(key[0], []).append(key)
+        self.resolve.cache_clear()
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "Gazetteer":
+        gazetteer = cls()
+        with pytz.open_resource("zone.tab") as f:
+            for line in f.read().decode("utf-8").splitlines():
+                if not line or line.startswith("#"):
+                    continue
+                country, coord, zone = line.split("\t")[:3]
+                lat, lng = _parse_iso6709(coord)
+                gazetteer.add(Place(zone.rsplit("/", 1)[-1].replace("_", " "), country, lat, lng, zone))
+        for name, country, lat, lng, zone in CITY_ALIASES:
+            gazetteer.add(Place(name, country, lat, lng, zone))
+        if path and os.path.exists(path):
+            gazetteer.load_geonames(path)
+        gazetteer._finish()
+        return gazetteer
+
+    def load_geonames(self, path: str):
+        """Add places from a GeoNames dump (tab-separated, one place per line)."""
+        valid = set(pytz.all_timezones)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 18 or cols[17] not in valid:
+                    continue
+                population = int(cols[14]) if cols[14].isdigit() else 0
+                place = Place(cols[1], cols[8], float(cols[4]), float(cols[5]), cols[17], population)
+                self.add(place, cols[2])
+
+    def _split_query(self, query: str) -> tuple[str, Optional[str], bool]:
+        """(name key, country code, whether the region was understood).
+
+        "Paris, France" / "Paris, FR": the part after the comma narrows the country. Anything
+        else there ("Portland, Maine") is not a country we know, which the caller must not ignore.
+        """
+        name, _, region = query.partition(",")
+        region = region.strip()
+        country = None
+        if region:
+            if len(region) == 2 and region.upper() in pytz.country_names:
+                country = region.upper()
+            else:
+                wanted = normalize(region)
+                country = next((code for code, label in pytz.country_names.items() if normalize(label) == wanted), None)
+        return normalize(name), country, country is not None or not region
+
+    def _pick(self, keys: list[str], country: Optional[str], limit: int) -> list[Place]:
+        results, seen = [], set()
+        for key in keys:
+            for i in self._by_key[key]:
+                place = self._places[i]
+                if country and place.country != country:
+                    continue
+                ident = (place.name, place.country, place.timezone)
+                if ident not in seen:
+                    seen.add(ident)
+                    results.append(place)
+        results.sort(key=lambda p: -p.population)
+        return results[:limit]
+
+    def _prefix_keys(self, key: str) -> list[str]:
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_left(self._keys, key + "\uffff")
+        return self._keys[start:end]
+
+    def _close_keys(self, key: str, limit: int, cutoff: float) -> list[str]:
+        # Misspellings: compare only against names with the same first letter to keep it cheap
+        return difflib.get_close_matches(key, self._keys_by_initial.get(key[0], []), n=limit, cutoff=cutoff)
+
+    @functools.lru_cache(maxsize=4096)
+    def resolve(self, query: str) -> Optional[Place]:
+        """The one place the query means, or None when unsure so the caller can ask a geocoder.
+
+        An exact name wins, most populous first. A prefix or misspelling only counts when the
+        query is at least MIN_GUESS_LENGTH characters and points at a single place, and a
+        region that is not a known country is never dropped.
+        """
+        key, country, region_known = self._split_query(query)
+        if not key or not region_known:
+            return None
+        if key in self._by_key:
+            exact = self._pick([key], country, 1)
+            if exact:
+                return exact[0]
+        if len(key) < MIN_GUESS_LENGTH:
+            return None
+        longer = [k for k in self._prefix_keys(key) if k != key]
+        guesses = self._pick(longer, country, 2) if longer else self._pick(self._close_keys(key, 2, 0.8), country, 2)
+        return guesses[0] if len(guesses) == 1 else None
+
+    def suggest(self, query: str, limit: int = 25) -> list[Place]:
+        """Candidates for autocomplete: exact names, then prefixes, then close spellings.
+
+        Unlike `resolve`, this is lenient: an unknown region is ignored while the user types.
+        """
+        key, country, _ = self._split_query(query)
+        if not key:
+            return []
+        # Exact names first, then longer names starting with the query, most populous first
+        exact = self._pick([key], country, limit) if key in self._by_key else []
+        longer = [k for k in self._prefix_keys(key) if k != key]
+        matches = exact + [p for p in self._pick(longer, country, limit) if p not in exact]
+        if matches:
+            return matches[:limit]
+        return self._pick(self._close_keys(key, limit, 0.75), country, limit)
+
+
+class TimezoneIndex:
+    """Prefix search over tz names, matching the full name or any part of it ("london", "new york")."""
+
+    def __init__(self, zones: Optional[list[str]] = None):
+        self.zones = sorted(zones if zones is not None else pytz.all_timezones)
+        self._keys: list[tuple[str, str]] = sorted(
+            {(normalize(part), zone) for zone in self.zones for part in [zone, *zone.split("/")[1:]] if normalize(part)}
+        )
+
+    def suggest(self, query: str, limit: int = 25) -> list[str]:
+        key = normalize(query)
+        if not key:
+            return self.zones[:limit]
+        start = bisect.bisect_left(self._keys, (key,))
+        results = []
+        for prefix, zone in self._keys[start:]:
+            if not prefix.startswith(key) or len(results) >= limit:
+                break
+            if zone not in results:
+                results.append(zone)
+        return results
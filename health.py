@@ -0,0 +1,96 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+# A readiness check returns (ok, detail)
+Check = Callable[[], Awaitable[tuple[bool, str]]]
+
+
+class HealthServer:
+    """Liveness, readiness and metrics endpoints served from the bot's own event loop.
+
+    /readyz runs every check and answers 503 if any fails. /healthz answers 200 while the
+    loop is responsive and 503 once the bot has been unready for longer than `unready_grace`,
+    so a wedged bot gets restarted even by hosts that only probe one URL. A blocked event loop
+    stops the server answering at all, which a probe timeout catches.
+    """
+
+    def __init__(
+        self,
+        checks: dict[str, Check],
+        metrics: Optional[Callable[[], str]] = None,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        check_timeout: float = 5.0,
+        unready_grace: float = 300.0,
+    ):
+        self.checks = checks
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.check_timeout = check_timeout
+        self.unready_grace = unready_grace
+        self.unready_since: Optional[float] = time.monotonic()  # Not ready until the first passing check
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/", self._root)
+        app.router.add_get("/healthz", self._healthz)
+        app.router.add_get("/readyz", self._readyz)
+        if self.metrics:
+            app.router.add_get("/metrics", self._metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"🩺 Health server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _run_check(self, check: Check) -> tuple[bool, str]:
+        try:
+            return await asyncio.wait_for(check(), self.check_timeout)
+        except asyncio.TimeoutError:
+            return False, f"timed out after {self.check_timeout}s"
+        except Exception as e:
+            return False, f"{type(e).__name__}: {e}"
+
+    async def readiness(self) -> tuple[bool, dict[str, dict]]:
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._run_check(self.checks[name]) for name in names))
+        report = {name: {"ok": ok, "detail": detail} for name, (ok, detail) in zip(names, results)}
+        ready = all(ok for ok, _ in results)
+        if ready:
+            self.unready_since = None
+        elif self.unready_since is None:
+            self.unready_since = time.monotonic()
+        return ready, report
+
+    @staticmethod
+    def _json(body: dict, ok: bool) -> web.Response:
+        return web.Response(text=json.dumps(body, indent=2), status=200 if ok else 503, content_type="application/json")
+
+    async def _root(self, request: web.Request) -> web.Response:
+        return web.Response(text="Bot is alive!")
+
+    async def _readyz(self, request: web.Request) -> web.Response:
+        ready, report = await self.readiness()
+        return self._json({"ready": ready, "checks": report}, ready)
+
+    async def _healthz(self, request: web.Request) -> web.Response:
+        ready, report = await self.readiness()
+        unready_for = time.monotonic() - self.unready_since if self.unready_since is not None else 0.0
+        alive = unready_for <= self.unready_grace
+        body = {"alive": alive, "ready": ready, "unready_seconds": round(unready_for, 1)}
+        if not ready:
+            body["failing"] = {name: result["detail"] for name, result in report.items() if not result["ok"]}
+        return self._json(body, alive)
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.metrics(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
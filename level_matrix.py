@@ -0,0 +1,234 @@
+import asyncio
+import datetime
+import functools
+from typing import Optional
+
+import numpy as np
+
+MISSING = -1  # No level that day: either no check-in, or a check-in without a level
+INT32_MAX = np.iinfo(np.int32).max
+HEADROOM_DAYS = 31  # Spare columns after a load, so the next days' writes do not reallocate
+
+
+def day_number(date_str: str) -> int:
+    return datetime.date.fromisoformat(date_str).toordinal()
+
+
+class LevelMatrix:
+    """Every user's level history as one users × days int32 array, for vectorized period queries.
+
+    Row i belongs to `user_ids[i]`; column j is the day `epoch + j` (proleptic ordinals), so a
+    date range is a slice and a period maximum, gain or activity count is one reduction over it.
+    A user costs 4 bytes per day of history kept: 10k users × 365 days is 14.6 MB.
+
+    `max_bytes` caps the array. When more rows or days would not fit, the oldest days are dropped,
+    but never fewer than `min_days` are kept, so the week and month views always stay covered.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, min_days: int = 62):
+        self.max_bytes = max_bytes
+        self.min_days = min_days
+        self.loaded = False
+        self._values = np.full((0, 0), MISSING, dtype=np.int32)
+        self._epoch = 0  # Ordinal of column 0
+        self._days = 0  # Columns in use; the last one is the latest day seen
+        self._index: dict[str, int] = {}
+        self.user_ids: list[str] = []
+        self.names: list[str] = []
+        self._pending: Optional[list] = None  # Writes that arrive while a load is running
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self._values.nbytes
+
+    def _budget_days(self, rows: int) -> int:
+        return max(self.max_bytes // (max(rows, 1) * self._values.itemsize), self.min_days)
+
+    # --- LOADING ---
+    async def load(self, progress_loader):
+        """Build the matrix from {user_id: {"username", "entries"}} returned by `progress_loader()`."""
+        self._pending = []
+        try:
+            progress = await progress_loader()
+            # Runs off the event loop: a year of entries for 10k users is a few million dict items
+            built = await asyncio.to_thread(self._build, progress)
+        except BaseException:
+            self._pending = None
+            raise
+        self._values, self._epoch, self._days, self._index, self.user_ids, self.names = built
+        pending, self._pending = self._pending, None
+        for write in pending:
+            write()
+        self.loaded = True
+        print(f"🧮 Level matrix loaded: {len(self)} users × {self._days} days, {self.nbytes / 2**20:.1f} MB")
+
+    def _build(self, progress: dict[str, dict]) -> tuple:
+        days = {}  # date string -> ordinal, shared by every user
+        for d in progress.values():
+            for date_str in d.get("entries", {}):
+                if date_str not in days:
+                    try:
+                        days[date_str] = day_number(date_str)
+                    except ValueError:
+                        continue
+        last = max(days.values(), default=datetime.date.today().toordinal())
+        first = min(days.values(), default=last)
+        rows = len(progress)
+        # The headroom columns count against the budget too, except that min_days is always kept
+        budget = self._budget_days(rows + rows // 8 + 16)
+        span = min(last - first + 1, max(budget - HEADROOM_DAYS, self.min_days))
+        epoch = last - span + 1
+
+        # Gather coordinates first and scatter them with a single assignment
+        row_idx, col_idx, levels = [], [], []
+        index, user_ids, names = {}, [], []
+        for row, (user_id, d) in enumerate(progress.items()):
+            index[user_id] = row
+            user_ids.append(user_id)
+            names.append(d.get("username", "?"))
+            for date_str, level in d.get("entries", {}).items():
+                day = days.get(date_str)
+                if day is not None and day >= epoch and isinstance(level, int) and level >= 0:
+                    row_idx.append(row)
+                    col_idx.append(day - epoch)
+                    levels.append(min(level, INT32_MAX))
+        # Headroom for new users and days, so the first writes after loading do not reallocate
+        values = np.full((rows + rows // 8 + 16, min(span + HEADROOM_DAYS, budget)), MISSING, dtype=np.int32)
+        values[row_idx, col_idx] = levels
+        return values, epoch, span, index, user_ids, names
+
+    # --- WRITES ---
+    def set(self, user_id: str, username: str, date_str: str, level: int):
+        if self._pending is not None:
+            self._pending.append(functools.partial(self.set, user_id, username, date_str, level))
+            return
+        day = day_number(date_str)
+        row = self._row(user_id, username)
+        if day >= self._epoch + self._days:
+            self._extend_to(day)
+        col = day - self._epoch
+        if col >= 0:  # Days older than the window are not kept
+            self._values[row, col] = min(level, INT32_MAX) if level >= 0 else MISSING
+
+    def remove(self, user_id: str):
+        if self._pending is not None:
+            self._pending.append(functools.partial(self.remove, user_id))
+            return
+        row = self._index.get(user_id)
+        if row is not None:
+            # The row is kept for the user's next check-in; an empty row never ranks
+            self._values[row] = MISSING
+
+    def _row(self, user_id: str, username: str) -> int:
+        row = self._index.get(user_id)
+        if row is not None:
+            self.names[row] = username
+            return row
+        row = len(self.user_ids)
+        if row >= self._values.shape[0]:
+            self._reshape(max(row * 2, 16), self._values.shape[1], self._days)
+        self._index[user_id] = row
+        self.user_ids.append(user_id)
+        self.names.append(username)
+        return row
+
+    def _extend_to(self, day: int):
+        if self._days == 0:
+            self._epoch = day
+        needed = day - self._epoch + 1
+        if needed > self._values.shape[1]:
+            self._reshape(self._values.shape[0], max(needed, self._values.shape[1] * 2), needed)
+        self._days = day - self._epoch + 1
+
+    def _reshape(self, rows: int, days: int, used: int):
+        """Reallocate as rows × days (capped by the budget), keeping the latest `used` columns."""
+        days = min(days, self._budget_days(rows))
+        drop = max(used - days, 0)
+        if drop:
+            print(f"🧮 Level matrix at its memory budget; dropping the {drop} oldest day(s)")
+        values = np.full((rows, days), MISSING, dtype=np.int32)
+        kept = self._values[:, drop:self._days]
+        values[:kept.shape[0], :kept.shape[1]] = kept
+        self._values = values
+        self._epoch += drop
+        self._days = max(self._days - drop, 0)
+
+    # --- QUERIES ---
+    def covers(self, start: str) -> bool:
+        """Whether days from `start` on are all in the matrix."""
+        return self.loaded and day_number(start) >= self._epoch
+
+    def window(self, start: str, end: str) -> np.ndarray:
+        """Levels for the dates start..end inclusive, one row per user; days outside the matrix are MISSING."""
+        first, last = day_number(start), day_number(end)
+        out = np.full((len(self.user_ids), last - first + 1), MISSING, dtype=np.int32)
+        lo, hi = max(first, self._epoch), min(last, self._epoch + self._days - 1)
+        if lo <= hi:
+            out[:, lo - first:hi - first + 1] = self._values[:len(self.user_ids), lo - self._epoch:hi - self._epoch + 1]
+        return out
+
+    def period_max(self, start: str, end: str) -> np.ndarray:
+        """Highest level per user over the period, MISSING if none."""
+        return self.window(start, end).max(axis=1, initial=MISSING)
+
+    def activity(self, start: str, end: str) -> np.ndarray:
+        """Days with a level per user over the period."""
+        return np.count_nonzero(self.window(start, end) >= 0, axis=1)
+
+    def gains(self, start: str, end: str) -> np.ndarray:
+        """Highest minus lowest level per user over the period; a single level counts in full, none as 0."""
+        window = self.window(start, end)
+        valid = window >= 0
+        count = np.count_nonzero(valid, axis=1)
+        high = window.max(axis=1, initial=MISSING).astype(np.int64)
+        low = np.where(valid, window, INT32_MAX).min(axis=1, initial=INT32_MAX)
+        return np.where(count >= 2, high - low, np.where(count == 1, high, 0))
+
+    def movers(self, start: str, end: str, k: int) -> list[tuple[str, str, int]]:
+        """(user_id, username, gain) for the k biggest gains over the period, among users with a level in it."""
+        return self.top(np.where(self.activity(start, end) > 0, self.gains(start, end), MISSING), k)
+
+    def levels(self, start: str, end: str, exclude: tuple[str, ...] = ()) -> np.ndarray:
+        """Float levels (NaN where missing) of every user with a level in the period except `exclude`."""
+        window = self.window(start, end)
+        keep = (window >= 0).any(axis=1)
+        for user_id in exclude:
+            row = self._index.get(user_id)
+            if row is not None:
+                keep[row] = False
+        window = window[keep]
+        return np.where(window >= 0, window, np.nan)
+
+    def values_for(self, user_id: str, start: str, end: str) -> list[Optional[int]]:
+        """One user's levels for the dates start..end inclusive, None where missing."""
+        first, last = day_number(start), day_number(end)
+        out: list[Optional[int]] = [None] * (last - first + 1)
+        row = self._index.get(user_id)
+        lo, hi = max(first, self._epoch), min(last, self._epoch + self._days - 1)
+        if row is not None and lo <= hi:
+            kept = self._values[row, lo - self._epoch:hi - self._epoch + 1].tolist()
+            out[lo - first:hi - first + 1] = [v if v >= 0 else None for v in kept]
+        return out
+
+    def top(self, scores: np.ndarray, k: int) -> list[tuple[str, str, int]]:
+        """(user_id, username, score) for the k best non-negative scores, ties by user ID."""
+        candidates = np.flatnonzero(scores >= 0)
+        if len(candidates) > k:
+            # Everyone tied with the k-th best stays in, so ties break the same way as the rank index
+            kth = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[scores[candidates] >= kth]
+        rows = sorted(((-int(scores[i]), self.user_ids[i]), i) for i in candidates)[:k]
+        return [(self.user_ids[i], self.names[i], -neg) for (neg, _), i in rows]
+
+    def footprint(self) -> dict:
+        users = len(self)
+        return {
+            "users": users,
+            "days": self._days,
+            "bytes": self.nbytes,
+            "bytes_per_10k_users": self.nbytes * 10_000 // users if users else 0,
+        }
+
@@ -0,0 +1,222 @@
+import abc
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from typing import Callable, Optional, Union
+
+# The command or task the current code runs on behalf of; storage counts are attributed to it.
+# discord.py runs every interaction and task in its own asyncio task, so setting it once at the
+# start of a command or task iteration labels everything that command or iteration does.
+current_operation: contextvars.ContextVar[str] = contextvars.ContextVar("current_operation", default="other")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Labels are stored as tuples of values, in the order the metric declared them
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(self, registry: "Registry", name: str, help: str, labels: tuple[str, ...] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    @abc.abstractmethod
+    def samples(self) -> list[str]:
+        ...
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[LabelValues, list] = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Counts are stored per bucket and made cumulative only when rendered
+        i = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Reads its value(s) from `fn` at scrape time: a number, or {label values: number}."""
+
+    def __init__(self, *args, type: str, fn: Callable[[], Union[float, dict[LabelValues, float]]], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.type = type
+        self.fn = fn
+
+    def samples(self) -> list[str]:
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format (version 0.0.4)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Metrics may be updated or scraped from any thread
+        self._metrics: list[_Metric] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(self, name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self, name, help, labels, buckets=buckets))
+
+    def callback(self, name: str, help: str, fn: Callable, type: str = "gauge", labels: tuple[str, ...] = ()) -> CallbackMetric:
+        return self._add(CallbackMetric(self, name, help, labels, type=type, fn=fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                with self.lock:
+                    samples = metric.samples()
+            except Exception as e:
+                # One broken callback must not take the whole scrape down
+                print(f"[METRICS] {metric.name} failed: {e}")
+                continue
+            lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+command_seconds = registry.histogram(
+    "bot_command_duration_seconds", "Slash command handling time, from dispatch to completion.", ("command", "outcome"),
+)
+task_seconds = registry.histogram(
+    "bot_task_duration_seconds", "Time spent in one iteration of a background task.", ("task",),
+    buckets=DEFAULT_BUCKETS + (60.0, 300.0),
+)
+storage_documents = registry.counter(
+    "bot_storage_documents_total", "Documents read or written, by the command or task that caused it.", ("operation", "kind"),
+)
+storage_requests = registry.counter(
+    "bot_storage_requests_total", "Storage round-trips, by the command or task that caused them.", ("operation", "kind"),
+)
+loop_lag_seconds = registry.histogram(
+    "bot_event_loop_lag_seconds", "How much later than scheduled the event loop resumed a sleeping task.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+
+def record_storage(kind: str, documents: int, requests: int = 1):
+    """Count a storage call ("read" or "write") against the current operation."""
+    operation = current_operation.get()
+    storage_documents.inc(documents, operation=operation, kind=kind)
+    storage_requests.inc(requests, operation=operation, kind=kind)
+
+
+def timed_task(name: str):
+    """Wrap a task loop body so each iteration is labelled `name` and its duration recorded."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            current_operation.set(name)
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                task_seconds.observe(time.perf_counter() - started, task=name)
+        return wrapper
+    return decorator
+
+
+class LoopLagMonitor:
+    """Sleeps for `interval` over and over and records how much later than asked each wake-up was."""
+
+    def __init__(self, histogram: Histogram, interval: float = 0.5):
+        self.histogram = histogram
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="loop-lag-monitor")
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.histogram.observe(self.last_lag)
+
+
+loop_monitor = LoopLagMonitor(loop_lag_seconds)
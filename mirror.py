@@ -0,0 +1,215 @@
+import asyncio
+import copy
+import datetime
+import time
+from typing import Callable, Optional
+
+import metrics
+from repository import deep_merge
+
+
+class CollectionMirror:
+    """An in-memory copy of one Firestore collection, kept current by an `on_snapshot` listener.
+
+    The listener's first snapshot replaces the whole copy; after that only the changed
+    documents are applied. Callbacks arrive on the client's listener thread and are handed
+    to the event loop, so the copy is only ever touched from the loop.
+
+    `listeners` are called on the loop as `listener(doc_id, data)` (None when deleted) for every
+    document a snapshot changes, except on the first sync. A resync reports what differs from
+    the old copy. Writes made through `write`/`delete` are not reported, and neither is their
+    echo from the listener, as long as the copy still holds the same data when it arrives.
+    """
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        self.docs: dict[str, dict] = {}
+        self.synced = asyncio.Event()
+        self.lag = float("nan")  # Seconds from a snapshot's read time to it being applied
+        self.applied_at: Optional[float] = None  # time.monotonic() of the last snapshot applied
+        self.resyncs = 0
+        self._synced_once = False  # Unlike `synced`, stays set while a resync is running
+        self._watch = None
+        self._generation = 0  # Callbacks from a listener that has since been replaced are dropped
+        self.listeners: list[Callable[[str, Optional[dict]], None]] = []
+
+    @property
+    def active(self) -> bool:
+        return self._watch is not None and self._watch.is_active
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self.stop()
+        self._generation += 1
+        generation = self._generation
+        self.synced.clear()
+        first = True
+
+        def on_snapshot(snapshots, changes, read_time):
+            # Listener thread: deserialise here, apply on the loop
+            nonlocal first
+            if first:
+                first = False
+                docs = {snap.id: snap.to_dict() or {} for snap in snapshots}
+                loop.call_soon_threadsafe(self._replace, generation, docs, read_time)
+            else:
+                updates = [
+                    (change.document.id, None if change.type.name == "REMOVED" else change.document.to_dict() or {})
+                    for change in changes
+                ]
+                loop.call_soon_threadsafe(self._apply, generation, updates, read_time)
+
+        self._watch = self.client.collection(self.name).on_snapshot(on_snapshot)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _applied(self, read_time: Optional[datetime.datetime], documents: int):
+        metrics.current_operation.set(f"mirror {self.name}")
+        metrics.record_storage("read", documents)  # Listeners bill one read per document delivered
+        self.applied_at = time.monotonic()
+        if read_time is not None:
+            self.lag = max((datetime.datetime.now(datetime.timezone.utc) - read_time).total_seconds(), 0.0)
+
+    def _notify(self, doc_id: str, data: Optional[dict]):
+        for listener in self.listeners:
+            try:
+                listener(doc_id, data)
+            except Exception as e:
+                print(f"🪞 Change handler for {self.name}/{doc_id} failed: {e}")
+
+    def _replace(self, generation: int, docs: dict[str, dict], read_time):
+        if generation != self._generation:
+            return
+        old, self.docs = self.docs, docs
+        self._applied(read_time, len(docs))
+        resync, self._synced_once = self._synced_once, True
+        self.synced.set()
+        print(f"🪞 Mirror of {self.name} synced with {len(docs)} documents")
+        if resync:
+            # Report whatever changed while no listener was running
+            for doc_id in old.keys() | docs.keys():
+                if old.get(doc_id) != docs.get(doc_id):
+                    self._notify(doc_id, docs.get(doc_id))
+
+    def _apply(self, generation: int, updates: list[tuple[str, Optional[dict]]], read_time):
+        if generation != self._generation:
+            return
+        changed = []
+        for doc_id, data in updates:
+            if self.docs.get(doc_id) == data:
+                continue
+            if data is None:
+                self.docs.pop(doc_id, None)
+            else:
+                self.docs[doc_id] = data
+            changed.append((doc_id, data))
+        self._applied(read_time, len(updates))
+        for doc_id, data in changed:
+            self._notify(doc_id, data)
+
+    # Our own writes are applied straight away; the listener brings the same data shortly after
+    def write(self, doc_id: str, data: dict, merge: bool = False):
+        self.docs[doc_id] = deep_merge(self.docs.get(doc_id, {}), data) if merge else copy.deepcopy(data)
+
+    def delete(self, doc_id: str):
+        self.docs.pop(doc_id, None)
+
+
+class FirestoreMirror:
+    """Live copies of the collections the bot reads most, served instead of Firestore queries.
+
+    A watchdog checks every `check_interval` seconds that each listener is still running.
+    The client recovers from transient stream errors and server resets by itself; a listener
+    that has stopped for good is replaced, and its collection is rebuilt from the new
+    listener's first snapshot. Until a collection has synced, reads go to Firestore.
+    """
+
+    def __init__(self, client, collections: tuple[str, ...], check_interval: float = 10.0):
+        self.collections = {name: CollectionMirror(client, name) for name in collections}
+        self.check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        for collection in self.collections.values():
+            collection.start(loop)
+        self._task = loop.create_task(self._watchdog(), name="mirror-watchdog")
+
+    async def _watchdog(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for collection in self.collections.values():
+                if not collection.active:
+                    print(f"🪞 Listener for {collection.name} stopped; resyncing")
+                    collection.resyncs += 1
+                    try:
+                        collection.start(loop)
+                    except Exception as e:
+                        print(f"🪞 Could not restart the {collection.name} listener: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for collection in self.collections.values():
+            collection.stop()
+
+    def ready(self, name: str) -> bool:
+        collection = self.collections.get(name)
+        return collection is not None and collection.synced.is_set()
+
+    async def wait_ready(self, name: str, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a collection's first sync; False if it is not mirrored."""
+        collection = self.collections.get(name)
+        if collection is None:
+            return False
+        if not collection.active:
+            # Stopped listeners are restarted by the watchdog; until then, do not wait on them
+            return collection.synced.is_set()
+        try:
+            await asyncio.wait_for(collection.synced.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def get(self, name: str, doc_id: str) -> Optional[dict]:
+        data = self.collections[name].docs.get(doc_id)
+        return copy.deepcopy(data) if data is not None else None
+
+    def all(self, name: str) -> dict[str, dict]:
+        # Shared with the mirror: callers must not modify the documents
+        return dict(self.collections[name].docs)
+
+    def subscribe(self, name: str, listener: Callable[[str, Optional[dict]], None]) -> bool:
+        """Call `listener(doc_id, data)` for changes to a collection made elsewhere; False if it is not mirrored."""
+        collection = self.collections.get(name)
+        if collection is None:
+            return False
+        collection.listeners.append(listener)
+        return True
+
+    def write(self, name: str, doc_id: str, data: dict, merge: bool = False):
+        if name in self.collections:
+            self.collections[name].write(doc_id, data, merge)
+
+    def delete(self, name: str, doc_id: str):
+        if name in self.collections:
+            self.collections[name].delete(doc_id)
+
+    def status(self) -> dict[str, dict]:
+        now = time.monotonic()
+        return {
+            name: {
+                "synced": collection.synced.is_set(),
+                "listening": collection.active,
+                "documents": len(collection.docs),
+                "lag_seconds": collection.lag,
+                "since_last_snapshot": now - collection.applied_at if collection.applied_at is not None else None,
+                "resyncs": collection.resyncs,
+            }
+            for name, collection in self.collections.items()
+        }
@@ -0,0 +1,205 @@
+import abc
+from typing import Callable, Optional
+
+
+def deep_merge(base: dict, update: dict) -> dict:
+    """Apply `update` the way a merge-set does: nested maps merge, other values replace."""
+    merged = dict(base)
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def apply_override(summary: Optional[dict], username: str, override_level: Optional[int]) -> dict:
+    """Set (or clear, with None) a leaderboard override on a summary, updating its score."""
+    summary = dict(summary) if summary else {"username": username}
+    if override_level is None:
+        summary.pop("override_level", None)
+        summary["score"] = summary.get("all_time_max", -1)
+    else:
+        summary["override_level"] = override_level
+        summary["score"] = override_level
+    return summary
+
+
+class Pager(abc.ABC):
+    """Pages through an ordered listing; pages must be visited in order starting from 0."""
+
+    page_size: int
+
+    @abc.abstractmethod
+    async def page(self, index: int) -> list[dict]:
+        ...
+
+    @abc.abstractmethod
+    def has_next(self, index: int) -> bool:
+        ...
+
+
+class Repository(abc.ABC):
+    """Everything the bot persists, independent of where it is stored.
+
+    Levels are stored per user as {"username", "entries": {date: level}}, with -1
+    meaning "checked in, no level". Each user also has a leaderboard summary (see
+    fold_level_summary in bot.py) that backends index for leaderboard queries.
+    Backends must implement every abstract method; a missing one fails at construction.
+    """
+
+    def new_scope(self):
+        """Start a fresh per-request read cache; task loops call this once per iteration."""
+
+    async def start(self):
+        """Start any background work the backend needs; called once the event loop is running."""
+
+    async def migrate(self):
+        """Upgrade data written by older versions of the bot; runs at startup and is safe to repeat."""
+
+    def mirror_status(self) -> Optional[dict[str, dict]]:
+        """Per-collection state of the live read mirror, or None when reads are not mirrored."""
+        return None
+
+    def subscribe(self, collection: str, listener: Callable[[str, Optional[dict]], None]) -> bool:
+        """Call `listener(doc_id, data)` (None once deleted) when another process changes a document.
+
+        Returns False, and never calls it, when the backend cannot observe outside changes.
+        """
+        return False
+
+    async def close(self):
+        """Write anything still buffered and release resources."""
+
+    @abc.abstractmethod
+    async def ping(self):
+        """Make one cheap round-trip to the backend; raises if it cannot be reached."""
+
+    # --- CONFIG / META ---
+    @abc.abstractmethod
+    async def get_config(self, name: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def get_meta(self, name: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def set_meta(self, name: str, data: dict, merge: bool = False):
+        ...
+
+    # --- USER PREFS ---
+    @abc.abstractmethod
+    async def get_prefs(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def update_prefs(self, user_id: str, data: dict):
+        """Merge `data` into the user's prefs; nested maps merge rather than replace."""
+
+    @abc.abstractmethod
+    async def all_prefs(self) -> dict[str, dict]:
+        ...
+
+    # --- LEVEL PROGRESS ---
+    @abc.abstractmethod
+    async def get_progress(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def all_progress(self) -> dict[str, dict]:
+        ...
+
+    @abc.abstractmethod
+    async def progress_between(self, start: str, end: str) -> dict[str, dict]:
+        """Progress for users with an entry in [start, end], with entries limited to that range."""
+
+    @abc.abstractmethod
+    async def save_level(self, user_id: str, username: str, date_str: str, value: int, fold: Callable[[Optional[dict]], dict]) -> dict:
+        """Record one day's entry and replace the summary with `fold(current summary)`.
+
+        Concurrent saves for one user cannot lose an update, from this process or another.
+        The Firestore backend buffers both writes and re-applies `fold` to the stored summary
+        in a transaction when it commits, so `fold` must be pure; the SQLite backend is atomic.
+        Returns the new summary as this process sees it.
+        """
+
+    @abc.abstractmethod
+    async def delete_progress(self, user_id: str):
+        ...
+
+    # --- LEADERBOARD SUMMARIES ---
+    @abc.abstractmethod
+    async def get_summary(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def save_summary(self, user_id: str, summary: dict):
+        ...
+
+    @abc.abstractmethod
+    async def delete_summary(self, user_id: str):
+        ...
+
+    @abc.abstractmethod
+    async def all_summaries(self) -> dict[str, dict]:
+        ...
+
+    @abc.abstractmethod
+    async def replace_summaries(self, summaries: dict[str, dict]):
+        """Write a full rebuild of the summaries."""
+
+    @abc.abstractmethod
+    async def top_summaries(self, field: str, limit: int, period: Optional[tuple[str, str]] = None) -> list[tuple[str, dict]]:
+        """Highest `limit` summaries by `field` (e.g. ("week_key", "2024-06-03") as `period`)."""
+
+    @abc.abstractmethod
+    async def set_summary_override(self, user_id: str, username: str, override_level: Optional[int]) -> dict:
+        """Set or clear override_level on the summary atomically; returns the new summary."""
+
+    # --- LEADERBOARD OVERRIDES ---
+    @abc.abstractmethod
+    async def get_override(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def set_override(self, user_id: str, data: dict):
+        ...
+
+    @abc.abstractmethod
+    async def delete_override(self, user_id: str):
+        ...
+
+    @abc.abstractmethod
+    async def all_overrides(self) -> dict[str, dict]:
+        ...
+
+    # --- WARNINGS ---
+    @abc.abstractmethod
+    async def add_warning(self, user_id: str, username: str, warning: dict):
+        ...
+
+    @abc.abstractmethod
+    async def warning_count(self, user_id: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    def warnings_pager(self, user_id: str, page_size: int) -> Pager:
+        """The user's warnings, newest first."""
+
+    @abc.abstractmethod
+    async def clear_warnings(self, user_id: str):
+        ...
+
+    # --- AUDIT LOG ---
+    @abc.abstractmethod
+    async def add_audit_entry(self, entry: dict):
+        """Append an entry ({timestamp, action_type, action, admin, user_id}) and count it."""
+
+    @abc.abstractmethod
+    async def audit_count(self, user_id: Optional[str] = None, action_type: Optional[str] = None) -> Optional[int]:
+        """Entries matching the filter, or None if the backend cannot tell cheaply."""
+
+    @abc.abstractmethod
+    def audit_pager(self, user_id: Optional[str], action_type: Optional[str], page_size: int) -> Pager:
+        """Matching audit entries, newest first."""
@@ -0,0 +1,329 @@
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from repository import Pager, Repository, apply_override, deep_merge
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL, name TEXT NOT NULL, data TEXT NOT NULL,
+    PRIMARY KEY (namespace, name)
+);
+CREATE TABLE IF NOT EXISTS user_prefs (user_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, username TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS level_entries (
+    user_id TEXT NOT NULL, date TEXT NOT NULL, level INTEGER NOT NULL,
+    PRIMARY KEY (user_id, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS level_entries_by_date ON level_entries (date, level);
+CREATE TABLE IF NOT EXISTS leaderboard_stats (
+    user_id TEXT PRIMARY KEY,
+    score INTEGER NOT NULL, all_time_max INTEGER NOT NULL,
+    week_key TEXT, week_max INTEGER, month_key TEXT, month_max INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leaderboard_by_score ON leaderboard_stats (score DESC);
+CREATE INDEX IF NOT EXISTS leaderboard_by_all_time_max ON leaderboard_stats (all_time_max DESC);
+CREATE INDEX IF NOT EXISTS leaderboard_by_week ON leaderboard_stats (week_key, week_max DESC);
+CREATE INDEX IF NOT EXISTS leaderboard_by_month ON leaderboard_stats (month_key, month_max DESC);
+CREATE TABLE IF NOT EXISTS leaderboard_overrides (user_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS warnings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, username TEXT,
+    timestamp TEXT NOT NULL, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS warnings_by_user ON warnings (user_id, timestamp DESC, id DESC);
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL,
+    action_type TEXT, user_id TEXT, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audit_by_time ON audit_log (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_by_user ON audit_log (user_id, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_by_type ON audit_log (action_type, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS audit_by_user_type ON audit_log (user_id, action_type, timestamp DESC, id DESC);
+"""
+
+# Sortable summary fields and period filters; anything else is rejected before it reaches SQL
+SUMMARY_FIELDS = {"score", "all_time_max", "week_max", "month_max"}
+PERIOD_FIELDS = {"week_key", "month_key"}
+
+
+class SQLitePager(Pager):
+    """Keyset pagination over (timestamp, id) descending, mirroring QueryPager's cursors."""
+
+    def __init__(self, repo: "SQLiteRepository", table: str, filters: dict[str, Any], page_size: int):
+        self.repo = repo
+        self.table = table
+        self.filters = filters
+        self.page_size = page_size
+        self._cursors: list[Optional[tuple[str, int]]] = [None]
+        self._has_next: dict[int, bool] = {}
+        self._pages: dict[int, list[dict]] = {}
+
+    async def page(self, index: int) -> list[dict]:
+        if index in self._pages:
+            return self._pages[index]
+        if index >= len(self._cursors):
+            raise IndexError(f"page {index} has not been reached yet")
+        where = [f"{column} = ?" for column in self.filters]
+        params: list[Any] = list(self.filters.values())
+        cursor = self._cursors[index]
+        if cursor is not None:
+            where.append("(timestamp, id) < (?, ?)")
+            params.extend(cursor)
+        sql = (
+            f"SELECT id, timestamp, data FROM {self.table}"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        )
+        rows = await self.repo._query(sql, (*params, self.page_size + 1))
+        page_rows = rows[:self.page_size]
+        self._has_next[index] = len(rows) > self.page_size
+        if self._has_next[index] and len(self._cursors) == index + 1:
+            self._cursors.append((page_rows[-1][1], page_rows[-1][0]))
+        self._pages[index] = [json.loads(row[2]) for row in page_rows]
+        return self._pages[index]
+
+    def has_next(self, index: int) -> bool:
+        return self._has_next.get(index, False)
+
+
+class SQLiteRepository(Repository):
+    """Repository in a single local SQLite file, for one-node deployments and offline runs.
+
+    Entries are one row per (user, date), indexed by date and level, and summaries keep
+    their leaderboard fields in indexed columns, so leaderboards, ranks and period queries
+    are index range scans. All SQL runs on one dedicated thread, off the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._call(self._connect).result()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _call(self, fn: Callable[..., Any], *args):
+        return self._executor.submit(fn, *args)
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run `fn(conn)` in a transaction on the SQLite thread."""
+        def in_transaction():
+            with self._conn:
+                return fn(self._conn)
+        return await asyncio.wrap_future(self._call(in_transaction))
+
+    async def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        return await self._run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def _query_one(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        return await self._run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def close(self):
+        await asyncio.wrap_future(self._call(self._conn.close))
+        self._executor.shutdown(wait=True)
+
+    async def ping(self):
+        await self._query_one("SELECT 1")
+
+    # --- CONFIG / META ---
+    async def _get_kv(self, namespace: str, name: str) -> Optional[dict]:
+        row = await self._query_one("SELECT data FROM kv WHERE namespace = ? AND name = ?", (namespace, name))
+        return json.loads(row[0]) if row else None
+
+    async def get_config(self, name: str) -> Optional[dict]:
+        return await self._get_kv("config", name)
+
+    async def get_meta(self, name: str) -> Optional[dict]:
+        return await self._get_kv("meta", name)
+
+    async def set_meta(self, name: str, data: dict, merge: bool = False):
+        def write(conn):
+            if merge:
+                row = conn.execute("SELECT data FROM kv WHERE namespace = 'meta' AND name = ?", (name,)).fetchone()
+                merged = deep_merge(json.loads(row[0]) if row else {}, data)
+            else:
+                merged = data
+            conn.execute("INSERT OR REPLACE INTO kv VALUES ('meta', ?, ?)", (name, json.dumps(merged)))
+        await self._run(write)
+
+    # --- USER PREFS ---
+    async def get_prefs(self, user_id: str) -> Optional[dict]:
+        row = await self._query_one("SELECT data FROM user_prefs WHERE user_id = ?", (user_id,))
+        return json.loads(row[0]) if row else None
+
+    async def update_prefs(self, user_id: str, data: dict):
+        def write(conn):
+            row = conn.execute("SELECT data FROM user_prefs WHERE user_id = ?", (user_id,)).fetchone()
+            merged = deep_merge(json.loads(row[0]) if row else {}, data)
+            conn.execute("INSERT OR REPLACE INTO user_prefs VALUES (?, ?)", (user_id, json.dumps(merged)))
+        await self._run(write)
+
+    async def all_prefs(self) -> dict[str, dict]:
+        return {user_id: json.loads(data) for user_id, data in await self._query("SELECT user_id, data FROM user_prefs")}
+
+    # --- LEVEL PROGRESS ---
+    @staticmethod
+    def _group_progress(rows: list[tuple]) -> dict[str, dict]:
+        progress: dict[str, dict] = {}
+        for user_id, username, date, level in rows:
+            entry = progress.setdefault(user_id, {"username": username or "?", "entries": {}})
+            if date is not None:
+                entry["entries"][date] = level
+        return progress
+
+    async def get_progress(self, user_id: str) -> Optional[dict]:
+        rows = await self._query(
+            "SELECT u.user_id, u.username, e.date, e.level FROM users u"
+            " LEFT JOIN level_entries e ON e.user_id = u.user_id WHERE u.user_id = ?",
+            (user_id,),
+        )
+        return self._group_progress(rows).get(user_id)
+
+    async def all_progress(self) -> dict[str, dict]:
+        return self._group_progress(await self._query(
+            "SELECT u.user_id, u.username, e.date, e.level FROM users u"
+            " LEFT JOIN level_entries e ON e.user_id = u.user_id"
+        ))
+
+    async def progress_between(self, start: str, end: str) -> dict[str, dict]:
+        return self._group_progress(await self._query(
+            "SELECT e.user_id, u.username, e.date, e.level FROM level_entries e"
+            " JOIN users u ON u.user_id = e.user_id WHERE e.date BETWEEN ? AND ?",
+            (start, end),
+        ))
+
+    async def save_level(self, user_id: str, username: str, date_str: str, value: int, fold: Callable[[Optional[dict]], dict]) -> dict:
+        def write(conn):
+            row = conn.execute("SELECT data FROM leaderboard_stats WHERE user_id = ?", (user_id,)).fetchone()
+            summary = fold(json.loads(row[0]) if row else None)
+            conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (user_id, username))
+            conn.execute("INSERT OR REPLACE INTO level_entries VALUES (?, ?, ?)", (user_id, date_str, value))
+            self._write_summary(conn, user_id, summary)
+            return summary
+        return await self._run(write)
+
+    async def delete_progress(self, user_id: str):
+        def write(conn):
+            conn.execute("DELETE FROM level_entries WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+        await self._run(write)
+
+    # --- LEADERBOARD SUMMARIES ---
+    @staticmethod
+    def _write_summary(conn: sqlite3.Connection, user_id: str, summary: dict):
+        conn.execute(
+            "INSERT OR REPLACE INTO leaderboard_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                user_id,
+                summary.get("score", -1),
+                summary.get("all_time_max", -1),
+                summary.get("week_key"),
+                summary.get("week_max", -1),
+                summary.get("month_key"),
+                summary.get("month_max", -1),
+                json.dumps(summary),
+            ),
+        )
+
+    async def get_summary(self, user_id: str) -> Optional[dict]:
+        row = await self._query_one("SELECT data FROM leaderboard_stats WHERE user_id = ?", (user_id,))
+        return json.loads(row[0]) if row else None
+
+    async def save_summary(self, user_id: str, summary: dict):
+        await self._run(lambda conn: self._write_summary(conn, user_id, summary))
+
+    async def delete_summary(self, user_id: str):
+        await self._run(lambda conn: conn.execute("DELETE FROM leaderboard_stats WHERE user_id = ?", (user_id,)))
+
+    async def all_summaries(self) -> dict[str, dict]:
+        return {user_id: json.loads(data) for user_id, data in await self._query("SELECT user_id, data FROM leaderboard_stats")}
+
+    async def replace_summaries(self, summaries: dict[str, dict]):
+        def write(conn):
+            conn.execute("DELETE FROM leaderboard_stats")
+            for user_id, summary in summaries.items():
+                self._write_summary(conn, user_id, summary)
+        await self._run(write)
+
+    async def top_summaries(self, field: str, limit: int, period: Optional[tuple[str, str]] = None) -> list[tuple[str, dict]]:
+        if field not in SUMMARY_FIELDS or (period and period[0] not in PERIOD_FIELDS):
+            raise ValueError(f"unsupported leaderboard query: {field} {period}")
+        sql = "SELECT user_id, data FROM leaderboard_stats"
+        params: tuple = ()
+        if period:
+            sql += f" WHERE {period[0]} = ?"
+            params = (period[1],)
+        rows = await self._query(f"{sql} ORDER BY {field} DESC LIMIT ?", (*params, limit))
+        return [(user_id, json.loads(data)) for user_id, data in rows]
+
+    async def set_summary_override(self, user_id: str, username: str, override_level: Optional[int]) -> dict:
+        def write(conn):
+            row = conn.execute("SELECT data FROM leaderboard_stats WHERE user_id = ?", (user_id,)).fetchone()
+            summary = apply_override(json.loads(row[0]) if row else None, username, override_level)
+            self._write_summary(conn, user_id, summary)
+            return summary
+        return await self._run(write)
+
+    # --- LEADERBOARD OVERRIDES ---
+    async def get_override(self, user_id: str) -> Optional[dict]:
+        row = await self._query_one("SELECT data FROM leaderboard_overrides WHERE user_id = ?", (user_id,))
+        return json.loads(row[0]) if row else None
+
+    async def set_override(self, user_id: str, data: dict):
+        await self._run(lambda conn: conn.execute("INSERT OR REPLACE INTO leaderboard_overrides VALUES (?, ?)", (user_id, json.dumps(data))))
+
+    async def delete_override(self, user_id: str):
+        await self._run(lambda conn: conn.execute("DELETE FROM leaderboard_overrides WHERE user_id = ?", (user_id,)))
+
+    async def all_overrides(self) -> dict[str, dict]:
+        return {user_id: json.loads(data) for user_id, data in await self._query("SELECT user_id, data FROM leaderboard_overrides")}
+
+    # --- WARNINGS ---
+    async def add_warning(self, user_id: str, username: str, warning: dict):
+        await self._run(lambda conn: conn.execute(
+            "INSERT INTO warnings (user_id, username, timestamp, data) VALUES (?, ?, ?, ?)",
+            (user_id, username, warning.get("timestamp", ""), json.dumps(warning)),
+        ))
+
+    async def warning_count(self, user_id: str) -> int:
+        row = await self._query_one("SELECT COUNT(*) FROM warnings WHERE user_id = ?", (user_id,))
+        return row[0]
+
+    def warnings_pager(self, user_id: str, page_size: int) -> Pager:
+        return SQLitePager(self, "warnings", {"user_id": user_id}, page_size)
+
+    async def clear_warnings(self, user_id: str):
+        await self._run(lambda conn: conn.execute("DELETE FROM warnings WHERE user_id = ?", (user_id,)))
+
+    # --- AUDIT LOG ---
+    async def add_audit_entry(self, entry: dict):
+        await self._run(lambda conn: conn.execute(
+            "INSERT INTO audit_log (timestamp, action_type, user_id, data) VALUES (?, ?, ?, ?)",
+            (entry["timestamp"], entry.get("action_type"), entry.get("user_id"), json.dumps(entry)),
+        ))
+
+    @staticmethod
+    def _audit_filters(user_id: Optional[str], action_type: Optional[str]) -> dict[str, Any]:
+        filters = {}
+        if user_id:
+            filters["user_id"] = user_id
+        if action_type:
+            filters["action_type"] = action_type
+        return filters
+
+    async def audit_count(self, user_id: Optional[str] = None, action_type: Optional[str] = None) -> Optional[int]:
+        filters = self._audit_filters(user_id, action_type)
+        where = " AND ".join(f"{column} = ?" for column in filters)
+        row = await self._query_one("SELECT COUNT(*) FROM audit_log" + (f" WHERE {where}" if where else ""), tuple(filters.values()))
+        return row[0]
+
+    def audit_pager(self, user_id: Optional[str], action_type: Optional[str], page_size: int) -> Pager:
+        return SQLitePager(self, "audit_log", self._audit_filters(user_id, action_type), page_size)
@@ -0,0 +1,137 @@
+import importlib.abc
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+# Import this module first so everything after it is measured
+STARTED = time.perf_counter()
+
+
+def _process_age() -> float:
+    """Seconds since the OS started this process (covers interpreter start-up); 0 if unknown."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, profiler: "StartupProfiler", name: str, loader):
+        self.profiler = profiler
+        self.name = name
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Hand the module its real loader so nothing downstream sees the wrapper
+        module.__loader__ = self.loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self.loader
+        self.profiler._enter()
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profiler._exit(self.name, time.perf_counter() - started)
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+
+class StartupProfiler(importlib.abc.MetaPathFinder):
+    """Times every module import and named start-up phases until `finish()` is called."""
+
+    def __init__(self):
+        self.offset = _process_age()
+        self.marks: list[tuple[str, float]] = []
+        self.imports: dict[str, float] = {}  # module -> seconds spent in its own body
+        self._local = threading.local()  # Per-thread import stack and re-entrancy flag
+        self.finished = False
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def find_spec(self, name, path, target=None):
+        if self.finished or getattr(self._local, "finding", False):
+            return None
+        # Ask the real finders, then wrap whatever loader they return
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(self, name, spec.loader)
+        return spec
+
+    def _stack(self) -> list[float]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self):
+        self._stack().append(0.0)
+
+    def _exit(self, name: str, elapsed: float):
+        stack = self._stack()
+        children = stack.pop()
+        self.imports[name] = elapsed - children
+        if stack:
+            stack[-1] += elapsed
+
+    def elapsed(self) -> float:
+        return self.offset + time.perf_counter() - STARTED
+
+    def mark(self, phase: str):
+        if not self.finished:
+            self.marks.append((phase, self.elapsed()))
+
+    def by_package(self) -> list[tuple[str, float]]:
+        totals: dict[str, float] = defaultdict(float)
+        for name, seconds in self.imports.items():
+            totals[name.split(".")[0]] += seconds
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+    def finish(self, phase: str = "ready", top: int = 8) -> Optional[str]:
+        """Record the final phase, stop timing imports and return the report (once)."""
+        if self.finished:
+            return None
+        self.mark(phase)
+        self.finished = True
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+        return self.report(top)
+
+    def report(self, top: int = 8) -> str:
+        lines = [f"[STARTUP] {self.marks[-1][0] if self.marks else 'now'} after {self.elapsed():.2f}s"
+                 + (f" (interpreter start {self.offset:.2f}s)" if self.offset else "")]
+        previous = self.offset
+        for phase, at in self.marks:
+            lines.append(f"[STARTUP]   {phase:<16} +{at - previous:.2f}s  (at {at:.2f}s)")
+            previous = at
+        lines.append(f"[STARTUP] Imports: {sum(self.imports.values()):.2f}s over {len(self.imports)} modules; slowest packages:")
+        for package, seconds in self.by_package()[:top]:
+            lines.append(f"[STARTUP]   {package:<24} {seconds * 1000:7.0f} ms")
+        return "\n".join(lines)
+
+
+profiler = StartupProfiler()
+profiler.install()
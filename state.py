@@ -0,0 +1,194 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+
+class StateMap:
+    """Dict-like view of one namespace: O(1) in memory, written behind to SQLite by the store.
+
+    Entries expire `ttl` seconds after they were last set, and the oldest entries are
+    evicted once `max_entries` is reached, so the map cannot grow without bound.
+    """
+
+    def __init__(self, store: "StateStore", namespace: str, ttl: float, max_entries: int):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[str, float]] = OrderedDict()  # key -> (value, expires_at)
+
+    def _load(self, rows: list[tuple[str, str, float]]):
+        for key, value, expires_at in sorted(rows, key=lambda row: row[2]):
+            self._data[key] = (value, expires_at)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        if item[1] <= time.time():
+            self._delete(key)
+            return default
+        return item[0]
+
+    def __getitem__(self, key: str) -> str:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: str, value: str):
+        self.set(key, value)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        self.store._changed(self.namespace, key, (value, expires_at))
+        while len(self._data) > self.max_entries:
+            oldest, _ = next(iter(self._data.items()))
+            self._delete(oldest)
+
+    def pop(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.get(key, default)
+        if key in self._data:
+            self._delete(key)
+        return value
+
+    def _delete(self, key: str):
+        self._data.pop(key, None)
+        self.store._changed(self.namespace, key, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._data.items() if expires_at <= now]
+        for key in expired:
+            self._data.pop(key, None)
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._data))
+
+
+class StateStore:
+    """Small local SQLite (WAL) file holding bot state that must survive restarts.
+
+    Changes are collected in memory and committed together in one transaction on a worker
+    thread, `flush_delay` seconds after the first of them, so the event loop never waits on
+    the disk. A crash loses at most that much state; `close()` flushes whatever is left.
+    """
+
+    def __init__(self, path: str, flush_delay: float = 1.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS state_expiry ON state (expires_at)")
+        self._maps: dict[str, StateMap] = {}
+        self._dirty: dict[tuple[str, str], Optional[tuple[str, float]]] = {}  # None = delete
+        self._expire_before: Optional[float] = None  # Set by sweep(): expired rows to delete on disk
+        self._db_lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+
+    def namespace(self, name: str, ttl: float, max_entries: int) -> StateMap:
+        state_map = StateMap(self, name, ttl, max_entries)
+        rows = self._conn.execute(
+            "SELECT key, value, expires_at FROM state WHERE namespace = ? AND expires_at > ?",
+            (name, time.time()),
+        ).fetchall()
+        state_map._load(rows)
+        self._maps[name] = state_map
+        return state_map
+
+    def _changed(self, namespace: str, key: str, row: Optional[tuple[str, float]]):
+        self._dirty[(namespace, key)] = row
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is not None:
+            return
+        try:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+        except RuntimeError:
+            # No event loop (scripts, tests): write straight away
+            self._commit(*self._take())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_delay)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"[STATE] Flush failed, retrying in {self.flush_delay}s: {e}")
+            self._schedule()
+
+    def _take(self) -> tuple[dict, Optional[float]]:
+        batch, self._dirty = self._dirty, {}
+        expire_before, self._expire_before = self._expire_before, None
+        return batch, expire_before
+
+    async def flush(self):
+        """Commit every change made so far."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, expire_before = self._take()
+            if not batch and expire_before is None:
+                return
+            try:
+                await asyncio.to_thread(self._commit, batch, expire_before)
+            except BaseException:
+                # Keep what failed, unless it has been changed again since
+                for key, row in batch.items():
+                    self._dirty.setdefault(key, row)
+                if expire_before is not None and self._expire_before is None:
+                    self._expire_before = expire_before
+                raise
+
+    def _commit(self, batch: dict, expire_before: Optional[float]):
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    [(namespace, key, *row) for (namespace, key), row in batch.items() if row is not None],
+                )
+                self._conn.executemany(
+                    "DELETE FROM state WHERE namespace = ? AND key = ?",
+                    [key for key, row in batch.items() if row is None],
+                )
+                if expire_before is not None:
+                    self._conn.execute("DELETE FROM state WHERE expires_at <= ?", (expire_before,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def sweep(self) -> int:
+        """Drop expired entries from memory now, and from disk with the next flush; returns how many were removed."""
+        removed = sum(state_map.sweep() for state_map in self._maps.values())
+        self._expire_before = time.time()
+        self._schedule()
+        return removed
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        self._conn.close()
@@ -0,0 +1,814 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple, Optional
+
+from firebase_admin import firestore
+
+import metrics
+from mirror import FirestoreMirror
+from repository import Pager, Repository, apply_override, deep_merge
+
+
+class StorageTimeout(Exception):
+    """Raised when a storage call does not finish within its timeout."""
+
+
+class DocumentLoader:
+    """Collects document lookups made in the same loop tick and fetches them with one `get_all` call.
+
+    Results are cached for the loader's lifetime, which is one command invocation or task run.
+    """
+
+    def __init__(self, store: "AsyncStore", max_batch: int = 300):
+        self.store = store
+        self.max_batch = max_batch
+        self._cache: dict[str, asyncio.Future] = {}
+        self._queue: dict[str, Any] = {}
+        self._scheduled = False
+        self._tasks: set[asyncio.Task] = set()  # Running fetches; the loop only keeps weak references
+
+    async def load(self, ref) -> Optional[dict]:
+        """Return the document's data, or None if it does not exist."""
+        future = self._cache.get(ref.path)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[ref.path] = future
+            self._queue[ref.path] = ref
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        # Shield so one cancelled caller does not cancel the lookup for everyone sharing it
+        return await asyncio.shield(future)
+
+    async def load_many(self, refs: list) -> list[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load(ref) for ref in refs)))
+
+    def prime(self, ref, data: Optional[dict]):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(data)
+        self._cache[ref.path] = future
+
+    def clear(self, ref):
+        future = self._cache.get(ref.path)
+        if future is not None and future.done():
+            del self._cache[ref.path]
+
+    def _dispatch(self):
+        self._scheduled = False
+        refs = list(self._queue.values())
+        self._queue.clear()
+        for i in range(0, len(refs), self.max_batch):
+            task = asyncio.ensure_future(self._fetch(refs[i:i + self.max_batch]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, refs: list):
+        try:
+            snapshots = await self.store.get_all(refs)
+        except BaseException as e:
+            for ref in refs:
+                future = self._cache.pop(ref.path, None)  # Dropped so a later call can retry
+                if future is not None and not future.done():
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                    else:
+                        future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        found = {snap.reference.path: snap.to_dict() if snap.exists else None for snap in snapshots}
+        for ref in refs:
+            future = self._cache.get(ref.path)
+            if future is not None and not future.done():
+                future.set_result(found.get(ref.path))
+
+
+_current_loader: contextvars.ContextVar[Optional[DocumentLoader]] = contextvars.ContextVar("document_loader", default=None)
+
+
+class AsyncStore:
+    """Awaitable wrapper around the synchronous Firestore client.
+
+    Every call runs on a bounded thread pool, so a slow `.get()` or `.stream()`
+    never blocks the event loop. Reads and writes have separate concurrency
+    limits and every call is bounded by a timeout.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_workers: int = 8,
+        max_reads: int = 16,
+        max_writes: int = 8,
+        timeout: float = 10.0,
+    ):
+        self.client = client
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+        self._max_reads = max_reads
+        self._max_writes = max_writes
+        # Semaphores are created on first use so they bind to the bot's loop
+        self._read_slots: Optional[asyncio.Semaphore] = None
+        self._write_slots: Optional[asyncio.Semaphore] = None
+        self.write_buffer: Optional["WriteBehindBuffer"] = None
+
+    def collection(self, name: str):
+        return self.client.collection(name)
+
+    def _slots(self, write: bool) -> asyncio.Semaphore:
+        if write:
+            if self._write_slots is None:
+                self._write_slots = asyncio.Semaphore(self._max_writes)
+            return self._write_slots
+        if self._read_slots is None:
+            self._read_slots = asyncio.Semaphore(self._max_reads)
+        return self._read_slots
+
+    async def run(self, fn: Callable[..., Any], *args, write: bool = False, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking client call on the storage pool and await its result."""
+        timeout = self.timeout if timeout is None else timeout
+        async with self._slots(write):
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                raise StorageTimeout(f"{getattr(fn, '__qualname__', fn)} timed out after {timeout}s") from None
+
+    # --- READS ---
+    async def get(self, ref, timeout: Optional[float] = None):
+        snapshot = await self.run(ref.get, timeout=timeout)
+        metrics.record_storage("read", 1)
+        return snapshot
+
+    async def get_dict(self, ref, timeout: Optional[float] = None) -> Optional[dict]:
+        snapshot = await self.get(ref, timeout=timeout)
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def get_all(self, refs: list, timeout: Optional[float] = None) -> list:
+        snapshots = await self.run(lambda: list(self.client.get_all(refs)), timeout=timeout)
+        metrics.record_storage("read", len(refs))
+        return snapshots
+
+    def loader(self) -> DocumentLoader:
+        """Return the loader for the current command or task run, creating one if needed.
+
+        discord.py runs each interaction and event in its own task, so the
+        context-local loader naturally lives for exactly one request.
+        """
+        loader = _current_loader.get()
+        if loader is None:
+            loader = self.new_loader_scope()
+        return loader
+
+    def new_loader_scope(self) -> DocumentLoader:
+        """Start a fresh loader cache; long-running task loops call this once per iteration."""
+        loader = DocumentLoader(self)
+        _current_loader.set(loader)
+        return loader
+
+    async def load(self, ref) -> Optional[dict]:
+        if not self.write_buffer:
+            return await self.loader().load(ref)
+        with self.write_buffer.reading():
+            return self.write_buffer.overlay(ref, await self.loader().load(ref))
+
+    async def load_many(self, refs: list) -> list[Optional[dict]]:
+        if not self.write_buffer:
+            return await self.loader().load_many(refs)
+        with self.write_buffer.reading():
+            found = await self.loader().load_many(refs)
+            return [self.write_buffer.overlay(ref, data) for ref, data in zip(refs, found)]
+
+    async def stream(self, query, timeout: Optional[float] = None) -> list:
+        # Buffered writes cannot be overlaid on a query result, so land them first
+        if self.write_buffer and self.write_buffer.pending:
+            await self.write_buffer.flush()
+        # Materialise inside the worker thread; iterating a stream pulls pages lazily over the network
+        docs = await self.run(lambda: list(query.stream()), timeout=timeout)
+        metrics.record_storage("read", max(len(docs), 1))  # A query that matches nothing still bills one read
+        return docs
+
+    async def list_refs(self, collection, timeout: Optional[float] = None) -> list:
+        """Document references in a collection, without reading the documents themselves."""
+        refs = await self.run(lambda: list(collection.list_documents()), timeout=timeout)
+        metrics.record_storage("read", max(len(refs), 1))
+        return refs
+
+    # --- WRITES ---
+    def invalidate(self, *refs):
+        """Drop cached copies of documents written outside set/update/delete (e.g. in a transaction)."""
+        loader = _current_loader.get()
+        if loader is not None:
+            for ref in refs:
+                loader.clear(ref)
+        if self.write_buffer:
+            self.write_buffer.forget(*refs)
+
+    async def transaction(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run `fn(transaction, *args, **kwargs)` as an optimistic Firestore transaction.
+
+        `fn` runs on the storage pool and is retried by the client if another write
+        lands on a document it read, so it must not have side effects besides the
+        transaction's own writes.
+        """
+        def run_transaction():
+            return firestore.transactional(fn)(self.client.transaction(), *args, **kwargs)
+        return await self.run(run_transaction, write=True, timeout=timeout)
+
+    async def set(self, ref, data: dict, merge: bool = False, timeout: Optional[float] = None):
+        result = await self.run(ref.set, data, merge=merge, write=True, timeout=timeout)
+        metrics.record_storage("write", 1)
+        self.invalidate(ref)
+        return result
+
+    async def commit(self, batch, *refs, timeout: Optional[float] = None):
+        """Commit a WriteBatch in one round-trip; `refs` are the documents it touches."""
+        result = await self.run(batch.commit, write=True, timeout=timeout)
+        metrics.record_storage("write", len(batch))
+        self.invalidate(*refs)
+        return result
+
+    async def update(self, ref, data: dict, timeout: Optional[float] = None):
+        result = await self.run(ref.update, data, write=True, timeout=timeout)
+        metrics.record_storage("write", 1)
+        self.invalidate(ref)
+        return result
+
+    async def delete(self, ref, timeout: Optional[float] = None):
+        result = await self.run(ref.delete, write=True, timeout=timeout)
+        metrics.record_storage("write", 1)
+        self.invalidate(ref)
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class BufferedWrite(NamedTuple):
+    ref: Any
+    data: dict  # For a fold, the result as predicted from this process's own view
+    merge: bool
+    fold: Optional[Callable[[Optional[dict]], dict]] = None
+
+
+def _apply(write: BufferedWrite, current: Optional[dict]) -> dict:
+    if write.fold is not None:
+        return write.fold(current)
+    return deep_merge(current or {}, write.data) if write.merge else write.data
+
+
+def _combine(old: BufferedWrite, new: BufferedWrite) -> BufferedWrite:
+    if new.fold is None and not new.merge:
+        return new
+    if old.fold is None and new.fold is None:
+        return BufferedWrite(new.ref, deep_merge(old.data, new.data), old.merge)
+    # Either side is a fold: compose them, so the commit replays both on what is stored by then
+    data = new.data if new.fold is not None else deep_merge(old.data, new.data)
+    return BufferedWrite(new.ref, data, False, lambda current: _apply(new, _apply(old, current)))
+
+
+def _commit_writes_txn(transaction, client, writes: list[BufferedWrite]) -> list[BufferedWrite]:
+    # Folds are re-applied to the stored documents, so writes from other processes are kept
+    refs = [write.ref for write in writes if write.fold is not None]
+    current = {snap.reference.path: snap.to_dict() if snap.exists else None
+               for snap in client.get_all(refs, transaction=transaction)}
+    committed = []
+    for write in writes:
+        if write.fold is not None:
+            write = BufferedWrite(write.ref, write.fold(current.get(write.ref.path)), False)
+        transaction.set(write.ref, write.data, merge=write.merge)
+        committed.append(write)
+    return committed
+
+
+class WriteBehindBuffer:
+    """Coalesces document writes in memory and commits them as WriteBatches.
+
+    Writes to the same document merge into one, and the buffer is flushed once it
+    holds `max_batch` documents or `max_delay` seconds after the first buffered write.
+    While attached to its store, `AsyncStore.load` overlays buffered and in-flight writes,
+    so the bot always reads its own writes. A committed write is overlaid only while a
+    read that started before the commit is still running; later reads get it from Firestore.
+    `on_commit` is called with each write once its batch has committed, with a fold's result.
+
+    Only plain values can be buffered; field transforms (Increment, DELETE_FIELD)
+    must go through the store directly. A write may instead carry a `fold`: its batch
+    then commits as a transaction that re-reads the document and stores `fold(current)`,
+    so read-modify-write updates stay correct when another process writes it too.
+    """
+
+    def __init__(self, store: AsyncStore, max_batch: int = 400, max_delay: float = 2.0, recent_size: int = 1024,
+                 on_commit: Optional[Callable[[BufferedWrite], None]] = None):
+        self.store = store
+        self.on_commit = on_commit
+        self.max_batch = min(max_batch, 500)  # Firestore's per-batch limit
+        self.max_delay = max_delay
+        self.recent_size = recent_size
+        self._pending: dict[str, BufferedWrite] = {}
+        self._inflight: dict[str, BufferedWrite] = {}
+        self._recent: OrderedDict[str, BufferedWrite] = OrderedDict()  # Committed during running reads
+        self._readers = 0
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+        self.buffered = 0
+        self.committed = 0
+        self.batches = 0
+        store.write_buffer = self
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def set(self, ref, data: dict, merge: bool = False, fold: Optional[Callable[[Optional[dict]], dict]] = None):
+        """Buffer a write; with `fold`, `data` is the expected result and `fold` must be pure."""
+        write = BufferedWrite(ref, data, merge, fold)
+        old = self._pending.get(ref.path)
+        self._pending[ref.path] = _combine(old, write) if old else write
+        self.buffered += 1
+        # This request's cached copy predates the write; once it is committed the overlay is gone
+        loader = _current_loader.get()
+        if loader is not None:
+            loader.clear(ref)
+        if len(self._pending) >= self.max_batch:
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(self.max_delay)
+
+    def overlay(self, ref, data: Optional[dict]) -> Optional[dict]:
+        """`data` as last read from Firestore, with this buffer's writes to `ref` applied on top."""
+        for layer in (self._recent, self._inflight, self._pending):
+            write = layer.get(ref.path)
+            if write is not None:
+                data = deep_merge(data or {}, write.data) if write.merge else dict(write.data)
+        return data
+
+    def overlay_all(self, collection: str, docs: dict[str, dict]) -> dict[str, dict]:
+        """`docs` (a whole collection by ID) with this buffer's writes to it applied on top, in place."""
+        prefix = collection + "/"
+        for layer in (self._recent, self._inflight, self._pending):
+            for path, write in layer.items():
+                doc_id = path[len(prefix):]
+                if path.startswith(prefix) and "/" not in doc_id:
+                    docs[doc_id] = deep_merge(docs.get(doc_id) or {}, write.data) if write.merge else dict(write.data)
+        return docs
+
+    @contextlib.contextmanager
+    def reading(self):
+        """Mark a read in progress; it may return data older than writes committed meanwhile."""
+        self._readers += 1
+        try:
+            yield
+        finally:
+            self._readers -= 1
+            if not self._readers:
+                self._recent.clear()
+
+    def forget(self, *refs):
+        """Drop remembered commits for documents that were since written some other way."""
+        for ref in refs:
+            self._recent.pop(ref.path, None)
+
+    def _schedule(self, delay: float):
+        if self._timer is not None and not self._timer.done():
+            if delay > 0:
+                return
+            self._timer.cancel()
+        self._timer = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float):
+        # Timed flushes are their own operation rather than part of whichever command buffered first
+        metrics.current_operation.set("write_behind_flush")
+        await asyncio.sleep(delay)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"[STORAGE] Write-behind flush failed, retrying in {self.max_delay}s: {e}")
+            if self._pending:
+                self._schedule(self.max_delay)
+
+    async def flush(self):
+        """Commit everything buffered so far; returns once it is durable in Firestore."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            writes = list(self._inflight.values())
+            try:
+                for i in range(0, len(writes), self.max_batch):
+                    chunk = writes[i:i + self.max_batch]
+                    folds = sum(write.fold is not None for write in chunk)
+                    if folds:
+                        chunk = await self.store.transaction(_commit_writes_txn, self.store.client, chunk)
+                        metrics.record_storage("read", folds)
+                    else:
+                        batch = self.store.client.batch()
+                        for write in chunk:
+                            batch.set(write.ref, write.data, merge=write.merge)
+                        await self.store.run(batch.commit, write=True)
+                    metrics.record_storage("write", len(chunk))
+                    self.batches += 1
+                    self.committed += len(chunk)
+                    for write in chunk:
+                        path = write.ref.path
+                        del self._inflight[path]
+                        if self._readers:
+                            old = self._recent.pop(path, None)
+                            self._recent[path] = _combine(old, write) if old else write
+                        if self.on_commit is not None:
+                            self.on_commit(write)
+                    while len(self._recent) > self.recent_size:
+                        self._recent.popitem(last=False)
+            finally:
+                # Anything not committed goes back under the writes buffered since
+                for path, write in self._inflight.items():
+                    newer = self._pending.get(path)
+                    self._pending[path] = _combine(write, newer) if newer else write
+                self._inflight = {}
+
+    async def close(self, attempts: int = 3):
+        """Flush before shutdown, retrying a few times before giving up on what is left."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for attempt in range(attempts):
+            try:
+                await self.flush()
+                return
+            except Exception as e:
+                print(f"[STORAGE] Final flush attempt {attempt + 1} failed: {e}")
+        if self._pending:
+            print(f"[STORAGE] ❌ {len(self._pending)} buffered writes were not saved")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "buffered": self.buffered,
+            "committed": self.committed,
+            "batches": self.batches,
+        }
+
+
+class QueryPager(Pager):
+    """Reads an ordered query one page at a time using `start_after` cursors.
+
+    Only pages the user actually visits are fetched. The cursor for every visited
+    page is kept, plus a small cache of page contents for back navigation.
+    """
+
+    def __init__(self, store: AsyncStore, query, page_size: int, cache_pages: int = 5):
+        self.store = store
+        self.query = query
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self._cursors: list = [None]  # Last snapshot before page i (None for the first page)
+        self._has_next: dict[int, bool] = {}
+        self._cache: OrderedDict[int, list[dict]] = OrderedDict()
+
+    async def page(self, index: int) -> list[dict]:
+        """Documents on page `index`; pages must be reached in order from the first."""
+        cached = self._cache.get(index)
+        if cached is not None:
+            self._cache.move_to_end(index)
+            return cached
+        if index >= len(self._cursors):
+            raise IndexError(f"page {index} has not been reached yet")
+
+        query = self.query
+        if self._cursors[index] is not None:
+            query = query.start_after(self._cursors[index])
+        # One extra document tells us whether a next page exists
+        docs = await self.store.stream(query.limit(self.page_size + 1))
+        snapshots = docs[:self.page_size]
+        self._has_next[index] = len(docs) > self.page_size
+        if self._has_next[index] and len(self._cursors) == index + 1:
+            self._cursors.append(snapshots[-1])
+        page = [snap.to_dict() or {} for snap in snapshots]
+
+        self._cache[index] = page
+        if len(self._cache) > self.cache_pages:
+            self._cache.popitem(last=False)
+        return page
+
+    def has_next(self, index: int) -> bool:
+        return self._has_next.get(index, False)
+
+
+def _finish_legacy_warnings_txn(transaction, ref) -> int:
+    # Only the run that still finds the array counts it, so a rerun cannot count it twice
+    snapshot = ref.get(transaction=transaction)
+    legacy = (snapshot.to_dict() or {}).get("warnings") if snapshot.exists else None
+    if not isinstance(legacy, list):
+        return 0
+    transaction.update(ref, {"warnings": firestore.DELETE_FIELD, "count": firestore.Increment(len(legacy))})
+    return len(legacy)
+
+
+def _override_summary_txn(transaction, ref, username: str, override_level: Optional[int]) -> dict:
+    snapshot = ref.get(transaction=transaction)
+    summary = apply_override(snapshot.to_dict() if snapshot.exists else None, username, override_level)
+    transaction.set(ref, summary)
+    return summary
+
+
+WARNINGS_LAYOUT_VERSION = 1
+
+
+class FirestoreRepository(Repository):
+    """Repository backed by Firestore, read through an AsyncStore.
+
+    Layout: level_progress/{uid}, leaderboard_stats/{uid}, leaderboard_overrides/{uid},
+    user_prefs/{uid}, warnings/{uid} (username + count) with one document per warning
+    in warnings/{uid}/items, audit_log/* with running totals in audit_log_counts/{uid|_all},
+    and config/* and meta/* for settings and bookkeeping.
+
+    Level saves are write-behind (see WriteBehindBuffer); writes that touch the same
+    documents some other way flush the buffer first.
+
+    With a `mirror`, reads of the mirrored collections are served from its live copy once
+    it has synced, with buffered writes overlaid. This repository's own writes are applied
+    to the copy once they have committed, and `subscribe` reports changes made elsewhere.
+    """
+
+    def __init__(self, store: AsyncStore, write_batch: int = 400, write_delay: float = 2.0,
+                 mirror: Optional[FirestoreMirror] = None, mirror_wait: float = 30.0):
+        self.store = store
+        self.client = store.client
+        self.level_writes = WriteBehindBuffer(store, max_batch=write_batch, max_delay=write_delay, on_commit=self._committed)
+        self.mirror = mirror
+        self.mirror_wait = mirror_wait
+
+    def _doc(self, collection: str, doc_id: str):
+        return self.client.collection(collection).document(doc_id)
+
+    async def _stream_dicts(self, query) -> dict[str, dict]:
+        return {doc.id: doc.to_dict() or {} for doc in await self.store.stream(query)}
+
+    async def _load(self, collection: str, doc_id: str) -> Optional[dict]:
+        ref = self._doc(collection, doc_id)
+        if self.mirror and self.mirror.ready(collection):
+            return self.level_writes.overlay(ref, self.mirror.get(collection, doc_id))
+        return await self.store.load(ref)
+
+    async def _load_all(self, collection: str) -> dict[str, dict]:
+        # A whole-collection read is worth waiting for the first sync rather than paying for it twice
+        if self.mirror and await self.mirror.wait_ready(collection, self.mirror_wait):
+            return self.level_writes.overlay_all(collection, self.mirror.all(collection))
+        with self.level_writes.reading():
+            docs = await self._stream_dicts(self.client.collection(collection))
+        return self.level_writes.overlay_all(collection, docs)
+
+    def _committed(self, write: BufferedWrite):
+        if self.mirror:
+            collection, doc_id = write.ref.path.rsplit("/", 1)
+            self.mirror.write(collection, doc_id, write.data, merge=write.merge)
+
+    def new_scope(self):
+        self.store.new_loader_scope()
+
+    async def start(self):
+        if self.mirror:
+            self.mirror.start()
+
+    def mirror_status(self) -> Optional[dict[str, dict]]:
+        return self.mirror.status() if self.mirror else None
+
+    def subscribe(self, collection: str, listener: Callable[[str, Optional[dict]], None]) -> bool:
+        return self.mirror.subscribe(collection, listener) if self.mirror else False
+
+    async def close(self):
+        if self.mirror:
+            await self.mirror.close()
+        await self.level_writes.close()
+        self.store.close()
+
+    async def migrate(self):
+        meta = await self.get_meta("migrations") or {}
+        if meta.get("warnings") != WARNINGS_LAYOUT_VERSION:
+            # Warnings used to be an array on warnings/{uid}; they are now one document each
+            moved = 0
+            for doc in await self.store.stream(self.client.collection("warnings")):
+                legacy = (doc.to_dict() or {}).get("warnings")
+                if isinstance(legacy, list):
+                    moved += await self._migrate_legacy_warnings(doc.id, legacy)
+            await self.set_meta("migrations", {"warnings": WARNINGS_LAYOUT_VERSION}, merge=True)
+            print(f"📦 Warnings migrated: {moved} legacy warning(s) moved to per-warning documents")
+
+    async def ping(self):
+        # A direct get, not through the loader cache; a missing document still proves reachability
+        await self.store.get(self._doc("meta", "health"))
+
+    # --- CONFIG / META ---
+    async def get_config(self, name: str) -> Optional[dict]:
+        return await self.store.load(self._doc("config", name))
+
+    async def get_meta(self, name: str) -> Optional[dict]:
+        return await self.store.load(self._doc("meta", name))
+
+    async def set_meta(self, name: str, data: dict, merge: bool = False):
+        await self.store.set(self._doc("meta", name), data, merge=merge)
+
+    # --- USER PREFS ---
+    async def get_prefs(self, user_id: str) -> Optional[dict]:
+        return await self._load("user_prefs", user_id)
+
+    async def update_prefs(self, user_id: str, data: dict):
+        await self.store.set(self._doc("user_prefs", user_id), data, merge=True)
+        if self.mirror:
+            self.mirror.write("user_prefs", user_id, data, merge=True)
+
+    async def all_prefs(self) -> dict[str, dict]:
+        return await self._load_all("user_prefs")
+
+    # --- LEVEL PROGRESS ---
+    async def get_progress(self, user_id: str) -> Optional[dict]:
+        return await self._load("level_progress", user_id)
+
+    async def all_progress(self) -> dict[str, dict]:
+        return await self._load_all("level_progress")
+
+    async def progress_between(self, start: str, end: str) -> dict[str, dict]:
+        # Entries are a map inside each user's document, so this is a full scan filtered in memory
+        result = {}
+        for user_id, data in (await self.all_progress()).items():
+            entries = {d: v for d, v in data.get("entries", {}).items() if start <= d <= end}
+            if entries:
+                result[user_id] = {"username": data.get("username", "?"), "entries": entries}
+        return result
+
+    async def save_level(self, user_id: str, username: str, date_str: str, value: int, fold: Callable[[Optional[dict]], dict]) -> dict:
+        stats_ref = self._doc("leaderboard_stats", user_id)
+        # The summary read already includes any buffered save, and nothing awaits between
+        # the read and the buffered writes, so concurrent saves here cannot interleave.
+        # The fold is re-applied in a transaction at flush, which covers other instances too.
+        summary = fold(await self.store.load(stats_ref))
+        progress = {"username": username, "entries": {date_str: value}}
+        self.level_writes.set(self._doc("level_progress", user_id), progress, merge=True)
+        self.level_writes.set(stats_ref, summary, fold=fold)
+        return summary
+
+    async def delete_progress(self, user_id: str):
+        # Buffered saves would otherwise land after the delete and bring the data back
+        await self.level_writes.flush()
+        await self.store.delete(self._doc("level_progress", user_id))
+        if self.mirror:
+            self.mirror.delete("level_progress", user_id)
+
+    # --- LEADERBOARD SUMMARIES ---
+    async def get_summary(self, user_id: str) -> Optional[dict]:
+        return await self._load("leaderboard_stats", user_id)
+
+    async def save_summary(self, user_id: str, summary: dict):
+        # Through the buffer, so it cannot be overtaken by an older buffered summary
+        self.level_writes.set(self._doc("leaderboard_stats", user_id), summary)
+
+    async def delete_summary(self, user_id: str):
+        await self.level_writes.flush()
+        await self.store.delete(self._doc("leaderboard_stats", user_id))
+        if self.mirror:
+            self.mirror.delete("leaderboard_stats", user_id)
+
+    async def all_summaries(self) -> dict[str, dict]:
+        return await self._load_all("leaderboard_stats")
+
+    async def replace_summaries(self, summaries: dict[str, dict]):
+        items = list(summaries.items())
+        for i in range(0, len(items), 400):
+            batch = self.client.batch()
+            for user_id, summary in items[i:i + 400]:
+                batch.set(self._doc("leaderboard_stats", user_id), summary)
+            await self.store.run(batch.commit, write=True)
+            metrics.record_storage("write", len(batch))
+            if self.mirror:
+                for user_id, summary in items[i:i + 400]:
+                    self.mirror.write("leaderboard_stats", user_id, summary)
+
+    async def top_summaries(self, field: str, limit: int, period: Optional[tuple[str, str]] = None) -> list[tuple[str, dict]]:
+        if self.mirror and self.mirror.ready("leaderboard_stats"):
+            # Same order as the query below: field descending, then document ID descending
+            docs = self.level_writes.overlay_all("leaderboard_stats", self.mirror.all("leaderboard_stats"))
+            rows = [
+                (user_id, d) for user_id, d in docs.items()
+                if field in d and (period is None or d.get(period[0]) == period[1])
+            ]
+            rows.sort(key=lambda item: (item[1][field], item[0]), reverse=True)
+            return [(user_id, dict(d)) for user_id, d in rows[:limit]]
+        # Period queries need composite indexes on (week_key, week_max DESC) and (month_key, month_max DESC)
+        query = self.client.collection("leaderboard_stats")
+        if period:
+            query = query.where(period[0], "==", period[1])
+        docs = await self.store.stream(query.order_by(field, direction=firestore.Query.DESCENDING).limit(limit))
+        return [(doc.id, doc.to_dict() or {}) for doc in docs]
+
+    async def set_summary_override(self, user_id: str, username: str, override_level: Optional[int]) -> dict:
+        ref = self._doc("leaderboard_stats", user_id)
+        # The transaction reads Firestore, so buffered summaries must land first
+        await self.level_writes.flush()
+        summary = await self.store.transaction(_override_summary_txn, ref, username, override_level)
+        metrics.record_storage("read", 1)
+        metrics.record_storage("write", 1)
+        self.store.invalidate(ref)
+        if self.mirror:
+            self.mirror.write("leaderboard_stats", user_id, summary)
+        return summary
+
+    # --- LEADERBOARD OVERRIDES ---
+    async def get_override(self, user_id: str) -> Optional[dict]:
+        return await self._load("leaderboard_overrides", user_id)
+
+    async def set_override(self, user_id: str, data: dict):
+        await self.store.set(self._doc("leaderboard_overrides", user_id), data)
+        if self.mirror:
+            self.mirror.write("leaderboard_overrides", user_id, data)
+
+    async def delete_override(self, user_id: str):
+        await self.store.delete(self._doc("leaderboard_overrides", user_id))
+        if self.mirror:
+            self.mirror.delete("leaderboard_overrides", user_id)
+
+    async def all_overrides(self) -> dict[str, dict]:
+        return await self._load_all("leaderboard_overrides")
+
+    # --- WARNINGS ---
+    def _warning_items(self, user_id: str):
+        return self._doc("warnings", user_id).collection("items")
+
+    async def _migrate_legacy_warnings(self, user_id: str, legacy: list) -> int:
+        # Fixed item IDs make the copy safe to repeat: a rerun overwrites instead of duplicating
+        items = self._warning_items(user_id)
+        for i in range(0, len(legacy), 400):
+            batch = self.client.batch()
+            for n, warning in enumerate(legacy[i:i + 400], start=i):
+                batch.set(items.document(f"legacy-{n:05d}"), warning)
+            await self.store.commit(batch)
+        ref = self._doc("warnings", user_id)
+        moved = await self.store.transaction(_finish_legacy_warnings_txn, ref)
+        metrics.record_storage("read", 1)
+        metrics.record_storage("write", 1)
+        self.store.invalidate(ref)
+        return moved
+
+    async def add_warning(self, user_id: str, username: str, warning: dict):
+        doc_ref = self._doc("warnings", user_id)
+        # Item and counter go out in one batch: a single round-trip, no read
+        batch = self.client.batch()
+        batch.set(self._warning_items(user_id).document(), warning)
+        batch.set(doc_ref, {"username": username, "count": firestore.Increment(1)}, merge=True)
+        await self.store.commit(batch, doc_ref)
+
+    async def warning_count(self, user_id: str) -> int:
+        data = await self.store.load(self._doc("warnings", user_id))
+        return (data or {}).get("count", 0)
+
+    def warnings_pager(self, user_id: str, page_size: int) -> Pager:
+        query = self._warning_items(user_id).order_by("timestamp", direction=firestore.Query.DESCENDING)
+        return QueryPager(self.store, query, page_size)
+
+    async def clear_warnings(self, user_id: str):
+        doc_ref = self._doc("warnings", user_id)
+        refs = await self.store.list_refs(self._warning_items(user_id))
+        refs.append(doc_ref)
+        # Firestore batches take at most 500 writes
+        for i in range(0, len(refs), 500):
+            batch = self.client.batch()
+            for ref in refs[i:i + 500]:
+                batch.delete(ref)
+            await self.store.commit(batch, doc_ref)
+
+    # --- AUDIT LOG ---
+    def _audit_counter(self, user_id: Optional[str] = None):
+        return self._doc("audit_log_counts", user_id or "_all")
+
+    async def add_audit_entry(self, entry: dict):
+        # The entry and its counters are written in the same batch
+        batch = self.client.batch()
+        batch.set(self.client.collection("audit_log").document(), entry)
+        counters = {"total": firestore.Increment(1), "action_type": {entry["action_type"]: firestore.Increment(1)}}
+        refs = [self._audit_counter()] + ([self._audit_counter(entry["user_id"])] if entry.get("user_id") else [])
+        for ref in refs:
+            batch.set(ref, counters, merge=True)
+        await self.store.commit(batch, *refs)
+
+    async def audit_count(self, user_id: Optional[str] = None, action_type: Optional[str] = None) -> Optional[int]:
+        data = await self.store.load(self._audit_counter(user_id))
+        if data is None:
+            return None
+        if action_type:
+            return data.get("action_type", {}).get(action_type, 0)
+        return data.get("total", 0)
+
+    def audit_pager(self, user_id: Optional[str], action_type: Optional[str], page_size: int) -> Pager:
+        query = self.client.collection("audit_log").order_by("timestamp", direction=firestore.Query.DESCENDING)
+        if user_id:
+            query = query.where("user_id", "==", user_id)
+        if action_type:
+            query = query.where("action_type", "==", action_type)
+        return QueryPager(self.store, query, page_size)
@@ -0,0 +1,29 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def bot():
+    """bot.py imported with placeholder config and a throwaway SQLite backend."""
+    scratch = tempfile.mkdtemp(prefix="bot-tests-")
+    for name, value in {
+        "DISCORD_TOKEN": "test",
+        "GUILD_ID": "900000000000000000",
+        "CHECKIN_CHANNEL_ID": "1",
+        "REPORT_CHANNEL_ID": "2",
+        "ADMIN_ROLE_NAME": "Admin",
+    }.items():
+        os.environ.setdefault(name, value)
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(scratch, "levels.db")
+    os.environ["STATE_DB_PATH"] = os.path.join(scratch, "bot_state.db")
+    import bot
+    yield bot
+    asyncio.run(bot.repo.close())
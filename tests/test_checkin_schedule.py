@@ -0,0 +1,46 @@
+import datetime
+
+import pytz
+
+UTC = pytz.utc
+
+
+def at(*args) -> datetime.datetime:
+    return UTC.localize(datetime.datetime(*args))
+
+
+def test_default_time_is_8pm_eastern(bot):
+    # 2024-06-10 12:00 UTC is 08:00 EDT, so today's 20:00 EDT (00:00 UTC) is next
+    assert bot.next_checkin_utc({}, at(2024, 6, 10, 12)) == at(2024, 6, 11, 0)
+
+
+def test_passed_time_moves_to_the_next_day(bot):
+    prefs = {"checkin_time": {"hour": 9, "minute": 15, "timezone": "Europe/Berlin"}}
+    assert bot.next_checkin_utc(prefs, at(2024, 6, 10, 7, 14)) == at(2024, 6, 10, 7, 15)
+    assert bot.next_checkin_utc(prefs, at(2024, 6, 10, 7, 16)) == at(2024, 6, 11, 7, 15)
+
+
+def test_opted_out_users_are_not_planned(bot):
+    assert bot.next_checkin_utc({"opt_in": False}, at(2024, 6, 10, 12)) is None
+
+
+def test_time_in_the_spring_forward_gap_shifts_past_it(bot):
+    # 2024-03-10 02:30 does not exist in US/Eastern; it fires at 03:30 EDT instead
+    prefs = {"checkin_time": {"hour": 2, "minute": 30, "timezone": "US/Eastern"}}
+    fire = bot.next_checkin_utc(prefs, at(2024, 3, 9, 12))
+    assert fire == at(2024, 3, 10, 7, 30)
+    assert fire.astimezone(pytz.timezone("US/Eastern")).strftime("%H:%M %Z") == "03:30 EDT"
+
+
+def test_time_in_the_fall_back_overlap_fires_once(bot):
+    # 2024-11-03 01:30 happens twice in US/Eastern; only the first (EDT) one fires
+    prefs = {"checkin_time": {"hour": 1, "minute": 30, "timezone": "US/Eastern"}}
+    first = bot.next_checkin_utc(prefs, at(2024, 11, 2, 12))
+    assert first == at(2024, 11, 3, 5, 30)
+    # Just after it, the next one is the following night, not the repeated 01:30 EST
+    assert bot.next_checkin_utc(prefs, first + datetime.timedelta(seconds=1)) == at(2024, 11, 4, 6, 30)
+
+
+def test_unknown_timezone_falls_back_to_eastern(bot):
+    prefs = {"checkin_time": {"hour": 20, "minute": 0, "timezone": "Mars/Olympus_Mons"}}
+    assert bot.next_checkin_utc(prefs, at(2024, 6, 10, 12)) == at(2024, 6, 11, 0)
@@ -0,0 +1,124 @@
+import asyncio
+from typing import NamedTuple, Optional
+
+from storage import DocumentLoader
+
+
+class Ref(NamedTuple):
+    path: str
+
+
+class Snapshot(NamedTuple):
+    reference: Ref
+    data: Optional[dict]
+
+    @property
+    def exists(self) -> bool:
+        return self.data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return dict(self.data) if self.data is not None else None
+
+
+class FakeStore:
+    """Just the `get_all` the loader calls, recording every batch it is asked for."""
+
+    def __init__(self, docs: dict[str, dict]):
+        self.docs = docs
+        self.batches: list[list[str]] = []
+        self.fail: Optional[Exception] = None
+
+    async def get_all(self, refs: list) -> list[Snapshot]:
+        self.batches.append([ref.path for ref in refs])
+        await asyncio.sleep(0)
+        if self.fail:
+            raise self.fail
+        return [Snapshot(ref, self.docs.get(ref.path)) for ref in refs]
+
+
+DOCS = {f"users/{i}": {"n": i} for i in range(10)}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_loads_in_one_tick_share_one_batch():
+    store = FakeStore(DOCS)
+
+    async def scenario():
+        loader = DocumentLoader(store)
+        return await asyncio.gather(loader.load(Ref("users/1")), loader.load(Ref("users/2")), loader.load(Ref("users/404")))
+
+    assert run(scenario()) == [{"n": 1}, {"n": 2}, None]
+    assert store.batches == [["users/1", "users/2", "users/404"]]
+
+
+def test_repeated_lookups_are_fetched_once():
+    store = FakeStore(DOCS)
+
+    async def scenario():
+        loader = DocumentLoader(store)
+        first = await loader.load_many([Ref("users/1"), Ref("users/1"), Ref("users/3")])
+        second = await loader.load(Ref("users/3"))
+        return first, second
+
+    assert run(scenario()) == ([{"n": 1}, {"n": 1}, {"n": 3}], {"n": 3})
+    assert store.batches == [["users/1", "users/3"]]
+
+
+def test_large_lookups_are_split_into_batches():
+    store = FakeStore(DOCS)
+
+    async def scenario():
+        loader = DocumentLoader(store, max_batch=4)
+        return await loader.load_many([Ref(path) for path in DOCS])
+
+    assert len(run(scenario())) == 10
+    assert [len(batch) for batch in store.batches] == [4, 4, 2]
+
+
+def test_clear_drops_the_cached_copy():
+    store = FakeStore(DOCS)
+
+    async def scenario():
+        loader = DocumentLoader(store)
+        await loader.load(Ref("users/1"))
+        store.docs = {**DOCS, "users/1": {"n": 100}}
+        cached = await loader.load(Ref("users/1"))
+        loader.clear(Ref("users/1"))
+        return cached, await loader.load(Ref("users/1"))
+
+    assert run(scenario()) == ({"n": 1}, {"n": 100})
+    assert len(store.batches) == 2
+
+
+def test_failed_fetch_reaches_every_caller_and_can_be_retried():
+    store = FakeStore(DOCS)
+    store.fail = RuntimeError("unavailable")
+
+    async def scenario():
+        loader = DocumentLoader(store)
+        results = await asyncio.gather(loader.load(Ref("users/1")), loader.load(Ref("users/2")), return_exceptions=True)
+        store.fail = None
+        return results, await loader.load(Ref("users/1"))
+
+    results, retried = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == {"n": 1}
+    assert len(store.batches) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    store = FakeStore(DOCS)
+
+    async def scenario():
+        loader = DocumentLoader(store)
+        first = asyncio.ensure_future(loader.load(Ref("users/1")))
+        second = asyncio.ensure_future(loader.load(Ref("users/1")))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert run(scenario()) == {"n": 1}
+    assert len(store.batches) == 1
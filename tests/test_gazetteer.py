@@ -0,0 +1,89 @@
+import pytest
+
+from gazetteer import Gazetteer, normalize
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer.load()
+
+
+def zone(place):
+    return place.timezone if place else None
+
+
+def test_normalize():
+    assert normalize("  São_Paulo!! ") == "sao paulo"
+    assert normalize("Saint-Étienne") == "saint etienne"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Paris", "Europe/Paris"),
+    ("new york", "America/New_York"),
+    ("São Paulo", "America/Sao_Paulo"),
+    ("Mumbai", "Asia/Kolkata"),  # From the aliases, not a zone name
+    ("Hanoi", "Asia/Ho_Chi_Minh"),
+])
+def test_exact_names(gazetteer, query, expected):
+    assert zone(gazetteer.resolve(query)) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Pariss", "Europe/Paris"),
+    ("Londn", "Europe/London"),
+    ("Tokio", "Asia/Tokyo"),
+    ("Vancouv", "America/Vancouver"),  # A prefix of one place only
+])
+def test_fuzzy_matches(gazetteer, query, expected):
+    assert zone(gazetteer.resolve(query)) == expected
+
+
+def test_short_or_ambiguous_guesses_are_left_to_the_caller(gazetteer):
+    assert gazetteer.resolve("Man") is None  # Too short to guess from
+    assert gazetteer.resolve("San") is None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Paris, France", "Europe/Paris"),
+    ("paris, fr", "Europe/Paris"),
+    ("Melbourne, Australia", "Australia/Melbourne"),
+])
+def test_country_hint(gazetteer, query, expected):
+    assert zone(gazetteer.resolve(query)) == expected
+
+
+def test_wrong_country_hint_is_not_ignored(gazetteer):
+    assert gazetteer.resolve("Paris, Germany") is None
+    assert gazetteer.resolve("Mumbai, US") is None
+
+
+def test_unknown_region_is_not_dropped(gazetteer):
+    # "Maine" is not a country, so "Portland" alone must not decide it
+    assert gazetteer.resolve("Portland, Maine") is None
+    assert gazetteer.resolve("Portland") is not None
+
+
+def test_suggest_by_prefix(gazetteer):
+    labels = [place.label for place in gazetteer.suggest("San", limit=5)]
+    assert len(labels) == 5
+    assert all(label.startswith("San") for label in labels)
+    assert "San Francisco, United States" in labels
+
+
+def test_geonames_dump_prefers_the_most_populous(tmp_path):
+    def row(geoname_id, name, country, population, timezone):
+        cols = [""] * 19
+        cols[0], cols[1], cols[2], cols[4], cols[5] = str(geoname_id), name, name, "0", "0"
+        cols[8], cols[14], cols[17] = country, str(population), timezone
+        return "\t".join(cols)
+
+    dump = tmp_path / "cities.txt"
+    dump.write_text("\n".join([
+        row(1, "Springfield", "US", 116_000, "America/Chicago"),
+        row(2, "Springfield", "US", 155_000, "America/New_York"),
+        row(3, "Springfield", "US", 169_000, "America/Chicago"),
+        row(4, "Nowhere", "US", 10, "Not/AZone"),
+    ]), encoding="utf-8")
+    gazetteer = Gazetteer.load(str(dump))
+    assert gazetteer.resolve("Springfield").population == 169_000
+    assert gazetteer.resolve("Nowhere") is None
@@ -0,0 +1,117 @@
+import asyncio
+
+import numpy as np
+
+from level_matrix import MISSING, LevelMatrix
+
+
+def loaded(progress: dict, **kwargs) -> LevelMatrix:
+    matrix = LevelMatrix(**kwargs)
+
+    async def load():
+        return progress
+
+    asyncio.run(matrix.load(load))
+    return matrix
+
+
+PROGRESS = {
+    "1": {"username": "ana", "entries": {"2024-06-03": 10, "2024-06-05": 14, "2024-06-09": 12}},
+    "2": {"username": "ben", "entries": {"2024-06-04": 3, "2024-06-06": 7}},
+    "3": {"username": "cat", "entries": {"2024-06-07": 9}},
+    "4": {"username": "dan", "entries": {"2024-05-01": 40, "2024-06-08": -1}},
+}
+
+
+def test_window_and_period_queries():
+    m = loaded(PROGRESS)
+    assert m.period_max("2024-06-03", "2024-06-09").tolist() == [14, 7, 9, MISSING]
+    assert m.activity("2024-06-03", "2024-06-09").tolist() == [3, 2, 1, 0]
+    # Highest minus lowest; a single level counts in full; none counts as 0
+    assert m.gains("2024-06-03", "2024-06-09").tolist() == [4, 4, 9, 0]
+
+
+def test_values_for_pads_outside_the_matrix():
+    m = loaded(PROGRESS)
+    assert m.values_for("2", "2024-06-03", "2024-06-07") == [None, 3, None, 7, None]
+    # Days past the latest one and users without a row are all None
+    assert m.values_for("3", "2024-06-09", "2024-06-11") == [None, None, None]
+    assert m.values_for("nobody", "2024-06-01", "2024-06-02") == [None, None]
+
+
+def test_top_breaks_ties_by_user_id():
+    m = loaded(PROGRESS)
+    scores = np.array([5, 7, 5, 5])
+    assert m.top(scores, 2) == [("2", "ben", 7), ("1", "ana", 5)]
+    assert [row[0] for row in m.top(scores, 3)] == ["2", "1", "3"]
+    assert m.top(np.array([-1, 2, -1, -1]), 3) == [("2", "ben", 2)]
+
+
+def test_movers_leave_out_users_without_levels():
+    m = loaded(PROGRESS)
+    assert m.movers("2024-06-03", "2024-06-09", 10) == [("3", "cat", 9), ("1", "ana", 4), ("2", "ben", 4)]
+
+
+def test_set_new_user_and_later_day():
+    m = loaded(PROGRESS)
+    m.set("5", "eve", "2024-06-12", 11)
+    m.set("1", "ana2", "2024-06-12", 15)
+    m.set("2", "ben", "2024-06-06", -1)  # Checked in without a level: clears that day
+    assert m.values_for("5", "2024-06-11", "2024-06-12") == [None, 11]
+    assert m.values_for("2", "2024-06-06", "2024-06-06") == [None]
+    assert m.names[m.user_ids.index("1")] == "ana2"
+    assert m.period_max("2024-06-10", "2024-06-12").tolist() == [15, MISSING, MISSING, MISSING, 11]
+
+
+def test_remove_keeps_the_row_empty():
+    m = loaded(PROGRESS)
+    m.remove("1")
+    assert m.values_for("1", "2024-06-03", "2024-06-09") == [None] * 7
+    assert len(m) == 4
+
+
+def test_growth_keeps_existing_data():
+    m = LevelMatrix()
+    for i in range(40):  # Past the initial 16 rows
+        m.set(str(i), f"user{i}", "2024-01-01", i)
+    for day in range(2, 29):
+        m.set("0", "user0", f"2024-02-{day:02d}", day)
+    assert len(m) == 40
+    assert m.values_for("39", "2024-01-01", "2024-01-01") == [39]
+    assert m.values_for("0", "2024-02-27", "2024-02-28") == [27, 28]
+
+
+def test_budget_drops_the_oldest_days():
+    # 4 bytes × 16 rows × 10 days
+    m = LevelMatrix(max_bytes=4 * 16 * 10, min_days=5)
+    m.set("1", "ana", "2024-06-01", 1)
+    for day in range(2, 16):
+        m.set("1", "ana", f"2024-06-{day:02d}", day)
+    assert m.nbytes <= m.max_bytes
+    assert m.values_for("1", "2024-06-01", "2024-06-02") == [None, None]
+    assert m.values_for("1", "2024-06-14", "2024-06-15") == [14, 15]
+
+
+def test_load_stays_within_the_budget():
+    progress = {
+        str(i): {"username": f"user{i}", "entries": {f"2024-{1 + d // 28:02d}-{1 + d % 28:02d}": d for d in range(0, 150, 3)}}
+        for i in range(70)
+    }
+    m = loaded(progress, max_bytes=32_000, min_days=10)
+    assert m.nbytes <= m.max_bytes
+    assert m.covers("2024-06-01")
+    assert m.values_for("5", "2024-06-08", "2024-06-08") == [147]
+
+
+def test_writes_during_a_load_are_applied_once_after_it():
+    m = LevelMatrix()
+
+    async def run():
+        async def load():
+            m.set("1", "ana", "2024-06-09", 13)  # Arrives while the load is running
+            return PROGRESS
+        await m.load(load)
+
+    asyncio.run(run())
+    assert m.values_for("1", "2024-06-09", "2024-06-09") == [13]
+    assert len(m) == 4
@@ -0,0 +1,102 @@
+def fold_all(bot, entries, summary=None, username="ana"):
+    for date_str, level in entries:
+        summary = bot.fold_level_summary(summary, username, date_str, level)
+    return summary
+
+
+def test_first_entry(bot):
+    s = fold_all(bot, [("2024-06-05", 12)])
+    assert s["all_time_max"] == s["score"] == 12
+    assert (s["week_key"], s["week_max"]) == ("2024-06-03", 12)
+    assert (s["month_key"], s["month_max"]) == ("2024-06", 12)
+    assert s["checkins"] == s["days"] == s["streak"] == 1
+
+
+def test_same_day_resubmission_replaces_the_level(bot):
+    s = fold_all(bot, [("2024-06-04", 10), ("2024-06-05", 14), ("2024-06-05", 11)])
+    assert s["last_level"] == 11
+    assert s["all_time_max"] == s["week_max"] == 11
+    assert s["checkins"] == s["days"] == 2
+    assert s["total"] == 21
+    assert s["streak"] == 2
+
+
+def test_fold_does_not_modify_its_input(bot):
+    before = fold_all(bot, [("2024-06-04", 10)])
+    snapshot = dict(before)
+    bot.fold_level_summary(before, "ana", "2024-06-05", 12)
+    assert before == snapshot
+
+
+def test_week_rollover(bot):
+    # Sunday 2024-06-09 then Monday 2024-06-10: a new week, the same month
+    s = fold_all(bot, [("2024-06-08", 9), ("2024-06-09", 15), ("2024-06-10", 7)])
+    assert (s["week_key"], s["week_max"]) == ("2024-06-10", 7)
+    assert (s["month_key"], s["month_max"]) == ("2024-06", 15)
+    assert s["all_time_max"] == 15
+
+
+def test_month_rollover(bot):
+    # Wednesday 2024-07-31 then Thursday 2024-08-01: a new month, the same week
+    s = fold_all(bot, [("2024-07-31", 20), ("2024-08-01", 5)])
+    assert (s["month_key"], s["month_max"]) == ("2024-08", 5)
+    assert (s["week_key"], s["week_max"]) == ("2024-07-29", 20)
+
+
+def test_gap_resets_the_streak_but_keeps_the_record(bot):
+    s = fold_all(bot, [("2024-06-01", 1), ("2024-06-02", 2), ("2024-06-03", 3), ("2024-06-06", 4)])
+    assert s["streak"] == 1
+    assert s["longest_streak"] == 3
+
+
+def test_check_in_without_a_level(bot):
+    s = fold_all(bot, [("2024-06-04", 8), ("2024-06-05", -1)])
+    assert s["days"] == 2
+    assert s["checkins"] == 1
+    assert s["all_time_max"] == 8
+    assert s["week_max"] == 8
+
+
+def test_older_entry_only_updates_the_all_time_aggregates(bot):
+    s = fold_all(bot, [("2024-06-10", 5), ("2024-05-20", 30)])
+    assert s["last_date"] == "2024-06-10"
+    assert s["all_time_max"] == 30
+    assert s["best_date"] == "2024-05-20"
+    assert s["week_max"] == s["month_max"] == 5
+
+
+def test_override_is_preserved(bot):
+    s = fold_all(bot, [("2024-06-04", 10)])
+    s = dict(s, override_level=40, score=40)
+    s = fold_all(bot, [("2024-06-05", 12)], s)
+    assert s["override_level"] == 40
+    assert s["score"] == 40
+    assert s["all_time_max"] == 12
+
+
+def test_rebuild_matches_incremental_folding(bot):
+    entries = [("2024-06-01", 3), ("2024-06-02", -1), ("2024-06-04", 6), ("2024-06-04", 5)]
+    s = fold_all(bot, entries)
+    assert bot.build_level_summary("ana", dict(entries)) == s
+
+
+def test_level_stats(bot):
+    s = fold_all(bot, [("2024-06-01", 10), ("2024-06-10", 16), ("2024-06-14", 20), ("2024-06-15", 21)])
+    stats = bot.level_stats(s, "2024-06-15")
+    assert (stats["latest_level"], stats["latest_date"]) == (21, "2024-06-15")
+    # Measured from the last level on or before 7 and 30 days ago: 2024-06-01's 10, then nothing
+    assert stats["delta_7"] == 11
+    assert stats["delta_30"] is None
+    assert stats["velocity"] == (21 - 10) / 14
+    assert stats["current_streak"] == 2
+    assert stats["average"] == (10 + 16 + 20 + 21) / 4
+    assert (stats["best_level"], stats["best_date"]) == (21, "2024-06-15")
+
+
+def test_level_stats_are_re_anchored_on_today(bot):
+    s = fold_all(bot, [("2024-06-01", 10), ("2024-06-05", 12)])
+    stats = bot.level_stats(s, "2024-06-09")
+    assert stats["days_since"] == 4
+    assert stats["current_streak"] == 0  # No check-in yesterday or today
+    assert stats["latest_date"] == "2024-06-05"
+    assert stats["delta_7"] == 2
@@ -0,0 +1,54 @@
+import pytest
+
+
+@pytest.fixture
+def index(bot):
+    index = bot.RankIndex()
+    for user_id, name, score in [("1", "ana", 50), ("2", "ben", 70), ("3", "cat", 50), ("4", "dan", 30), ("5", "eve", 50)]:
+        index.update(user_id, name, score)
+    return index
+
+
+def test_ties_share_a_rank_and_are_listed_by_user_id(index):
+    assert index.top(10) == [
+        (1, "2", "ben", 70),
+        (2, "1", "ana", 50),
+        (2, "3", "cat", 50),
+        (2, "5", "eve", 50),
+        (5, "4", "dan", 30),
+    ]
+    assert [index.rank(user_id) for user_id in "12345"] == [2, 1, 2, 5, 2]
+
+
+def test_top_k_cuts_inside_a_tie(index):
+    assert index.top(3) == [(1, "2", "ben", 70), (2, "1", "ana", 50), (2, "3", "cat", 50)]
+
+
+def test_around_is_centred_on_the_user(index):
+    assert [row[1] for row in index.around("3", radius=1)] == ["1", "3", "5"]
+    # Clipped at either end
+    assert [row[1] for row in index.around("2", radius=2)] == ["2", "1", "3"]
+    assert [row[1] for row in index.around("4", radius=2)] == ["3", "5", "4"]
+    assert index.around("nobody") == []
+
+
+def test_update_moves_and_removes(index):
+    index.update("4", "dan", 90)
+    assert index.rank("4") == 1
+    assert index.rank("2") == 2
+    index.update("2", "ben", -1)  # Negative scores are not ranked
+    assert index.rank("2") is None
+    index.remove("1")
+    assert len(index) == 3
+    assert index.top(10) == [(1, "4", "dan", 90), (2, "3", "cat", 50), (2, "5", "eve", 50)]
+
+
+def test_renamed_user_keeps_one_entry(index):
+    index.update("1", "ana2", 50)
+    assert len(index) == 5
+    assert index.top(2)[1] == (2, "1", "ana2", 50)
+
+
+def test_slice_pages(index):
+    assert [row[1] for row in index.slice(2, 2)] == ["3", "5"]
+    assert index.slice(10, 5) == []
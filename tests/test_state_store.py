@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+import state
+from state import StateStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(state.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "state.db")
+
+
+def test_entries_expire_after_their_ttl(clock, path):
+    store = StateStore(path)
+    pending = store.namespace("pending", ttl=60, max_entries=10)
+    pending["1"] = "asked"
+    pending.set("2", "awaiting", ttl=300)
+    clock.now += 59
+    assert pending.get("1") == "asked"
+    clock.now += 2
+    assert pending.get("1") is None
+    assert "1" not in pending
+    assert pending["2"] == "awaiting"
+
+
+def test_setting_again_renews_the_ttl(clock, path):
+    pending = StateStore(path).namespace("pending", ttl=60, max_entries=10)
+    pending["1"] = "asked"
+    clock.now += 50
+    pending["1"] = "awaiting"
+    clock.now += 50
+    assert pending.get("1") == "awaiting"
+
+
+def test_oldest_entries_are_evicted_at_the_cap(clock, path):
+    pending = StateStore(path).namespace("pending", ttl=60, max_entries=3)
+    for key in "abcd":
+        pending[key] = "asked"
+        clock.now += 1
+    assert list(pending) == ["b", "c", "d"]
+    pending["b"] = "awaiting"  # Moves to the back
+    pending["e"] = "asked"
+    assert list(pending) == ["d", "b", "e"]
+
+
+def test_sweep_removes_expired_entries(clock, path):
+    store = StateStore(path)
+    pending = store.namespace("pending", ttl=60, max_entries=10)
+    sent = store.namespace("sent", ttl=600, max_entries=10)
+    pending["1"] = "asked"
+    sent["1"] = "2024-06-10"
+    clock.now += 120
+    assert store.sweep() == 1
+    assert len(pending) == 0
+    assert len(sent) == 1
+
+
+def test_state_survives_a_restart(clock, path):
+    store = StateStore(path)
+    pending = store.namespace("pending", ttl=60, max_entries=10)
+    pending["1"] = "asked"
+    pending["2"] = "awaiting"
+    pending.pop("2")
+    store._conn.close()
+
+    reopened = StateStore(path).namespace("pending", ttl=60, max_entries=10)
+    assert dict((key, reopened[key]) for key in reopened) == {"1": "asked"}
+    clock.now += 61
+    # Expired rows are not loaded
+    assert len(StateStore(path).namespace("pending", ttl=60, max_entries=10)) == 0
+
+
+def test_changes_on_the_loop_are_written_behind(path):
+    async def run():
+        store = StateStore(path, flush_delay=60)
+        pending = store.namespace("pending", ttl=60, max_entries=10)
+        pending["1"] = "asked"
+        rows = store._conn.execute("SELECT COUNT(*) FROM state").fetchone()[0]
+        await store.close()  # Flushes what the timer has not written yet
+        return rows
+
+    assert asyncio.run(run()) == 0
+    reopened = StateStore(path).namespace("pending", ttl=60, max_entries=10)
+    assert reopened.get("1") == "asked"
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_firestore import FakeFirestore
+from storage import AsyncStore, FirestoreRepository
+
+
+@pytest.fixture
+def client():
+    client = FakeFirestore()
+    client.seed("warnings", {
+        "1": {"username": "ana", "warnings": [
+            {"timestamp": "2024-06-01T10:00:00", "reason": "spam"},
+            {"timestamp": "2024-06-02T10:00:00", "reason": "off-topic"},
+        ]},
+        "2": {"username": "ben", "count": 3},
+    })
+    return client
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _repo(client):
+    repo = FirestoreRepository(AsyncStore(client))
+    await repo.start()
+    return repo
+
+
+def test_migration_moves_legacy_arrays_to_items(client):
+    async def scenario():
+        repo = await _repo(client)
+        await repo.migrate()
+        counts = await repo.warning_count("1"), await repo.warning_count("2")
+        newest = await repo.warnings_pager("1", 10).page(0)
+        await repo.close()
+        return counts, newest
+
+    counts, newest = run(scenario())
+    assert counts == (2, 3)
+    assert [w["reason"] for w in newest] == ["off-topic", "spam"]
+    assert "warnings" not in client._collections["warnings"]["1"]
+    assert client._collections["meta"]["migrations"] == {"warnings": 1}
+
+
+def test_migration_is_safe_to_repeat(client):
+    async def scenario():
+        repo = await _repo(client)
+        await repo.migrate()
+        # A rerun after the marker was lost must not duplicate or double-count
+        client._collections["meta"].clear()
+        repo.new_scope()
+        await repo.migrate()
+        count = await repo.warning_count("1")
+        await repo.close()
+        return count
+
+    assert run(scenario()) == 2
+    assert len(client._collections["warnings/1/items"]) == 2
+
+
+def test_reads_do_not_migrate(client):
+    async def scenario():
+        repo = await _repo(client)
+        count = await repo.warning_count("1")
+        await repo.close()
+        return count
+
+    assert run(scenario()) == 0
+    assert "warnings" in client._collections["warnings"]["1"]
+
+
+def test_add_and_clear_keep_the_count(client):
+    async def scenario():
+        repo = await _repo(client)
+        await repo.migrate()
+        await repo.add_warning("1", "ana", {"timestamp": "2024-06-03T10:00:00", "reason": "spam"})
+        repo.new_scope()
+        added = await repo.warning_count("1")
+        await repo.clear_warnings("1")
+        repo.new_scope()
+        cleared = await repo.warning_count("1")
+        await repo.close()
+        return added, cleared
+
+    assert run(scenario()) == (3, 0)
@@ -0,0 +1,187 @@
+import asyncio
+import copy
+from typing import NamedTuple, Optional
+
+import pytest
+
+from repository import deep_merge
+from storage import AsyncStore, WriteBehindBuffer
+
+
+class Ref(NamedTuple):
+    path: str
+
+
+class Snapshot(NamedTuple):
+    reference: Ref
+    data: Optional[dict]
+
+    @property
+    def exists(self) -> bool:
+        return self.data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self.data)
+
+
+class FakeBatch:
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+        self.writes: list[tuple[Ref, dict, bool]] = []
+
+    def __len__(self) -> int:
+        return len(self.writes)
+
+    def set(self, ref: Ref, data: dict, merge: bool = False):
+        self.writes.append((ref, copy.deepcopy(data), merge))
+
+    def commit(self):
+        if self.client.fail:
+            raise RuntimeError("commit failed")
+        self.client.commits.append(sorted(ref.path for ref, _, _ in self.writes))
+        for ref, data, merge in self.writes:
+            self.client.docs[ref.path] = deep_merge(self.client.docs.get(ref.path, {}), data) if merge else data
+
+
+class FakeTransaction(FakeBatch):
+    """Enough of a transaction for `firestore.transactional`: one attempt, no conflicts."""
+
+    _max_attempts = 1
+    _read_only = False
+    _id = None
+
+    def _clean_up(self):
+        self.writes = []
+
+    def _begin(self, retry_id=None):
+        self._id = b"txn"
+
+    def _commit(self):
+        self.commit()
+
+    def _rollback(self):
+        self.writes = []
+
+
+class FakeClient:
+    def __init__(self, docs: Optional[dict] = None):
+        self.docs: dict[str, dict] = docs or {}
+        self.commits: list[list[str]] = []
+        self.fail = False
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    def get_all(self, refs: list, transaction=None):
+        return [Snapshot(ref, copy.deepcopy(self.docs.get(ref.path))) for ref in refs]
+
+
+@pytest.fixture
+def client():
+    return FakeClient({"progress/1": {"username": "ana", "entries": {"2024-06-01": 3}}})
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_writes_to_one_document_coalesce(client):
+    async def scenario():
+        store = AsyncStore(client)
+        buffer = WriteBehindBuffer(store, max_delay=60)
+        ref = Ref("progress/1")
+        buffer.set(ref, {"entries": {"2024-06-02": 5}}, merge=True)
+        buffer.set(ref, {"entries": {"2024-06-03": 6}}, merge=True)
+        buffer.set(ref, {"entries": {"2024-06-03": 7}}, merge=True)
+        buffer.set(Ref("progress/2"), {"username": "ben", "entries": {"2024-06-03": 1}})
+        assert buffer.pending == 2
+        await buffer.close()
+
+    run(scenario())
+    assert client.commits == [["progress/1", "progress/2"]]
+    assert client.docs["progress/1"] == {"username": "ana", "entries": {"2024-06-01": 3, "2024-06-02": 5, "2024-06-03": 7}}
+
+
+def test_plain_set_replaces_earlier_merges(client):
+    async def scenario():
+        buffer = WriteBehindBuffer(AsyncStore(client), max_delay=60)
+        buffer.set(Ref("progress/1"), {"entries": {"2024-06-02": 5}}, merge=True)
+        buffer.set(Ref("progress/1"), {"username": "ana", "entries": {}})
+        await buffer.close()
+
+    run(scenario())
+    assert client.docs["progress/1"] == {"username": "ana", "entries": {}}
+
+
+def test_reads_see_buffered_writes(client):
+    async def scenario():
+        store = AsyncStore(client)
+        buffer = WriteBehindBuffer(store, max_delay=60)
+        ref = Ref("progress/1")
+        before = await store.load(ref)  # Cached by this request's loader
+        buffer.set(ref, {"entries": {"2024-06-02": 5}}, merge=True)
+        pending = await store.load(ref)
+        await buffer.flush()
+        store.new_loader_scope()
+        committed = await store.load(ref)
+        await buffer.close()
+        return before, pending, committed
+
+    before, pending, committed = run(scenario())
+    assert before["entries"] == {"2024-06-01": 3}
+    assert pending["entries"] == {"2024-06-01": 3, "2024-06-02": 5}
+    assert committed == pending
+
+
+def test_failed_flush_keeps_the_writes_under_newer_ones(client):
+    async def scenario():
+        store = AsyncStore(client)
+        buffer = WriteBehindBuffer(store, max_delay=60)
+        ref = Ref("progress/1")
+        buffer.set(ref, {"entries": {"2024-06-02": 5}}, merge=True)
+        client.fail = True
+        with pytest.raises(RuntimeError):
+            await buffer.flush()
+        buffer.set(ref, {"entries": {"2024-06-03": 6}}, merge=True)
+        assert buffer.pending == 1
+        assert (await store.load(ref))["entries"] == {"2024-06-01": 3, "2024-06-02": 5, "2024-06-03": 6}
+        client.fail = False
+        await buffer.close()
+
+    run(scenario())
+    assert client.docs["progress/1"]["entries"] == {"2024-06-01": 3, "2024-06-02": 5, "2024-06-03": 6}
+
+
+def test_full_buffer_flushes_without_waiting(client):
+    async def scenario():
+        buffer = WriteBehindBuffer(AsyncStore(client), max_batch=3, max_delay=60)
+        for i in range(3):
+            buffer.set(Ref(f"progress/{i + 10}"), {"n": i})
+        await asyncio.sleep(0.05)
+        committed = list(client.commits)
+        await buffer.close()
+        return committed
+
+    assert run(scenario()) == [["progress/10", "progress/11", "progress/12"]]
+
+
+def test_folds_are_replayed_on_the_stored_document(client):
+    def add(day: str):
+        return lambda current: {"days": sorted({*(current or {}).get("days", []), day})}
+
+    async def scenario():
+        store = AsyncStore(client)
+        buffer = WriteBehindBuffer(store, max_delay=60)
+        ref = Ref("stats/1")
+        buffer.set(ref, add("2024-06-02")(None), fold=add("2024-06-02"))
+        buffer.set(ref, add("2024-06-03")(await store.load(ref)), fold=add("2024-06-03"))
+        assert (await store.load(ref)) == {"days": ["2024-06-02", "2024-06-03"]}
+        # Another process writes the same summary before this one flushes
+        client.docs["stats/1"] = {"days": ["2024-06-01"]}
+        await buffer.close()
+
+    run(scenario())
+    assert client.docs["stats/1"] == {"days": ["2024-06-01", "2024-06-02", "2024-06-03"]}